@@ -0,0 +1,72 @@
+"""
+Recall vs latency of the IVF index against exact search on a synthetic corpus.
+
+Usage (from backend/):
+    python -m src.benchmarks.ann --count 200000 --dim 256
+"""
+
+import time
+import argparse
+from typing import Tuple
+
+import numpy as np
+
+from ..index.ann import IVFIndex
+
+
+def synthetic_corpus(count: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Normalized vectors drawn around random topic centres, like chunk embeddings of many papers."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=count)
+    vectors = centres[labels] + 0.6 * rng.normal(size=(count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(vectors: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    scores = vectors @ query
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def run(count: int, dim: int, queries: int, k: int, seed: int = 0) -> None:
+    corpus = synthetic_corpus(count, dim, clusters=max(10, count // 2000), seed=seed)
+    rng = np.random.default_rng(seed + 1)
+    query_vectors = corpus[rng.choice(count, queries, replace=False)] + 0.1 * rng.normal(size=(queries, dim)).astype(np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+
+    start = time.perf_counter()
+    ivf = IVFIndex.train(corpus, seed=seed)
+    print(f"corpus: {count} x {dim}, {queries} queries, k={k}")
+    print(f"trained {ivf.nlist} lists in {time.perf_counter() - start:.2f}s\n")
+
+    truth, exact_ms = _timed(lambda q: exact_top_k(corpus, q, k), query_vectors)
+    print(f"{'mode':>12} {'recall@k':>9} {'mean ms':>9} {'p95 ms':>9}")
+    print(f"{'exact':>12} {1.0:>9.3f} {np.mean(exact_ms):>9.3f} {np.percentile(exact_ms, 95):>9.3f}")
+
+    nprobe = 1
+    while nprobe <= ivf.nlist:
+        found, ms = _timed(lambda q: ivf.search(corpus, q, k, nprobe=nprobe)[0], query_vectors)
+        recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+        print(f"{'nprobe=' + str(nprobe):>12} {recall:>9.3f} {np.mean(ms):>9.3f} {np.percentile(ms, 95):>9.3f}")
+        nprobe *= 2
+
+
+def _timed(search, queries: np.ndarray) -> Tuple[list, np.ndarray]:
+    results, elapsed = [], []
+    for q in queries:
+        start = time.perf_counter()
+        results.append(search(q))
+        elapsed.append((time.perf_counter() - start) * 1000)
+    return results, np.asarray(elapsed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.count, args.dim, args.queries, args.k, args.seed)
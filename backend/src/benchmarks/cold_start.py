@@ -0,0 +1,89 @@
+"""
+Import-time profile of the API entry point, with a budget check.
+
+Imports `src.main` in a fresh interpreter under `python -X importtime`, prints the
+slowest top-level imports and exits non-zero if the import exceeds the budget or
+pulls in an SDK that must stay lazy. Run it in CI or before deploying to Vercel:
+
+    python -m src.benchmarks.cold_start --budget-ms 800
+"""
+
+import os
+import re
+import sys
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+COLD_START_BUDGET_MS = int(os.getenv("CORTEX_COLD_START_BUDGET_MS", "1200"))
+
+# Heavy SDKs that must only be imported on first use (lifespan or request time)
+LAZY_MODULES = (
+    "google.generativeai",
+    "azure.cosmos",
+    "sklearn",
+    "numpy",
+    "fitz",
+    "boto3",
+)
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile_import(module: str = "src.main") -> Tuple[int, Dict[str, int], List[str]]:
+    """Import `module` in a fresh interpreter.
+
+    Returns:
+        (total cumulative microseconds, cumulative microseconds per top-level import,
+         every module name imported)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    top_level: Dict[str, int] = {}
+    imported: List[str] = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), match.group(3), match.group(4)
+        imported.append(name)
+        if len(indent) <= 1:
+            top_level[name] = cumulative
+    return sum(top_level.values()), top_level, imported
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="src.main")
+    parser.add_argument("--budget-ms", type=int, default=COLD_START_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    total_us, top_level, imported = profile_import(args.module)
+    print(f"import {args.module}: {total_us / 1000:.0f} ms (budget {args.budget_ms} ms)\n")
+    for name, us in sorted(top_level.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"{us / 1000:>9.1f} ms  {name}")
+
+    failures = []
+    if total_us / 1000 > args.budget_ms:
+        failures.append(f"cold start {total_us / 1000:.0f} ms exceeds budget of {args.budget_ms} ms")
+    eager = sorted({m for m in LAZY_MODULES if m in imported})
+    if eager:
+        failures.append(f"imported eagerly (must be lazy): {', '.join(eager)}")
+
+    for failure in failures:
+        print(f"\nFAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
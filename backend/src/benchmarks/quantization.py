@@ -0,0 +1,61 @@
+"""
+Memory vs recall of quantized shard vectors (int8, PQ) against float32 exact search.
+
+Usage (from backend/):
+    python -m src.benchmarks.quantization --count 50000 --dim 768
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from ..index.quantize import ScalarQuantizer, ProductQuantizer, RESCORE_FACTOR
+from .ann import synthetic_corpus, exact_top_k
+
+
+def run(count: int, dim: int, queries: int, k: int, rescore: int = RESCORE_FACTOR, seed: int = 0) -> None:
+    corpus = synthetic_corpus(count, dim, clusters=max(10, count // 2000), seed=seed)
+    rng = np.random.default_rng(seed + 1)
+    query_vectors = corpus[rng.choice(count, queries, replace=False)] + 0.1 * rng.normal(size=(queries, dim)).astype(np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    truth = [exact_top_k(corpus, q, k) for q in query_vectors]
+
+    quantizers = [("int8", ScalarQuantizer.train(corpus))]
+    for m in sorted({dim // 4, dim // 8, dim // 16} - {0}):
+        if dim % m == 0:
+            quantizers.append((f"pq m={m}", ProductQuantizer.train(corpus, m=m, seed=seed)))
+
+    print(f"corpus: {count} x {dim}, {queries} queries, k={k}, re-score shortlist {rescore}k\n")
+    print(f"{'mode':>10} {'bytes/vec':>10} {'ratio':>7} {'recall':>8} {'recall+rs':>10} {'mean ms':>9}")
+    print(f"{'float32':>10} {corpus[0].nbytes:>10} {1.0:>6.1f}x {1.0:>8.3f} {1.0:>10.3f} {'':>9}")
+
+    for name, quantizer in quantizers:
+        codes = quantizer.encode(corpus)
+        raw, rescored, elapsed = [], [], []
+        for q, t in zip(query_vectors, truth):
+            start = time.perf_counter()
+            approx = quantizer.scores(codes, q)
+            shortlist = np.argpartition(-approx, k * rescore - 1)[:k * rescore]
+            exact = corpus[shortlist] @ q
+            found = shortlist[np.argsort(-exact)[:k]]
+            elapsed.append((time.perf_counter() - start) * 1000)
+            raw.append(len(set(np.argsort(-approx)[:k]) & set(t)) / k)
+            rescored.append(len(set(found) & set(t)) / k)
+        per_vector = codes[0].nbytes
+        print(
+            f"{name:>10} {per_vector:>10} {corpus[0].nbytes / per_vector:>6.1f}x "
+            f"{np.mean(raw):>8.3f} {np.mean(rescored):>10.3f} {np.mean(elapsed):>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore", type=int, default=RESCORE_FACTOR, help="shortlist size as a multiple of k")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.count, args.dim, args.queries, args.k, args.rescore, args.seed)
@@ -0,0 +1,101 @@
+"""
+Memory of N worker processes searching the same memory-mapped shard.
+
+Each worker opens the shard through its own ShardManager (as uvicorn workers do),
+runs queries until every page has been touched, and reports its proportional set
+size (PSS) from /proc/self/smaps_rollup. Pages of the memory-mapped index are
+shared, so their PSS is split between the workers and the total should stay
+flat as workers are added (Linux only).
+
+Usage (from backend/):
+    python -m src.benchmarks.shared_index --count 200000 --dim 768 --workers 1 2 4 8
+"""
+
+import argparse
+import tempfile
+import multiprocessing as mp
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from ..index.shards import ShardManager
+from .ann import synthetic_corpus
+
+
+def _memory_kb() -> Dict[str, int]:
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {"rss": fields.get("Rss", 0), "pss": fields.get("Pss", 0)}
+
+
+def _worker(root: str, queries: np.ndarray, ready, go, results) -> None:
+    manager = ShardManager(Path(root), ram_budget_mb=1 << 20)
+    baseline = _memory_kb()
+    for q in queries:
+        manager.search("bench", q, k=10)
+    shard = manager.get("bench")
+    # Touch every page so the whole shard is resident in this process
+    for segment in shard.segments:
+        float(np.asarray(segment.vectors).sum())
+        if segment.codes is not None:
+            float(np.asarray(segment.codes, dtype=np.float32).sum())
+        segment.chunks.strings.sum()
+    ready.put(True)
+    # Measure only once every worker has mapped the shard, so PSS is split between all of them
+    go.wait()
+    after = _memory_kb()
+    results.put({k: after[k] - baseline[k] for k in after})
+
+
+def measure(root: Path, workers: int, queries: np.ndarray) -> List[Dict[str, int]]:
+    ctx = mp.get_context("fork")
+    ready, results, go = ctx.Queue(), ctx.Queue(), ctx.Event()
+    procs = [ctx.Process(target=_worker, args=(str(root), queries, ready, go, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    for _ in procs:
+        ready.get()
+    go.set()
+    out = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.count, args.dim, clusters=max(10, args.count // 2000))
+    chunks = [
+        {"chunk_id": f"p{i // 50}:{i}", "paper_id": f"p{i // 50}", "page_num": 1,
+         "char_start": 0, "char_end": 1200, "text": "x" * 1200}
+        for i in range(args.count)
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = ShardManager(Path(tmp))
+        manager.add_chunks("bench", chunks, corpus)
+        shard = manager.get("bench")
+        print(f"shard: {args.count} x {args.dim}, {shard.nbytes / 2**20:.1f} MB mapped ({shard.path.name})\n")
+        del manager, shard, chunks
+
+        queries = corpus[: args.queries]
+        print(f"{'workers':>8} {'RSS sum MB':>11} {'PSS sum MB':>11} {'PSS/worker MB':>14}")
+        for n in args.workers:
+            stats = measure(Path(tmp), n, queries)
+            rss = sum(s["rss"] for s in stats) / 1024
+            pss = sum(s["pss"] for s in stats) / 1024
+            print(f"{n:>8} {rss:>11.1f} {pss:>11.1f} {pss / n:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,48 @@
-from azure.cosmos import CosmosClient
 from datetime import datetime
-import os, uuid
+import os, uuid, threading
 from dotenv import load_dotenv
 
 load_dotenv()
 # ✅ Environment variables (you’ll set these in .env or Vercel later)
 COSMOS_URL = os.getenv("COSMOS_URL")
 COSMOS_KEY = os.getenv("COSMOS_KEY")
-COSMOS_DB= ("CortexDB")
+COSMOS_DB = os.getenv("COSMOS_DB", "CortexDB")
 COSMOS_CONTAINER = os.getenv("COSMOS_CONTAINER")
 
+# One client per process, created by the FastAPI lifespan (or on first use in scripts).
+# azure.cosmos is imported lazily: importing it and building a client costs hundreds
+# of milliseconds of cold start.
+_client = None
+_db = None
+_lock = threading.Lock()
 
 
-client = CosmosClient(str(COSMOS_URL).strip(), credential=str(COSMOS_KEY).strip())
+def connect():
+    """Create the shared Cosmos client if it does not exist yet."""
+    global _client, _db
+    with _lock:
+        if _client is None:
+            from azure.cosmos import CosmosClient
 
-db = client.get_database_client(COSMOS_DB)
+            _client = CosmosClient(str(COSMOS_URL).strip(), credential=str(COSMOS_KEY).strip())
+            _db = _client.get_database_client(COSMOS_DB)
+    return _client
+
+
+def close():
+    global _client, _db
+    with _lock:
+        if _client is not None:
+            _client.__exit__(None, None, None)  # CosmosClient only exposes close via its context manager
+        _client, _db = None, None
+
+
+def container(name: str):
+    """Container client by name ("users", "papers", "chats", "docs")."""
+    if _db is None:
+        connect()
+    return _db.get_container_client(name)
 
-users = db.get_container_client("users")
-docs = db.get_container_client("docs")
-chats = db.get_container_client("chats")
 
 # --- Helper Functions ---
 def save_doc(user_id: str, filename: str, text: str):
@@ -29,9 +53,9 @@ def save_doc(user_id: str, filename: str, text: str):
         "text": text,
         "uploadedAt": datetime.utcnow().isoformat()
     }
-    docs.create_item(item)
+    container("docs").create_item(item)
     return item
 
 def list_docs(user_id: str):
     query = f"SELECT * FROM c WHERE c.userId = '{user_id}'"
-    return list(docs.query_items(query=query, enable_cross_partition_query=True))
\ No newline at end of file
+    return list(container("docs").query_items(query=query, enable_cross_partition_query=True))
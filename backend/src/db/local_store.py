@@ -1,45 +1,159 @@
-from tinydb import TinyDB, Query
+import os
+import json
+import logging
+import sqlite3
+import threading
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Iterable
 
-_DB_PATH = Path(__file__).parent / "db.json"
-_db = TinyDB(_DB_PATH)
-_papers = _db.table("papers")
+logger = logging.getLogger(__name__)
+
+_DB_PATH = Path(os.getenv("CORTEX_LOCAL_DB", Path(__file__).parent / "cortex.sqlite3"))
+_LEGACY_DB_PATH = Path(__file__).parent / "db.json"  # TinyDB file used before the SQLite store
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    id          TEXT PRIMARY KEY,
+    owner       TEXT,
+    uploaded_at TEXT,
+    record      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_papers_owner ON papers (owner, uploaded_at);
+"""
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def _connect() -> sqlite3.Connection:
+    """Per-thread connection to the WAL-mode store; creates and migrates it on first use."""
+    global _initialized
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        return conn
+
+    conn = sqlite3.connect(_DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    _local.conn = conn
+
+    with _init_lock:
+        if not _initialized:
+            conn.executescript(_SCHEMA)
+            if conn.execute("PRAGMA user_version").fetchone()[0] == 0:
+                if _LEGACY_DB_PATH.exists():
+                    migrate_from_tinydb(_LEGACY_DB_PATH)
+                conn.execute("PRAGMA user_version = 1")
+            _initialized = True
+    return conn
+
+
+def _row(record: Dict[str, Any]) -> tuple:
+    return (
+        record["id"],
+        record.get("user_email") or record.get("owner"),
+        record.get("uploaded_at"),
+        json.dumps(record),
+    )
 
 
 def add_paper(record: Dict[str, Any]) -> None:
-    _papers.insert(record)
+    add_papers([record])
+
+
+def add_papers(records: Iterable[Dict[str, Any]]) -> None:
+    """Insert (or replace) many paper records in a single transaction."""
+    rows = [_row(r) for r in records]
+    if not rows:
+        return
+    conn = _connect()
+    with conn:
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT OR REPLACE INTO papers (id, owner, uploaded_at, record) VALUES (?, ?, ?, ?)",
+            rows,
+        )
 
 
 def get_paper(paper_id: str) -> Optional[Dict[str, Any]]:
-    Paper = Query()
-    res = _papers.search(Paper.id == paper_id)
-    return res[0] if res else None
+    row = _connect().execute("SELECT record FROM papers WHERE id = ?", (paper_id,)).fetchone()
+    return json.loads(row["record"]) if row else None
+
+
+def migrate_from_tinydb(json_path: Path = _LEGACY_DB_PATH) -> int:
+    """Copy paper records from a TinyDB `db.json` into the SQLite store.
 
-import fitz  # PyMuPDF for PDF text extraction
+    Returns:
+        Number of records migrated
+    """
+    data = json.loads(Path(json_path).read_text() or "{}")
+    records = [r for r in data.get("papers", {}).values() if r.get("id")]
+    add_papers(records)
+    return len(records)
 
-def search_local_chunks(question: str) -> list[str]:
-    """Return text chunks from locally stored PDFs that match the query."""
+def _page_texts(record: Dict[str, Any]) -> Iterable[str]:
+    """Page texts of a stored paper, from its page-text index when built, else the PDF."""
+    from ..index.pages import load_page_index
+
+    index = load_page_index(record["id"])
+    if index is not None:
+        text = index["text"]
+        for page in index["pages"]:
+            yield text[page["char_start"]:page["char_end"]]
+        return
+
+    import fitz  # PyMuPDF for PDF text extraction
+    from ..services.storage import get_storage
+
+    if record.get("storage_key"):
+        with get_storage().local_path(record["storage_key"]) as path, fitz.open(path) as doc:
+            for page in doc:
+                yield page.get_text("text")
+        return
+
+    stored_path = record.get("stored_path")
+    if not stored_path:
+        return
+    with fitz.open(stored_path) as doc:
+        for page in doc:
+            yield page.get_text("text")
+
+
+def search_local_chunks(question: str, owner: Optional[str] = None, paper_ids: Optional[List[str]] = None) -> list[str]:
+    """Return text chunks from locally stored PDFs that match the query.
+
+    Used as the degraded retrieval path when MCP is unavailable; pass `owner`
+    to search only that user's papers, and `paper_ids` to search only those papers.
+    """
     results = []
     question_words = question.lower().split()
 
-    for record in _papers.all():
-        stored_path = record.get("stored_path")
-        if not stored_path:
+    for record in list_papers(owner):
+        if paper_ids is not None and record.get("id") not in paper_ids:
             continue
-
         try:
-            doc = fitz.open(stored_path)
-            for page in doc:
-                text = page.get_text("text")
+            for text in _page_texts(record):
                 for paragraph in text.split("\n\n"):
                     if any(w in paragraph.lower() for w in question_words):
                         results.append(paragraph.strip())
-            doc.close()
         except Exception as e:
-            print(f"Error reading {stored_path}: {e}")
+            logger.error(f"Error reading paper {record.get('id')} ({record.get('stored_path')}): {e}")
 
     return results[:5]  # limit to 5 relevant chunks
 
-def list_papers() -> List[Dict[str, Any]]:
-    return _papers.all()
+def list_papers(owner: Optional[str] = None) -> List[Dict[str, Any]]:
+    conn = _connect()
+    if owner is None:
+        rows = conn.execute("SELECT record FROM papers ORDER BY uploaded_at")
+    else:
+        rows = conn.execute("SELECT record FROM papers WHERE owner = ? ORDER BY uploaded_at", (owner,))
+    return [json.loads(r["record"]) for r in rows]
+
+
+if __name__ == "__main__":
+    import sys
+
+    source = Path(sys.argv[1]) if len(sys.argv) > 1 else _LEGACY_DB_PATH
+    print(f"Migrated {migrate_from_tinydb(source)} papers from {source} into {_DB_PATH}")
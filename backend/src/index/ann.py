@@ -0,0 +1,168 @@
+"""
+Inverted-file (IVF) approximate nearest-neighbour index.
+
+Vectors are clustered with spherical k-means into `nlist` lists; a query only
+scores the rows in its `nprobe` closest lists. Raising nprobe trades latency for
+recall (nprobe == nlist is exact search).
+
+All state is flat numpy arrays so it can be saved next to a shard's vectors and
+memory-mapped back:
+
+    ivf_centroids.npy   float32 (nlist, dim)
+    ivf_assign.npy      int32   (count,)   list of every row
+    ivf_order.npy       int32   (count,)   rows grouped by list
+    ivf_offsets.npy     int64   (nlist+1,) list boundaries into ivf_order
+"""
+
+import os
+import math
+import logging
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ANN_NPROBE = int(os.getenv("CORTEX_ANN_NPROBE", "32"))
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 256
+ASSIGN_BATCH = 65536
+
+
+def default_nlist(count: int) -> int:
+    """Number of lists for a corpus of `count` vectors (~4 * sqrt(n))."""
+    return max(1, min(count, int(4 * math.sqrt(count))))
+
+
+def _nearest(centroids: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """Index of the closest centroid (max inner product) for every row, in batches."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BATCH):
+        block = np.asarray(vectors[start:start + ASSIGN_BATCH], dtype=np.float32)
+        out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+class IVFIndex:
+    """IVF lists over the rows of a (normalized) vector matrix stored elsewhere."""
+
+    FILES = ("ivf_centroids.npy", "ivf_assign.npy", "ivf_order.npy", "ivf_offsets.npy")
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        assignments: np.ndarray,
+        order: Optional[np.ndarray] = None,
+        offsets: Optional[np.ndarray] = None,
+    ):
+        self.centroids = centroids
+        self.assignments = assignments
+        if order is None or offsets is None:
+            order, offsets = self._build_lists(assignments, len(centroids))
+        self.order = order
+        self.offsets = offsets
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.centroids.nbytes + self.assignments.nbytes + self.order.nbytes + self.offsets.nbytes)
+
+    @staticmethod
+    def _build_lists(assignments: np.ndarray, nlist: int) -> Tuple[np.ndarray, np.ndarray]:
+        order = np.argsort(assignments, kind="stable").astype(np.int32)
+        offsets = np.searchsorted(assignments[order], np.arange(nlist + 1)).astype(np.int64)
+        return order, offsets
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, nlist: Optional[int] = None, seed: int = 0) -> "IVFIndex":
+        """Cluster normalized vectors with spherical k-means and assign every row.
+
+        Args:
+            vectors: Normalized float32 matrix (count, dim)
+            nlist: Number of lists (defaults to default_nlist(count))
+            seed: RNG seed for the sample and initial centroids
+        """
+        count = len(vectors)
+        nlist = nlist or default_nlist(count)
+        rng = np.random.default_rng(seed)
+
+        sample_size = min(count, nlist * KMEANS_SAMPLE_PER_LIST)
+        sample = np.asarray(vectors[np.sort(rng.choice(count, sample_size, replace=False))], dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(KMEANS_ITERATIONS):
+            labels = _nearest(centroids, sample)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            sizes = np.bincount(labels, minlength=nlist)
+            # Re-seed empty lists from random sample rows
+            empty = sizes == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+
+        logger.info(f"Trained IVF index with {nlist} lists on {sample_size} of {count} vectors")
+        return cls(centroids, _nearest(centroids, vectors))
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        """List of every row of `vectors` under the existing centroids."""
+        return _nearest(self.centroids, vectors)
+
+    def add(self, vectors: np.ndarray) -> "IVFIndex":
+        """Return a new index with `vectors` appended as the next rows."""
+        return IVFIndex(self.centroids, np.concatenate([self.assignments, self.assign(vectors)]))
+
+    def keep(self, rows: np.ndarray) -> "IVFIndex":
+        """Return a new index restricted to `rows` (in that order), e.g. after deleting a paper."""
+        return IVFIndex(self.centroids, np.asarray(self.assignments)[rows])
+
+    def candidates(self, query: np.ndarray, nprobe: int = ANN_NPROBE) -> np.ndarray:
+        """Row indices in the `nprobe` lists closest to the query."""
+        nprobe = max(1, min(nprobe, self.nlist))
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.order[self.offsets[p]:self.offsets[p + 1]] for p in probe])
+
+    def search(
+        self,
+        vectors: np.ndarray,
+        query: np.ndarray,
+        k: int,
+        nprobe: int = ANN_NPROBE,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate top-k rows of `vectors` by inner product with `query`.
+
+        Returns:
+            (rows, scores), best first
+        """
+        rows = np.sort(self.candidates(query, nprobe))
+        if len(rows) == 0:
+            return rows, np.empty(0, dtype=np.float32)
+        scores = vectors[rows] @ query
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return rows[top], scores[top]
+
+    def save(self, path: Path) -> None:
+        for name, array in zip(self.FILES, (self.centroids, self.assignments, self.order, self.offsets)):
+            tmp = path / f"{name}.tmp.npy"
+            np.save(tmp, array)
+            os.replace(tmp, path / name)
+
+    @classmethod
+    def load(cls, path: Path, mmap_mode: Optional[str] = "r") -> Optional["IVFIndex"]:
+        """Load a saved index, or None if the shard has no IVF lists."""
+        if not all((path / name).exists() for name in cls.FILES):
+            return None
+        return cls(*(np.load(path / name, mmap_mode=mmap_mode) for name in cls.FILES))
+
+    @classmethod
+    def delete(cls, path: Path) -> None:
+        for name in cls.FILES:
+            (path / name).unlink(missing_ok=True)
@@ -0,0 +1,156 @@
+"""
+Chunk metadata in a memory-mappable layout.
+
+A shard used to keep its chunks in `chunks.json`, which every worker process
+parsed into its own list of dicts (texts included). ChunkTable stores the same
+records as flat files that are memory-mapped read-only instead, so all workers
+share one copy through the page cache:
+
+    chunks.npy          structured array, one row per chunk (CHUNK_DTYPE)
+    chunk_strings.bin   UTF-8 chunk ids and texts; row i's id is
+                        [id_start, id_end) and its text [id_end, text_end)
+    papers.json         paper ids; the `paper` column indexes into this list
+
+Records are materialized as dicts only for the rows a query returns.
+"""
+
+import os
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+
+import numpy as np
+
+CHUNK_DTYPE = np.dtype([
+    ("paper", "<i4"),
+    ("page_num", "<i4"),
+    ("char_start", "<i8"),
+    ("char_end", "<i8"),
+    ("id_start", "<i8"),
+    ("id_end", "<i8"),
+    ("text_end", "<i8"),
+])
+
+
+class ChunkTable:
+    """Chunk records { chunk_id, paper_id, page_num, char_start, char_end, text }."""
+
+    FILES = ("chunks.npy", "chunk_strings.bin", "papers.json")
+
+    def __init__(self, rows: np.ndarray, strings: np.ndarray, papers: List[str]):
+        self.rows = rows
+        self.strings = strings
+        self.papers = papers
+
+    @classmethod
+    def from_records(cls, chunks: Iterable[Dict[str, Any]]) -> "ChunkTable":
+        chunks = list(chunks)
+        papers: List[str] = []
+        paper_index: Dict[str, int] = {}
+        rows = np.zeros(len(chunks), dtype=CHUNK_DTYPE)
+        parts, offset = [], 0
+        for i, chunk in enumerate(chunks):
+            paper_id = chunk["paper_id"]
+            if paper_id not in paper_index:
+                paper_index[paper_id] = len(papers)
+                papers.append(paper_id)
+            chunk_id = str(chunk["chunk_id"]).encode("utf-8")
+            text = chunk["text"].encode("utf-8")
+            rows[i] = (
+                paper_index[paper_id], chunk["page_num"], chunk["char_start"], chunk["char_end"],
+                offset, offset + len(chunk_id), offset + len(chunk_id) + len(text),
+            )
+            parts += [chunk_id, text]
+            offset += len(chunk_id) + len(text)
+        return cls(rows, np.frombuffer(b"".join(parts), dtype=np.uint8), papers)
+
+    @classmethod
+    def concat(cls, parts: Iterable[Tuple["ChunkTable", np.ndarray]]) -> "ChunkTable":
+        """The given rows of several tables, in order, as one table.
+
+        Args:
+            parts: (table, rows to keep, ascending) per table
+        """
+        papers: List[str] = []
+        paper_index: Dict[str, int] = {}
+        tables, strings, offset = [], [], 0
+        for table, keep in parts:
+            rows = np.array(table.rows[np.asarray(keep, dtype=np.int64)])
+            if not len(rows):
+                continue
+            starts, ends = rows["id_start"], rows["text_end"]
+            # Copy the bytes run by run: kept rows are mostly contiguous
+            breaks = np.flatnonzero(starts[1:] != ends[:-1]) + 1
+            for first, last in zip(np.concatenate([[0], breaks]), np.concatenate([breaks, [len(rows)]])):
+                strings.append(np.asarray(table.strings[int(starts[first]):int(ends[last - 1])]))
+            lengths = ends - starts
+            new_starts = offset + np.cumsum(lengths) - lengths
+            rows["id_end"] += new_starts - starts
+            rows["text_end"] = new_starts + lengths
+            rows["id_start"] = new_starts
+            renumber = np.full(len(table.papers), -1, dtype=np.int32)
+            for i in np.unique(rows["paper"]):
+                paper_id = table.papers[i]
+                if paper_id not in paper_index:
+                    paper_index[paper_id] = len(papers)
+                    papers.append(paper_id)
+                renumber[i] = paper_index[paper_id]
+            rows["paper"] = renumber[rows["paper"]]
+            tables.append(rows)
+            offset += int(lengths.sum())
+        return cls(
+            np.concatenate(tables) if tables else np.zeros(0, dtype=CHUNK_DTYPE),
+            np.concatenate(strings) if strings else np.zeros(0, dtype=np.uint8),
+            papers,
+        )
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        row = self.rows[i]
+        return {
+            "chunk_id": self._string(row["id_start"], row["id_end"]),
+            "paper_id": self.papers[row["paper"]],
+            "page_num": int(row["page_num"]),
+            "char_start": int(row["char_start"]),
+            "char_end": int(row["char_end"]),
+            "text": self._string(row["id_end"], row["text_end"]),
+        }
+
+    def _string(self, start: int, end: int) -> str:
+        return bytes(self.strings[int(start):int(end)]).decode("utf-8")
+
+    def records(self) -> List[Dict[str, Any]]:
+        return [self[i] for i in range(len(self))]
+
+    def paper_mask(self, rows: np.ndarray, paper_ids: Iterable[str]) -> np.ndarray:
+        """Boolean mask over `rows` selecting chunks of the given papers."""
+        allowed = set(paper_ids)
+        wanted = [i for i, paper_id in enumerate(self.papers) if paper_id in allowed]
+        return np.isin(self.rows["paper"][rows], wanted)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.rows.nbytes) + int(self.strings.nbytes)
+
+    def save(self, path: Path) -> None:
+        np.save(path / "chunks.npy", self.rows)
+        (path / "chunk_strings.bin").write_bytes(self.strings.tobytes())
+        (path / "papers.json").write_text(json.dumps(self.papers))
+
+    @classmethod
+    def load(cls, path: Path, mmap_mode: Optional[str] = "r") -> "ChunkTable":
+        if not (path / "chunks.npy").exists():
+            # Shards written before this layout
+            return cls.from_records(json.loads((path / "chunks.json").read_text()))
+        strings_path = path / "chunk_strings.bin"
+        if mmap_mode is not None and os.path.getsize(strings_path) > 0:
+            strings = np.memmap(strings_path, dtype=np.uint8, mode=mmap_mode)
+        else:
+            strings = np.fromfile(strings_path, dtype=np.uint8)
+        return cls(
+            np.load(path / "chunks.npy", mmap_mode=mmap_mode),
+            strings,
+            json.loads((path / "papers.json").read_text()),
+        )
@@ -0,0 +1,236 @@
+"""
+BM25 lexical index over a shard's chunk texts.
+
+Embeddings blur exact terms (equation names, acronyms, symbols like "L2" or
+"F1"); BM25 ranks chunks by the question's words themselves. Like the IVF lists,
+the index is flat numpy arrays saved in the shard generation and memory-mapped
+back, so worker processes share it:
+
+    bm25_terms.npy     uint64 (vocab,)    sorted 64-bit hashes of the terms
+    bm25_offsets.npy   int64  (vocab+1,)  posting list boundaries into docs/tf
+    bm25_docs.npy      int32  (postings,) chunk rows, grouped by term
+    bm25_tf.npy        uint16 (postings,) term frequency in that chunk
+    bm25_lengths.npy   int32  (count,)    tokens per chunk
+
+A shard made of several segments scores every segment with the collection-wide
+document count, document frequencies and average length (`doc_freqs`, `score`),
+so a chunk ranks the same whichever segment holds it. Segments are combined by
+merging their posting lists (`merge`) rather than re-tokenizing the texts.
+"""
+
+import os
+import re
+import hashlib
+import logging
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BM25_K1 = float(os.getenv("CORTEX_BM25_K1", "1.2"))
+BM25_B = float(os.getenv("CORTEX_BM25_B", "0.75"))
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how in is it its of on or that the "
+    "their there these this to was were what when where which who why with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric tokens, without common English stopwords."""
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _term_hash(term: str) -> int:
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def query_terms(text: str) -> np.ndarray:
+    """Sorted unique term hashes of a query text."""
+    return np.array(sorted({_term_hash(t) for t in tokenize(text)}), dtype=np.uint64)
+
+
+def bm25_idf(count: int, doc_freqs: np.ndarray) -> np.ndarray:
+    """Okapi BM25 inverse document frequency of each term among `count` documents."""
+    df = np.minimum(np.asarray(doc_freqs, dtype=np.float64), count)
+    return np.log(1.0 + (count - df + 0.5) / (df + 0.5))
+
+
+def _empty() -> Tuple[np.ndarray, np.ndarray]:
+    return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+
+class BM25Index:
+    """Inverted index of a shard's chunk texts, scored with Okapi BM25."""
+
+    FILES = ("bm25_terms.npy", "bm25_offsets.npy", "bm25_docs.npy", "bm25_tf.npy", "bm25_lengths.npy")
+
+    def __init__(self, terms: np.ndarray, offsets: np.ndarray, docs: np.ndarray, tf: np.ndarray, lengths: np.ndarray):
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.tf = tf
+        self.lengths = lengths
+        self.avg_length = float(np.mean(lengths)) if len(lengths) else 0.0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(int(a.nbytes) for a in (self.terms, self.offsets, self.docs, self.tf, self.lengths))
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> "BM25Index":
+        rows: List[int] = []
+        terms: List[str] = []
+        tfs: List[int] = []
+        lengths: List[int] = []
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                rows.append(row)
+                terms.append(term)
+                tfs.append(tf)
+
+        hashes = {term: _term_hash(term) for term in set(terms)}
+        term_hashes = np.fromiter((hashes[t] for t in terms), dtype=np.uint64, count=len(terms))
+        return cls._from_postings(
+            term_hashes, np.asarray(rows, dtype=np.int32), np.asarray(tfs, dtype=np.int64), np.asarray(lengths, dtype=np.int32)
+        )
+
+    @classmethod
+    def merge(cls, parts: Iterable[Tuple["BM25Index", np.ndarray]]) -> "BM25Index":
+        """Combine indexes without re-tokenizing their texts.
+
+        Args:
+            parts: (index, rows to keep, ascending) per index; the kept rows are
+                renumbered consecutively across parts, in order
+        """
+        hashes, docs, tfs, lengths = [], [], [], []
+        base = 0
+        for index, rows in parts:
+            rows = np.asarray(rows, dtype=np.int64)
+            renumber = np.full(len(index.lengths), -1, dtype=np.int64)
+            renumber[rows] = base + np.arange(len(rows))
+            new_docs = renumber[np.asarray(index.docs)]
+            kept = new_docs >= 0
+            hashes.append(np.repeat(np.asarray(index.terms), np.diff(np.asarray(index.offsets)))[kept])
+            docs.append(new_docs[kept].astype(np.int32))
+            tfs.append(np.asarray(index.tf)[kept])
+            lengths.append(np.asarray(index.lengths)[rows])
+            base += len(rows)
+        return cls._from_postings(
+            np.concatenate(hashes) if hashes else np.empty(0, dtype=np.uint64),
+            np.concatenate(docs) if docs else np.empty(0, dtype=np.int32),
+            np.concatenate(tfs) if tfs else np.empty(0, dtype=np.int64),
+            np.concatenate(lengths) if lengths else np.empty(0, dtype=np.int32),
+        )
+
+    @classmethod
+    def _from_postings(cls, term_hashes: np.ndarray, docs: np.ndarray, tfs: np.ndarray, lengths: np.ndarray) -> "BM25Index":
+        order = np.lexsort((docs, term_hashes))
+        term_hashes = term_hashes[order]
+        unique, starts = np.unique(term_hashes, return_index=True)
+        return cls(
+            unique,
+            np.append(starts, len(term_hashes)).astype(np.int64),
+            docs[order].astype(np.int32),
+            np.minimum(tfs[order], np.iinfo(np.uint16).max).astype(np.uint16),
+            lengths.astype(np.int32),
+        )
+
+    def _positions(self, query: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Position of every query term in `terms`, and whether it occurs at all."""
+        positions = np.searchsorted(self.terms, query)
+        found = positions < len(self.terms)
+        found[found] = self.terms[positions[found]] == query[found]
+        return positions, found
+
+    def doc_freqs(self, query: np.ndarray) -> np.ndarray:
+        """Number of rows containing each of the query term hashes."""
+        df = np.zeros(len(query), dtype=np.int64)
+        if len(self.terms):
+            positions, found = self._positions(query)
+            df[found] = self.offsets[positions[found] + 1] - self.offsets[positions[found]]
+        return df
+
+    @property
+    def total_length(self) -> int:
+        return int(np.sum(self.lengths, dtype=np.int64))
+
+    def search(self, text: str, k: int = 10, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k chunk rows by BM25 score for a query text, with this index's own statistics.
+
+        Args:
+            text: Query text (tokenized like the chunks)
+            k: Number of rows to return; rows matching no query term are never returned
+            mask: Optional boolean array over all rows; False rows are excluded
+
+        Returns:
+            (rows, scores), best first
+        """
+        query = query_terms(text)
+        if len(query) == 0:
+            return _empty()
+        idf = bm25_idf(len(self.lengths), self.doc_freqs(query))
+        return self.score(query, idf, self.avg_length, k=k, mask=mask)
+
+    def score(
+        self,
+        query: np.ndarray,
+        idf: np.ndarray,
+        avg_length: float,
+        k: int = 10,
+        mask: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k rows for query term hashes, scored with the given (e.g. collection-wide) statistics.
+
+        Args:
+            query: Sorted term hashes (see query_terms)
+            idf: Inverse document frequency of each query term (see bm25_idf)
+            avg_length: Average chunk length in tokens
+            k: Number of rows to return
+            mask: Optional boolean array over all rows; False rows are excluded
+        """
+        count = len(self.lengths)
+        if count == 0 or len(query) == 0 or len(self.terms) == 0:
+            return _empty()
+        positions, found = self._positions(query)
+
+        docs, weights = [], []
+        for p, term_idf in zip(positions[found], idf[found]):
+            start, end = int(self.offsets[p]), int(self.offsets[p + 1])
+            rows = np.asarray(self.docs[start:end])
+            tf = np.asarray(self.tf[start:end], dtype=np.float32)
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.lengths[rows] / max(avg_length, 1e-9))
+            docs.append(rows)
+            weights.append(term_idf * tf * (BM25_K1 + 1.0) / (tf + norm))
+        if not docs:
+            return _empty()
+
+        scores = np.bincount(np.concatenate(docs), weights=np.concatenate(weights), minlength=count)
+        if mask is not None:
+            scores[~mask] = 0.0
+        matched = np.flatnonzero(scores > 0)
+        k = min(k, len(matched))
+        if k == 0:
+            return _empty()
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top].astype(np.float32)
+
+    def save(self, path: Path) -> None:
+        for name, array in zip(self.FILES, (self.terms, self.offsets, self.docs, self.tf, self.lengths)):
+            tmp = path / f"{name}.tmp.npy"
+            np.save(tmp, array)
+            os.replace(tmp, path / name)
+
+    @classmethod
+    def load(cls, path: Path, mmap_mode: Optional[str] = "r") -> Optional["BM25Index"]:
+        """Load a saved index, or None if the shard generation predates BM25."""
+        if not all((path / name).exists() for name in cls.FILES):
+            return None
+        return cls(*(np.load(path / name, mmap_mode=mmap_mode) for name in cls.FILES))
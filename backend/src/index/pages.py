@@ -0,0 +1,282 @@
+"""
+Page-text index for local citation verification and highlighting.
+
+Built once per paper at ingest and saved as `<CORTEX_PAGES_DIR>/<paper_id>.json`:
+
+    {
+      "paper_id": ...,
+      "content_hash": sha256 of the PDF bytes,
+      "text": document text (concatenated `page.get_text("text")`, the same
+              offsets used for chunk char_start/char_end),
+      "pages": [ { "page_num", "char_start", "char_end", "width", "height" }, ... ],
+      "words": [ [page_num, char_start, char_end, x0, y0, x1, y1], ... ]
+    }
+
+A citation (snippet and/or char offsets) is then checked against the stored
+text and turned into highlight rectangles without opening the PDF or calling MCP.
+"""
+
+import os
+import json
+import bisect
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+PAGES_DIR = Path(os.getenv("CORTEX_PAGES_DIR", Path(__file__).resolve().parents[2] / "indexes" / "pages"))
+# Budget for page-text indexes held in memory, measured by their JSON file size
+PAGES_CACHE_MB = int(os.getenv("CORTEX_PAGES_CACHE_MB", "64"))
+# Words whose vertical centres are this close (in PDF points) share a highlight line
+LINE_TOLERANCE = 2.0
+
+# paper_id -> ((mtime_ns, size) of the file it was read from, index); least recently used first
+_cache: "OrderedDict[str, Tuple[Tuple[int, int], Dict[str, Any]]]" = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def build_page_index(paper_id: str, pdf_path: str) -> Dict[str, Any]:
+    """Extract page text and word boxes from a PDF and save the page-text index."""
+    import fitz  # PyMuPDF
+
+    text_parts, pages, words = [], [], []
+    offset = 0
+    with fitz.open(pdf_path) as doc:
+        for page_index, page in enumerate(doc):
+            page_num = page_index + 1
+            text = page.get_text("text")
+            # Align each word box with its position in the page text
+            cursor = 0
+            for x0, y0, x1, y1, word, *_ in page.get_text("words"):
+                pos = text.find(word, cursor)
+                if pos < 0:
+                    continue
+                cursor = pos + len(word)
+                words.append([
+                    page_num, offset + pos, offset + cursor,
+                    round(x0, 2), round(y0, 2), round(x1, 2), round(y1, 2),
+                ])
+            pages.append({
+                "page_num": page_num,
+                "char_start": offset,
+                "char_end": offset + len(text),
+                "width": round(page.rect.width, 2),
+                "height": round(page.rect.height, 2),
+            })
+            text_parts.append(text)
+            offset += len(text)
+
+    index = {
+        "paper_id": paper_id,
+        "content_hash": file_hash(pdf_path),
+        "text": "".join(text_parts),
+        "pages": pages,
+        "words": words,
+    }
+    PAGES_DIR.mkdir(parents=True, exist_ok=True)
+    path = PAGES_DIR / f"{paper_id}.json"
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(index, separators=(",", ":")))
+    os.replace(tmp, path)
+    _forget(paper_id)
+    logger.info(f"Built page-text index for paper {paper_id} ({len(pages)} pages, {len(words)} words)")
+    return index
+
+
+def delete_page_index(paper_id: str) -> None:
+    (PAGES_DIR / f"{paper_id}.json").unlink(missing_ok=True)
+    _forget(paper_id)
+
+
+def _forget(paper_id: str) -> None:
+    global _cache_bytes
+    with _cache_lock:
+        entry = _cache.pop(paper_id, None)
+        if entry is not None:
+            _cache_bytes -= entry[0][1]
+
+
+def load_page_index(paper_id: str) -> Optional[Dict[str, Any]]:
+    """Page-text index for a paper, or None if it was never built.
+
+    Indexes are cached per process up to PAGES_CACHE_MB of JSON, least recently
+    used first out. A cached index is reused only while the file's mtime and size
+    are unchanged, so a rebuild by another worker is picked up on the next call.
+    """
+    global _cache_bytes
+    path = PAGES_DIR / f"{paper_id}.json"
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        _forget(paper_id)
+        return None
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        entry = _cache.get(paper_id)
+        if entry is not None and entry[0] == stamp:
+            _cache.move_to_end(paper_id)
+            return entry[1]
+
+    try:
+        index = json.loads(path.read_text())
+    except FileNotFoundError:
+        _forget(paper_id)
+        return None
+    # Sorted word starts for bisecting character ranges
+    index["word_starts"] = [w[1] for w in index["words"]]
+    index["page_starts"] = [p["char_start"] for p in index["pages"]]
+
+    with _cache_lock:
+        old = _cache.pop(paper_id, None)
+        if old is not None:
+            _cache_bytes -= old[0][1]
+        _cache[paper_id] = (stamp, index)
+        _cache_bytes += stamp[1]
+        # Always keep the index just loaded, even if it alone exceeds the budget
+        while len(_cache) > 1 and _cache_bytes > PAGES_CACHE_MB * 1024 * 1024:
+            _, (evicted_stamp, _) = _cache.popitem(last=False)
+            _cache_bytes -= evicted_stamp[1]
+    return index
+
+
+def page_for_offset(index: Dict[str, Any], char_offset: int) -> int:
+    i = bisect.bisect_right(index["page_starts"], char_offset) - 1
+    return index["pages"][max(i, 0)]["page_num"]
+
+
+def highlight_rects(index: Dict[str, Any], char_start: int, char_end: int) -> List[Dict[str, Any]]:
+    """Rectangles covering [char_start, char_end), one per text line, in PDF points.
+
+    Returns:
+        [ { page_num, x0, y0, x1, y1 }, ... ] in reading order
+    """
+    words = index["words"]
+    i = max(bisect.bisect_right(index["word_starts"], char_start) - 1, 0)
+    rects: List[Dict[str, Any]] = []
+    for page_num, start, end, x0, y0, x1, y1 in words[i:]:
+        if start >= char_end:
+            break
+        if end <= char_start:
+            continue
+        last = rects[-1] if rects else None
+        if (
+            last is not None
+            and last["page_num"] == page_num
+            and abs((last["y0"] + last["y1"]) - (y0 + y1)) / 2 <= LINE_TOLERANCE
+        ):
+            last["x0"], last["x1"] = min(last["x0"], x0), max(last["x1"], x1)
+            last["y0"], last["y1"] = min(last["y0"], y0), max(last["y1"], y1)
+        else:
+            rects.append({"page_num": page_num, "x0": x0, "y0": y0, "x1": x1, "y1": y1})
+    return rects
+
+
+def verify_citation(
+    paper_id: str,
+    snippet: Optional[str] = None,
+    char_start: Optional[int] = None,
+    char_end: Optional[int] = None,
+    content_hash: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """Check a cited span against the paper's page-text index.
+
+    The span is "verified" when the text at [char_start, char_end) matches the
+    snippet (whitespace-insensitive) or the given sha256 content hash. If the
+    offsets are missing or stale but the snippet occurs elsewhere in the paper,
+    the span is "relocated" to that position. Offsets given without a snippet or
+    hash have nothing to be checked against and come back "unverified".
+
+    Args:
+        paper_id: Paper the citation points into
+        snippet: Cited text, if known
+        char_start: Start offset into the document text
+        char_end: End offset into the document text
+        content_hash: Optional sha256 of the cited text
+
+    Returns:
+        { verification_status, paper_id, page_num, char_start, char_end, text, highlights },
+        with status "verified", "relocated", "unverified" or "failed"; None if the
+        paper has no page index
+    """
+    index = load_page_index(paper_id)
+    if index is None:
+        return None
+    text = index["text"]
+    start = end = None
+
+    if char_start is not None and char_end is not None and 0 <= char_start < char_end <= len(text):
+        span = text[char_start:char_end]
+        if (content_hash and text_hash(span) == content_hash) or (
+            snippet and _normalize(snippet) in _normalize(span)
+        ):
+            start, end, status = char_start, char_end, "verified"
+        elif not snippet and not content_hash:
+            start, end, status = char_start, char_end, "unverified"
+
+    if start is None and snippet:
+        located = _find(text, snippet)
+        if located is not None:
+            start, end = located
+            status = "relocated"
+
+    if start is None:
+        return {"verification_status": "failed", "paper_id": paper_id, "error": "Snippet not found in paper"}
+
+    return {
+        "verification_status": status,
+        "paper_id": paper_id,
+        "page_num": page_for_offset(index, start),
+        "char_start": start,
+        "char_end": end,
+        "text": text[start:end],
+        "highlights": highlight_rects(index, start, end),
+    }
+
+
+def _find(text: str, snippet: str) -> Optional[tuple]:
+    """Locate a snippet in the text, tolerating different whitespace/line breaks."""
+    pos = text.find(snippet)
+    if pos >= 0:
+        return pos, pos + len(snippet)
+    tokens = snippet.split()
+    if not tokens:
+        return None
+    # Anchor on the first token, then walk both strings token by token
+    pos = text.find(tokens[0])
+    while pos >= 0:
+        end = _match_tokens(text, pos, tokens)
+        if end is not None:
+            return pos, end
+        pos = text.find(tokens[0], pos + 1)
+    return None
+
+
+def _match_tokens(text: str, pos: int, tokens: List[str]) -> Optional[int]:
+    for token in tokens:
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        if not text.startswith(token, pos):
+            return None
+        pos += len(token)
+    return pos
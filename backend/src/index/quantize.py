@@ -0,0 +1,166 @@
+"""
+Compressed storage for shard vectors.
+
+    int8  scalar quantization, one symmetric scale per dimension      (4x smaller)
+    pq    product quantization, `m` uint8 codes per vector              (4*dim/m x smaller)
+
+Quantized codes are what a shard keeps hot; the float32 vectors stay on disk
+(memory-mapped) and are only touched to re-score the best candidates exactly.
+
+Saved next to the shard as:
+
+    quant_codes.npy      int8 (count, dim) or uint8 (count, m)
+    quant_codebook.npy   float32 (dim,) scales or (m, 256, dim/m) centroids
+"""
+
+import os
+import logging
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: exact float32 search unless set (see benchmarks/quantization.py for recall)
+QUANTIZATION = os.getenv("CORTEX_INDEX_QUANTIZATION", "none")  # none | int8 | pq
+PQ_SUBVECTORS = int(os.getenv("CORTEX_PQ_SUBVECTORS", "0"))  # 0 = dim / 8
+RESCORE_FACTOR = int(os.getenv("CORTEX_RESCORE_FACTOR", "4"))
+PQ_CENTROIDS = 256
+PQ_TRAIN_SAMPLE = 20000
+PQ_KMEANS_ITERATIONS = 10
+
+
+class Quantizer(ABC):
+    """Base class: encode vectors to compact codes and score codes against a query."""
+
+    mode = "none"
+    FILES = ("quant_codes.npy", "quant_codebook.npy")
+
+    def __init__(self, codebook: np.ndarray):
+        self.codebook = codebook
+
+    @classmethod
+    @abstractmethod
+    def train(cls, vectors: np.ndarray) -> "Quantizer":
+        """Fit the codebook to a sample of the vectors."""
+
+    @abstractmethod
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Compact codes, one row per vector."""
+
+    @abstractmethod
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate inner products between each code row and the query."""
+
+    def save(self, path: Path, codes: np.ndarray) -> None:
+        for name, array in zip(self.FILES, (codes, self.codebook)):
+            tmp = path / f"{name}.tmp.npy"
+            np.save(tmp, array)
+            os.replace(tmp, path / name)
+
+    @classmethod
+    def delete(cls, path: Path) -> None:
+        for name in cls.FILES:
+            (path / name).unlink(missing_ok=True)
+
+
+class ScalarQuantizer(Quantizer):
+    """int8 codes with a symmetric per-dimension scale."""
+
+    mode = "int8"
+
+    @classmethod
+    def train(cls, vectors: np.ndarray) -> "ScalarQuantizer":
+        scale = np.abs(np.asarray(vectors, dtype=np.float32)).max(axis=0) / 127.0
+        scale[scale == 0] = 1.0
+        return cls(scale.astype(np.float32))
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(vectors / self.codebook), -127, 127).astype(np.int8)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) @ (query * self.codebook)
+
+
+def _kmeans(data: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """Plain (euclidean) k-means, used per PQ subspace."""
+    centroids = data[rng.choice(len(data), k, replace=len(data) < k)].copy()
+    for _ in range(PQ_KMEANS_ITERATIONS):
+        labels = _nearest_euclidean(centroids, data)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, data)
+        sizes = np.bincount(labels, minlength=k)
+        filled = sizes > 0
+        centroids[filled] = sums[filled] / sizes[filled, None]
+    return centroids
+
+
+def _nearest_euclidean(centroids: np.ndarray, data: np.ndarray) -> np.ndarray:
+    distances = (centroids ** 2).sum(axis=1) - 2.0 * (data @ centroids.T)
+    return np.argmin(distances, axis=1)
+
+
+class ProductQuantizer(Quantizer):
+    """`m` sub-vector codebooks of 256 centroids; scores use asymmetric distance tables."""
+
+    mode = "pq"
+
+    @staticmethod
+    def subvectors_for(dim: int) -> int:
+        target = PQ_SUBVECTORS or max(1, dim // 8)
+        # Largest divisor of dim not above the target, so every sub-vector has the same width
+        return next(m for m in range(min(target, dim), 0, -1) if dim % m == 0)
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, m: Optional[int] = None, seed: int = 0) -> "ProductQuantizer":
+        count, dim = vectors.shape
+        m = m or cls.subvectors_for(dim)
+        rng = np.random.default_rng(seed)
+        sample = np.asarray(vectors[np.sort(rng.choice(count, min(count, PQ_TRAIN_SAMPLE), replace=False))], dtype=np.float32)
+        sub = sample.reshape(len(sample), m, dim // m)
+        codebook = np.stack([_kmeans(sub[:, j], PQ_CENTROIDS, rng) for j in range(m)]).astype(np.float32)
+        logger.info(f"Trained PQ with {m} sub-vectors on {len(sample)} of {count} vectors")
+        return cls(codebook)
+
+    @property
+    def m(self) -> int:
+        return self.codebook.shape[0]
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        sub = vectors.reshape(len(vectors), self.m, -1)
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = _nearest_euclidean(self.codebook[j], sub[:, j])
+        return codes
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        table = np.einsum("mkd,md->mk", self.codebook, query.reshape(self.m, -1))
+        return table[np.arange(self.m), codes].sum(axis=1)
+
+
+QUANTIZERS = {q.mode: q for q in (ScalarQuantizer, ProductQuantizer)}
+
+
+def train_quantizer(mode: str, vectors: np.ndarray) -> Optional[Quantizer]:
+    """Train a quantizer of the given mode, or None for "none".
+
+    PQ needs at least 256 training vectors; smaller shards fall back to int8.
+    """
+    if mode == "none" or len(vectors) == 0:
+        return None
+    if mode == "pq" and len(vectors) < PQ_CENTROIDS:
+        mode = "int8"
+    if mode not in QUANTIZERS:
+        raise ValueError(f"Unknown quantization mode: {mode}")
+    return QUANTIZERS[mode].train(vectors)
+
+
+def load_quantizer(path: Path, mode: str, mmap_mode: Optional[str] = "r"):
+    """Load (quantizer, codes) saved in a shard directory, or (None, None)."""
+    if mode not in QUANTIZERS or not all((path / name).exists() for name in Quantizer.FILES):
+        return None, None
+    codes = np.load(path / "quant_codes.npy", mmap_mode=mmap_mode)
+    return QUANTIZERS[mode](np.load(path / "quant_codebook.npy")), codes
@@ -0,0 +1,867 @@
+"""
+Per-workspace vector index shards.
+
+Every workspace (today: one per user) gets its own shard directory under
+CORTEX_INDEX_DIR holding the chunk vectors and their metadata as a short list of
+immutable segments:
+
+    <CORTEX_INDEX_DIR>/<sha1(workspace_id)>/
+        CURRENT             name of the live generation directory
+        .lock               held (flock) by the process writing a new generation
+        .merge.lock         held by the process merging segments
+        seg-000007/         one run of chunks, never modified once written
+            segment.json    { count, dim, ivf_trained_on, quantization, quant_trained_on }
+            vectors.npy     float32 (count, dim), L2-normalized rows
+            chunks.npy, chunk_strings.bin, papers.json
+                            chunk records (see chunks.py)
+            bm25_*.npy      lexical index of the chunk texts (see lexical.py)
+            ivf_*.npy       IVF lists (see ann.py), once the segment has CORTEX_ANN_MIN_VECTORS rows
+            quant_*.npy     compressed codes (see quantize.py) when CORTEX_INDEX_QUANTIZATION is int8 or pq
+        gen-000042/
+            manifest.json   { workspace_id, dim, count, next_segment,
+                              segments: [ { name, count, deleted } ],
+                              papers: { paper_id: { content_hash, version } } }
+            seg-000007.deleted.npy
+                            int64 rows of that segment whose papers have been removed
+
+A write costs what it changes, not the size of the shard: appended chunks become
+a new segment (their vectors, BM25 postings, IVF lists and codes), removed
+papers become deleted rows, and the segments already on disk are referenced by
+the next generation as they are. After a write, a background thread merges the
+newest segments once they add up to the segment before them, and rewrites a
+segment once most of it is deleted, so a shard keeps O(log n) segments and a
+chunk is rewritten O(log n) times. Merges combine posting lists and reuse IVF
+centroids and quantizer codebooks instead of starting over from the texts.
+BM25 scores every segment with the statistics of the whole shard, so rankings
+do not depend on how the chunks are split (deleted rows still count towards
+document frequencies until their segment is merged).
+
+Every file is memory-mapped read-only, so uvicorn workers searching the same
+shard share one copy of it through the OS page cache and memory stays flat as
+workers are added. A write publishes the next generation by atomically
+replacing CURRENT. Readers in every process notice the new pointer on their next
+query. The previous generation, and the segments it references, is kept so
+that a reader that has just resolved the old pointer can still open it.
+
+Shards are opened lazily on first query and kept in an LRU cache bounded by
+CORTEX_INDEX_RAM_MB. Quantized shards score candidates on their codes and only
+read the float32 rows of the best few to re-score them. Idle workspaces are
+evicted and cost nothing until they are queried again.
+"""
+
+import os
+import json
+import uuid
+import fcntl
+import shutil
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Tuple, Iterator, Iterable
+
+import numpy as np
+
+from .ann import IVFIndex, ANN_NPROBE, ASSIGN_BATCH
+from .chunks import ChunkTable
+from .lexical import BM25Index, query_terms, bm25_idf
+from .quantize import Quantizer, QUANTIZATION, RESCORE_FACTOR, train_quantizer, load_quantizer
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = Path(os.getenv("CORTEX_INDEX_DIR", Path(__file__).resolve().parents[2] / "indexes"))
+INDEX_RAM_MB = int(os.getenv("CORTEX_INDEX_RAM_MB", "512"))
+ANN_MIN_VECTORS = int(os.getenv("CORTEX_ANN_MIN_VECTORS", "20000"))
+# Re-cluster once a segment has grown this many times past the size its lists were trained on
+ANN_RETRAIN_GROWTH = 4
+# The newest segments are merged with the one before them once it is at most this many times their size
+SEGMENT_MERGE_FACTOR = float(os.getenv("CORTEX_SEGMENT_MERGE_FACTOR", "1"))
+# A segment is rewritten on its own once more than this fraction of its rows is deleted
+SEGMENT_MAX_DELETED = 0.5
+# Generations kept on disk: the live one and the one before it
+GENERATIONS_KEPT = 2
+# Files of shards written before generation directories existed
+_LEGACY_FILES = ("manifest.json", "vectors.npy", "chunks.json")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _write_json(path: Path, data: Any) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, path)
+
+
+def _empty_hits() -> Tuple[np.ndarray, np.ndarray]:
+    return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+
+def _top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    k = min(k, len(rows))
+    if k == 0:
+        return _empty_hits()
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return rows[top], scores[top]
+
+
+def live_generation(shard_dir: Path) -> Optional[Path]:
+    """Directory of the shard's published generation, or None if it has no index yet."""
+    try:
+        return shard_dir / (shard_dir / "CURRENT").read_text().strip()
+    except FileNotFoundError:
+        # Shards written before generations held their files directly in shard_dir
+        return shard_dir if (shard_dir / "manifest.json").exists() else None
+
+
+def _merge_plan(entries: List[Dict[str, Any]]) -> Optional[slice]:
+    """The segments to merge next, as a slice of a manifest's (oldest first) segment entries, or None.
+
+    A mostly deleted segment is rewritten on its own. Otherwise the newest
+    segments are merged with every segment before them that is at most
+    SEGMENT_MERGE_FACTOR times their combined live rows, so segment sizes grow
+    geometrically with age.
+    """
+    for i, entry in enumerate(entries):
+        if entry.get("deleted", 0) > SEGMENT_MAX_DELETED * entry["count"]:
+            return slice(i, i + 1)
+    live = [entry["count"] - entry.get("deleted", 0) for entry in entries]
+    if not live:
+        return None
+    start, total = len(live) - 1, live[-1]
+    while start > 0 and live[start - 1] <= SEGMENT_MERGE_FACTOR * total:
+        start -= 1
+        total += live[start]
+    return slice(start, len(live)) if start < len(live) - 1 else None
+
+
+class Segment:
+    """An immutable run of a shard's chunks, memory-mapped read-only, minus its deleted rows."""
+
+    def __init__(self, path: Path, deleted: Optional[np.ndarray] = None, info: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.info = info if info is not None else json.loads((path / "segment.json").read_text())
+        self.vectors = np.load(path / "vectors.npy", mmap_mode="r")
+        self.chunks = ChunkTable.load(path)
+        self.ivf = IVFIndex.load(path)
+        self.lexical = BM25Index.load(path)
+        self.quantizer, self.codes = load_quantizer(path, self.info.get("quantization", "none"))
+        self.deleted = np.empty(0, dtype=np.int64) if deleted is None else deleted
+        self.live: Optional[np.ndarray] = None
+        if len(self.deleted):
+            self.live = np.ones(len(self.chunks), dtype=bool)
+            self.live[self.deleted] = False
+        self._live_length: Optional[int] = None
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    @property
+    def dim(self) -> int:
+        return int(self.vectors.shape[1]) if self.vectors.ndim == 2 else 0
+
+    def __len__(self) -> int:
+        """Number of rows not deleted."""
+        return len(self.chunks) - len(self.deleted)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate resident size once its pages are touched (see VectorShard.nbytes)."""
+        size = self.chunks.nbytes
+        size += int(self.codes.nbytes) if self.codes is not None else int(self.vectors.nbytes)
+        if self.ivf is not None:
+            size += self.ivf.nbytes
+        if self.lexical is not None:
+            size += self.lexical.nbytes
+        if self.live is not None:
+            size += int(self.live.nbytes)
+        return size
+
+    def live_rows(self) -> np.ndarray:
+        rows = np.arange(len(self.chunks))
+        return rows if self.live is None else rows[self.live]
+
+    def rows_of(self, paper_ids: Iterable[str]) -> np.ndarray:
+        """Live rows holding chunks of the given papers."""
+        paper_ids = set(paper_ids)
+        if paper_ids.isdisjoint(self.chunks.papers):
+            return np.empty(0, dtype=np.int64)
+        rows = self.live_rows()
+        return rows[self.chunks.paper_mask(rows, paper_ids)]
+
+    def lexical_index(self) -> BM25Index:
+        if self.lexical is None:
+            # Written before BM25; the next merge of this segment persists one
+            logger.info(f"Building in-memory BM25 index for {self.path}")
+            self.lexical = BM25Index.build(self.chunks[i]["text"] for i in range(len(self.chunks)))
+        return self.lexical
+
+    @property
+    def live_length(self) -> int:
+        """Tokens in the live rows, for the shard's average chunk length."""
+        if self._live_length is None:
+            lengths = np.asarray(self.lexical_index().lengths)
+            if self.live is not None:
+                lengths = lengths[self.live]
+            self._live_length = int(lengths.sum(dtype=np.int64))
+        return self._live_length
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        paper_ids: Optional[List[str]],
+        nprobe: int,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (rows, cosine similarities) for a normalized query vector."""
+        if paper_ids is not None:
+            rows = self.rows_of(paper_ids)
+        elif self.ivf is not None:
+            rows = np.sort(self.ivf.candidates(query, nprobe))
+            if self.live is not None:
+                rows = rows[self.live[rows]]
+        else:
+            rows = self.live_rows()
+        if len(rows) == 0:
+            return _empty_hits()
+        if self.quantizer is not None:
+            # Shortlist on the codes, then re-score the shortlist exactly
+            approx = self.quantizer.scores(self.codes[rows], query)
+            shortlist = min(k * RESCORE_FACTOR, len(rows))
+            rows = np.sort(rows[np.argpartition(-approx, shortlist - 1)[:shortlist]])
+        return _top_k(rows, self.vectors[rows] @ query, k)
+
+    def lexical_search(
+        self,
+        query: np.ndarray,
+        idf: np.ndarray,
+        avg_length: float,
+        k: int,
+        paper_ids: Optional[List[str]],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (rows, BM25 scores) for query term hashes, with shard-wide statistics."""
+        mask = self.live
+        if paper_ids is not None:
+            mask = np.zeros(len(self.chunks), dtype=bool)
+            mask[self.rows_of(paper_ids)] = True
+        return self.lexical_index().score(query, idf, avg_length, k=k, mask=mask)
+
+
+def _load_deleted(generation: Path, entry: Dict[str, Any]) -> Optional[np.ndarray]:
+    if not entry.get("deleted"):
+        return None
+    return np.load(generation / f"{entry['name']}.deleted.npy")
+
+
+class VectorShard:
+    """One generation of a workspace's chunk vectors: its segments, memory-mapped read-only from disk."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.manifest = json.loads((path / "manifest.json").read_text())
+        entries = self.manifest.get("segments")
+        if entries is None:
+            # Generation written before segments: its own files are the one segment
+            self.segments = [Segment(path, info=self.manifest)]
+        else:
+            self.segments = [Segment(path.parent / entry["name"], _load_deleted(path, entry)) for entry in entries]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate resident size of the shard once its pages are touched.
+
+        With quantization only the codes count; the float32 vectors are read for a
+        handful of re-scored rows per query.
+        """
+        return sum(segment.nbytes for segment in self.segments)
+
+    def __len__(self) -> int:
+        return sum(len(segment) for segment in self.segments)
+
+    @property
+    def papers(self) -> List[str]:
+        """Ids of the papers with chunks in any segment (deleted ones included)."""
+        return list(dict.fromkeys(p for segment in self.segments for p in segment.chunks.papers))
+
+    def _merge_hits(self, hits: List[Tuple[Segment, np.ndarray, np.ndarray]], k: int) -> List[Tuple[Dict[str, Any], float]]:
+        ranked = sorted(
+            ((float(score), i, int(row)) for i, (_, rows, scores) in enumerate(hits) for row, score in zip(rows, scores)),
+            key=lambda hit: -hit[0],
+        )
+        return [(hits[i][0].chunks[row], score) for score, i, row in ranked[:k]]
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 5,
+        paper_ids: Optional[List[str]] = None,
+        nprobe: Optional[int] = None,
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        """Return the top-k (chunk, cosine similarity) pairs for a query vector.
+
+        Segments with IVF lists are searched approximately; smaller segments, and
+        searches restricted to `paper_ids`, exactly. A paper's chunks are spread
+        over many lists, so probing first would drop most of them.
+
+        Args:
+            query: Query embedding (any norm)
+            k: Number of results to return
+            paper_ids: Optional list of paper ids to restrict the search to
+            nprobe: IVF lists to probe (defaults to CORTEX_ANN_NPROBE)
+        """
+        query = _normalize(query)
+        hits = [
+            (segment, *segment.search(query, k, paper_ids, nprobe or ANN_NPROBE))
+            for segment in self.segments
+            if len(segment)
+        ]
+        return self._merge_hits(hits, k)
+
+    def lexical_search(
+        self,
+        text: str,
+        k: int = 5,
+        paper_ids: Optional[List[str]] = None,
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        """Return the top-k (chunk, BM25 score) pairs for a query text."""
+        count = len(self)
+        query = query_terms(text)
+        if count == 0 or len(query) == 0:
+            return []
+        segments = [segment for segment in self.segments if len(segment)]
+        doc_freqs = sum(segment.lexical_index().doc_freqs(query) for segment in segments)
+        idf = bm25_idf(count, doc_freqs)
+        avg_length = sum(segment.live_length for segment in segments) / count
+        hits = [(segment, *segment.lexical_search(query, idf, avg_length, k, paper_ids)) for segment in segments]
+        return self._merge_hits(hits, k)
+
+
+class ShardManager:
+    """Opens workspace shards on demand and evicts the least recently used ones
+    once the mapped shards exceed the RAM budget."""
+
+    def __init__(self, root: Path = INDEX_DIR, ram_budget_mb: int = INDEX_RAM_MB, auto_merge: bool = True):
+        self.root = Path(root)
+        self.ram_budget = ram_budget_mb * 1024 * 1024
+        # Merge segments in a background thread after writes; merge_segments() does it inline
+        self.auto_merge = auto_merge
+        self._open: "OrderedDict[str, VectorShard]" = OrderedDict()
+        self._merging: set = set()
+        self._lock = threading.RLock()
+
+    def shard_path(self, workspace_id: str) -> Path:
+        return self.root / hashlib.sha1(workspace_id.encode("utf-8")).hexdigest()
+
+    @property
+    def resident_bytes(self) -> int:
+        with self._lock:
+            return sum(shard.nbytes for shard in self._open.values())
+
+    def get(self, workspace_id: str) -> Optional[VectorShard]:
+        """Return the workspace's live shard generation, opening it if needed. None if it has no index yet.
+
+        Any process may have published a newer generation since the last call; the
+        CURRENT pointer is re-read every time so stale generations are swapped out.
+        """
+        with self._lock:
+            shard_dir = self.shard_path(workspace_id)
+            for attempt in range(2):
+                live = live_generation(shard_dir)
+                if live is None:
+                    self._open.pop(workspace_id, None)
+                    return None
+                shard = self._open.get(workspace_id)
+                if shard is not None and shard.path == live:
+                    self._open.move_to_end(workspace_id)
+                    return shard
+                try:
+                    shard = VectorShard(live)
+                    break
+                except FileNotFoundError:
+                    # The generation was pruned between reading CURRENT and opening it
+                    if attempt:
+                        raise
+            self._open[workspace_id] = shard
+            self._open.move_to_end(workspace_id)
+            self._evict()
+            logger.info(
+                f"Opened index shard for workspace {workspace_id} "
+                f"({len(shard)} chunks in {len(shard.segments)} segments, {live.name})"
+            )
+            return shard
+
+    def _evict(self) -> None:
+        # Always keep the most recently used shard, even if it alone exceeds the budget
+        while len(self._open) > 1 and self.resident_bytes > self.ram_budget:
+            workspace_id, _ = self._open.popitem(last=False)
+            logger.info(f"Evicted index shard for workspace {workspace_id}")
+
+    def invalidate(self, workspace_id: str) -> None:
+        with self._lock:
+            self._open.pop(workspace_id, None)
+
+    @staticmethod
+    @contextmanager
+    def _write_lock(path: Path) -> Iterator[None]:
+        """Serialize writers to one shard across worker processes and threads.
+
+        flock locks belong to the open file, so two threads of one process exclude
+        each other too. Searches never take this lock.
+        """
+        path.mkdir(parents=True, exist_ok=True)
+        with open(path / ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    @contextmanager
+    def _merge_lock(path: Path) -> Iterator[bool]:
+        """Try to become the shard's only merger; yields whether that succeeded. Never blocks."""
+        path.mkdir(parents=True, exist_ok=True)
+        with open(path / ".merge.lock", "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def search(
+        self,
+        workspace_id: str,
+        query: np.ndarray,
+        k: int = 5,
+        paper_ids: Optional[List[str]] = None,
+        nprobe: Optional[int] = None,
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        shard = self.get(workspace_id)
+        if shard is None:
+            return []
+        return shard.search(query, k=k, paper_ids=paper_ids, nprobe=nprobe)
+
+    def lexical_search(
+        self,
+        workspace_id: str,
+        text: str,
+        k: int = 5,
+        paper_ids: Optional[List[str]] = None,
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        shard = self.get(workspace_id)
+        if shard is None:
+            return []
+        return shard.lexical_search(text, k=k, paper_ids=paper_ids)
+
+    def add_chunks(
+        self,
+        workspace_id: str,
+        chunks: List[Dict[str, Any]],
+        vectors: np.ndarray,
+        papers: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> None:
+        """Append chunks and their embeddings to a workspace shard."""
+        self.replace_papers(workspace_id, [], chunks, vectors, papers)
+
+    def remove_paper(self, workspace_id: str, paper_id: str) -> int:
+        """Drop every chunk of a paper from the workspace shard. Returns the number removed."""
+        return self.replace_papers(workspace_id, [paper_id])
+
+    def indexed_papers(self, workspace_id: str) -> Dict[str, Dict[str, Any]]:
+        """Papers in the workspace's live generation, mapped to what they were indexed from.
+
+        Entries hold the `content_hash` (and storage `version`) recorded at index
+        time; shards written before these were recorded map their papers to {}.
+        """
+        shard = self.get(workspace_id)
+        if shard is None:
+            return {}
+        papers = shard.manifest.get("papers")
+        if papers is None:
+            return {paper_id: {} for paper_id in shard.papers}
+        return {paper_id: dict(info) for paper_id, info in papers.items()}
+
+    def replace_papers(
+        self,
+        workspace_id: str,
+        paper_ids: List[str],
+        chunks: Optional[List[Dict[str, Any]]] = None,
+        vectors: Optional[np.ndarray] = None,
+        papers: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> int:
+        """Drop the chunks of `paper_ids`, then append `chunks`, as one new generation.
+
+        The removed chunks are marked deleted and the appended ones written as a new
+        segment; existing segments are left as they are.
+
+        Args:
+            workspace_id: Workspace whose shard is updated
+            paper_ids: Papers whose chunks (and recorded hashes) are removed
+            chunks: Chunks to append, e.g. the re-extracted chunks of those papers
+            vectors: Embeddings of `chunks`, one row each
+            papers: paper_id -> {content_hash, version} recorded in the manifest for
+                the appended papers, so the re-indexer can tell when they change
+
+        Returns:
+            Number of chunks removed
+        """
+        chunks = list(chunks or [])
+        if len(chunks) != (0 if vectors is None else len(vectors)):
+            raise ValueError("chunks and vectors must have the same length")
+        removed_ids, papers = set(paper_ids), papers or {}
+        path = self.shard_path(workspace_id)
+        if not chunks and not papers and (not removed_ids or live_generation(path) is None):
+            return 0
+
+        with self._write_lock(path):
+            live = live_generation(path)
+            if live is None and not chunks:
+                return 0  # nothing indexed yet and nothing to add
+            current = VectorShard(live) if live is not None else None
+            manifest = current.manifest if current is not None else {}
+            segments = current.segments if current is not None else []
+            recorded = manifest.get("papers")
+            if recorded is None:
+                # Shard written before per-paper hashes: its papers are known, their hashes not
+                recorded = {paper_id: {} for paper_id in current.papers} if current is not None else {}
+            recorded = {pid: info for pid, info in recorded.items() if pid not in removed_ids}
+            recorded.update(papers)
+            for chunk in chunks:
+                recorded.setdefault(chunk["paper_id"], {})
+
+            deleted = {segment.name: segment.deleted for segment in segments}
+            removed = 0
+            if removed_ids:
+                for segment in segments:
+                    rows = segment.rows_of(removed_ids)
+                    if len(rows):
+                        deleted[segment.name] = np.union1d(segment.deleted, rows)
+                        removed += len(rows)
+            if not removed and not chunks and recorded == manifest.get("papers"):
+                return 0
+
+            dim = next((segment.dim for segment in segments if len(segment.chunks)), 0)
+            if chunks:
+                vectors = _normalize(vectors)
+                if dim and dim != vectors.shape[1]:
+                    raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {dim}")
+                dim = int(vectors.shape[1])
+
+            next_segment = manifest.get("next_segment", 1)
+            entries = manifest.get("segments")
+            if entries is None:
+                # First write since segments: copy the old generation's live rows into one
+                entries = []
+                if segments:
+                    legacy = segments[0]
+                    keep = np.setdiff1d(np.arange(len(legacy.chunks)), deleted.pop(legacy.name))
+                    if len(keep):
+                        build = self._build_dir(path)
+                        self._merge_into(build, [(legacy, keep)])
+                        name = self._install(build, path, next_segment)
+                        next_segment += 1
+                        entries.append({"name": name, "count": len(keep), "deleted": 0})
+            else:
+                entries = [{**entry, "deleted": len(deleted[entry["name"]])} for entry in entries]
+
+            if chunks:
+                build = self._build_dir(path)
+                np.save(build / "vectors.npy", vectors)
+                self._finish_segment(build, vectors, ChunkTable.from_records(chunks), BM25Index.build(c["text"] for c in chunks))
+                name = self._install(build, path, next_segment)
+                next_segment += 1
+                entries.append({"name": name, "count": len(chunks), "deleted": 0})
+
+            self._publish(path, {
+                "workspace_id": workspace_id,
+                "dim": dim,
+                "next_segment": next_segment,
+                "segments": entries,
+                "papers": recorded,
+            }, deleted)
+            self.invalidate(workspace_id)
+
+        if self.auto_merge and _merge_plan(entries) is not None:
+            self._schedule_merge(workspace_id)
+        return removed
+
+    def merge_segments(self, workspace_id: str) -> int:
+        """Merge the workspace's segments until the merge policy asks for nothing more.
+
+        Segments are merged outside the write lock, so writers are not held up
+        meanwhile; rows they delete from the merged segments in the meantime stay
+        deleted in the result. Returns immediately if another thread or process is
+        already merging this shard.
+
+        Returns:
+            Number of merges published
+        """
+        path = self.shard_path(workspace_id)
+        merges = 0
+        with self._merge_lock(path) as acquired:
+            if not acquired:
+                return 0
+            while True:
+                live = live_generation(path)
+                if live is None:
+                    break
+                shard = VectorShard(live)
+                entries = shard.manifest.get("segments")
+                span = _merge_plan(entries) if entries is not None else None
+                if span is None:
+                    break
+                parts = [(segment, segment.live_rows()) for segment in shard.segments[span]]
+                build = None
+                try:
+                    if any(len(keep) for _, keep in parts):
+                        build = self._build_dir(path)
+                        self._merge_into(build, parts)
+                    with self._write_lock(path):
+                        merged = self._commit_merge(workspace_id, path, parts, build)
+                        build = None
+                finally:
+                    if build is not None:
+                        shutil.rmtree(build, ignore_errors=True)
+                if not merged:
+                    break
+                merges += 1
+                logger.info(
+                    f"Merged {len(parts)} segments of workspace {workspace_id} "
+                    f"({sum(len(keep) for _, keep in parts)} chunks)"
+                )
+        return merges
+
+    def _schedule_merge(self, workspace_id: str) -> None:
+        with self._lock:
+            if workspace_id in self._merging:
+                return
+            self._merging.add(workspace_id)
+
+        def run() -> None:
+            try:
+                self.merge_segments(workspace_id)
+            except Exception as e:
+                logger.error(f"Merging index segments of workspace {workspace_id} failed: {e}")
+            finally:
+                with self._lock:
+                    self._merging.discard(workspace_id)
+
+        threading.Thread(target=run, name=f"merge-segments-{workspace_id}", daemon=True).start()
+
+    def _commit_merge(
+        self,
+        workspace_id: str,
+        shard_dir: Path,
+        parts: List[Tuple[Segment, np.ndarray]],
+        build: Optional[Path],
+    ) -> bool:
+        """Replace the merged segments by `build` in a new generation. Callers hold the write lock."""
+        current = VectorShard(live_generation(shard_dir))
+        entries = current.manifest.get("segments") or []
+        names = [entry["name"] for entry in entries]
+        sources = [segment.name for segment, _ in parts]
+        start = names.index(sources[0]) if sources[0] in names else -1
+        if start < 0 or names[start:start + len(sources)] != sources:
+            if build is not None:
+                shutil.rmtree(build, ignore_errors=True)
+            return False
+
+        # Rows deleted while merging, renumbered into the merged segment
+        deleted = {segment.name: segment.deleted for segment in current.segments}
+        late, offset = [], 0
+        for segment, keep in parts:
+            rows = np.setdiff1d(deleted.pop(segment.name), segment.deleted)
+            late.append(offset + np.searchsorted(keep, rows))
+            offset += len(keep)
+
+        merged = []
+        next_segment = current.manifest.get("next_segment", 1)
+        if build is not None:
+            name = self._install(build, shard_dir, next_segment)
+            next_segment += 1
+            deleted[name] = np.concatenate(late)
+            merged.append({"name": name, "count": offset, "deleted": len(deleted[name])})
+        self._publish(shard_dir, {
+            **current.manifest,
+            "next_segment": next_segment,
+            "segments": entries[:start] + merged + entries[start + len(sources):],
+        }, deleted)
+        self.invalidate(workspace_id)
+        return True
+
+    @staticmethod
+    def _build_dir(shard_dir: Path) -> Path:
+        """A scratch directory to build a segment in before it is installed."""
+        path = shard_dir / f".build-{uuid.uuid4().hex}"
+        path.mkdir(parents=True)
+        return path
+
+    @staticmethod
+    def _install(build: Path, shard_dir: Path, number: int) -> str:
+        """Move a built segment to its final name. Callers hold the write lock."""
+        path = shard_dir / f"seg-{number:06d}"
+        if path.exists():
+            shutil.rmtree(path)  # left over from a writer that crashed before publishing
+        os.rename(build, path)
+        return path.name
+
+    @staticmethod
+    def _merge_into(build: Path, parts: List[Tuple[Segment, np.ndarray]]) -> None:
+        """Write the kept rows of several segments, in order, as one segment in `build`."""
+        count = sum(len(keep) for _, keep in parts)
+        dim = next(segment.dim for segment, keep in parts if len(keep))
+        # Copy the vectors block by block instead of loading every segment at once
+        vectors = np.lib.format.open_memmap(build / "vectors.npy", mode="w+", dtype=np.float32, shape=(count, dim))
+        offset = 0
+        for segment, keep in parts:
+            for start in range(0, len(keep), ASSIGN_BATCH):
+                rows = keep[start:start + ASSIGN_BATCH]
+                vectors[offset:offset + len(rows)] = segment.vectors[rows]
+                offset += len(rows)
+        vectors.flush()
+        ShardManager._finish_segment(
+            build,
+            vectors,
+            ChunkTable.concat((segment.chunks, keep) for segment, keep in parts),
+            BM25Index.merge((segment.lexical_index(), keep) for segment, keep in parts),
+            parts,
+        )
+
+    @staticmethod
+    def _finish_segment(
+        build: Path,
+        vectors: np.ndarray,
+        chunks: ChunkTable,
+        lexical: BM25Index,
+        parts: List[Tuple[Segment, np.ndarray]] = (),
+    ) -> None:
+        """Write a segment's chunks, BM25 postings, IVF lists and codes next to its vectors.
+
+        When merging, the IVF centroids and quantizer codebook of the largest source
+        segment are reused while the merged segment is at most ANN_RETRAIN_GROWTH
+        times the size they were trained on; otherwise they are trained afresh.
+        """
+        count = len(vectors)
+        largest = sorted(parts, key=lambda part: -len(part[0].chunks))
+
+        base = next((segment for segment, _ in largest if segment.ivf is not None), None)
+        if base is not None and count <= ANN_RETRAIN_GROWTH * base.info.get("ivf_trained_on", 0):
+            assignments = [
+                np.asarray(segment.ivf.assignments)[keep] if segment is base else base.ivf.assign(segment.vectors[keep])
+                for segment, keep in parts
+            ]
+            ivf, ivf_trained_on = IVFIndex(base.ivf.centroids, np.concatenate(assignments)), base.info["ivf_trained_on"]
+        elif count >= ANN_MIN_VECTORS:
+            ivf, ivf_trained_on = IVFIndex.train(vectors), count
+        else:
+            ivf, ivf_trained_on = None, 0
+
+        base = next(
+            (segment for segment, _ in largest if segment.quantizer is not None and segment.quantizer.mode == QUANTIZATION),
+            None,
+        )
+        if base is not None and count <= ANN_RETRAIN_GROWTH * base.info.get("quant_trained_on", 0):
+            codes = np.concatenate([
+                np.asarray(segment.codes[keep]) if segment is base else base.quantizer.encode(np.asarray(segment.vectors[keep]))
+                for segment, keep in parts
+            ])
+            quantizer, quant_trained_on = base.quantizer, base.info["quant_trained_on"]
+        else:
+            quantizer, quant_trained_on = train_quantizer(QUANTIZATION, vectors), count
+            codes = quantizer.encode(vectors) if quantizer is not None else None
+
+        chunks.save(build)
+        lexical.save(build)
+        if ivf is not None:
+            ivf.save(build)
+        if quantizer is not None:
+            quantizer.save(build, codes)
+        _write_json(build / "segment.json", {
+            "count": count,
+            "dim": int(vectors.shape[1]),
+            "ivf_trained_on": ivf_trained_on,
+            "quantization": quantizer.mode if quantizer is not None else "none",
+            "quant_trained_on": quant_trained_on if quantizer is not None else 0,
+        })
+
+    @staticmethod
+    def _publish(shard_dir: Path, manifest: Dict[str, Any], deleted: Dict[str, np.ndarray]) -> None:
+        """Write the manifest and deleted rows as the shard's next generation and publish it.
+
+        Callers hold the write lock.
+        """
+        live = live_generation(shard_dir)
+        number = int(live.name.split("-")[1]) + 1 if live is not None and live != shard_dir else 1
+        path = shard_dir / f"gen-{number:06d}"
+        if path.exists():
+            shutil.rmtree(path)  # left over from a writer that crashed before publishing
+        path.mkdir()
+
+        for entry in manifest["segments"]:
+            rows = deleted.get(entry["name"])
+            if rows is not None and len(rows):
+                np.save(path / f"{entry['name']}.deleted.npy", np.asarray(rows, dtype=np.int64))
+        count = sum(entry["count"] - entry["deleted"] for entry in manifest["segments"])
+        _write_json(path / "manifest.json", {**manifest, "count": count})
+
+        # Publish: readers switch to the new generation once CURRENT names it
+        tmp = shard_dir / "CURRENT.tmp"
+        tmp.write_text(path.name)
+        os.replace(tmp, shard_dir / "CURRENT")
+        ShardManager._prune(shard_dir)
+
+    @staticmethod
+    def _prune(shard_dir: Path) -> None:
+        """Delete all but the newest GENERATIONS_KEPT generations, the segments none of them
+        reference, abandoned segment builds, and pre-generation files.
+
+        Processes still searching a deleted generation keep their mappings; the
+        files are freed once the last of them moves on.
+        """
+        generations = sorted(p for p in shard_dir.glob("gen-*") if p.is_dir())
+        for old in generations[:-GENERATIONS_KEPT]:
+            shutil.rmtree(old, ignore_errors=True)
+        referenced = set()
+        for generation in generations[-GENERATIONS_KEPT:]:
+            try:
+                manifest = json.loads((generation / "manifest.json").read_text())
+            except FileNotFoundError:
+                continue
+            referenced.update(entry["name"] for entry in manifest.get("segments", []))
+        for segment in shard_dir.glob("seg-*"):
+            if segment.name not in referenced:
+                shutil.rmtree(segment, ignore_errors=True)
+        with ShardManager._merge_lock(shard_dir) as idle:
+            # Builds are only in progress under the write lock (held by the caller) or the merge lock
+            if idle:
+                for build in shard_dir.glob(".build-*"):
+                    shutil.rmtree(build, ignore_errors=True)
+        for name in _LEGACY_FILES:
+            (shard_dir / name).unlink(missing_ok=True)
+        IVFIndex.delete(shard_dir)
+        Quantizer.delete(shard_dir)
+
+
+_manager: Optional[ShardManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_shard_manager() -> ShardManager:
+    """Process-wide shard manager."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ShardManager()
+        return _manager
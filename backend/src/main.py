@@ -1,11 +1,27 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = FastAPI(title="CORTEX", version="0.1.0")
+from .db import cosmos_store
+from .services.compression import CompressionMiddleware
+from .services.storage import check_storage_config
+from .services.responses import FastJSONResponse
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clients are created here, not at import, so a cold start only pays for what it uses
+    check_storage_config()
+    cosmos_store.connect()
+    yield
+    cosmos_store.close()
+
+
+app = FastAPI(title="CORTEX", version="0.1.0", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # CORS (you can restrict origins later)
 app.add_middleware(
@@ -16,12 +32,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# brotli (if installed) or gzip for JSON responses above RESPONSE_COMPRESS_MIN_BYTES
+app.add_middleware(CompressionMiddleware)
+
 # --- Import routers ---
 from .routes import auth
 from .routes.upload import router as upload_router
 from .routes.papers import router as papers_router
 from .routes.chat import router as chat_router
 from .routes.query import router as query_router
+from .routes.index import router as index_router
 app.include_router(query_router)
 
 # --- Register routers ---
@@ -29,8 +49,23 @@ app.include_router(auth.router)
 app.include_router(upload_router)
 app.include_router(papers_router)
 app.include_router(chat_router)
+app.include_router(index_router)
 
 # --- Health check ---
 @app.get("/health")
 async def health():
     return {"ok": True}
+
+
+# --- LLM scheduler metrics (queue depth and wait times per priority) ---
+@app.get("/metrics/llm")
+async def llm_metrics():
+    from .services.llm_scheduler import get_scheduler
+    return get_scheduler().stats()
+
+
+# --- Circuit breaker state per dependency (MCP, Gemini) ---
+@app.get("/metrics/circuits")
+async def circuit_metrics():
+    from .services.circuit_breaker import breaker_stats
+    return breaker_stats()
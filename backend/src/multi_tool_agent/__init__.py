@@ -1,6 +1,7 @@
 """Cortex Assistant AI Agent module for querying research papers and verifying citations."""
 
 from .agent import CortexAgent, handle_question, MCPClient, extract_citation_ids
+from .compare import compare_papers
 
-__all__ = ['CortexAgent', 'handle_question', 'MCPClient', 'extract_citation_ids']
+__all__ = ['CortexAgent', 'handle_question', 'MCPClient', 'extract_citation_ids', 'compare_papers']
 
@@ -13,23 +13,41 @@ MCP Tools Expected:
 - verify_chunk:
   Input: { chunk_id: int }
   Returns: { chunk_id, text, paper_id, title, page_num, char_start, char_end, pdf_url }
+
+Citations that already carry paper_id and char offsets are verified locally against
+the page-text index built at ingest (index/pages.py) instead of calling verify_chunk.
+Paper titles come from the metadata stored with each paper record at upload.
+
+The module uses package-relative imports, so run it as a module from backend/:
+
+    python -m src.multi_tool_agent.agent <collection_id> <question>
+
+(`python agent.py` fails with "attempted relative import with no known parent package").
 """
 
 import os
 import re
 import sys
 import json
+import math
 import logging
 import time
 from typing import Dict, List, Optional, Any
-from sklearn.metrics.pairwise import cosine_similarity
 
 from dotenv import load_dotenv
-import google.generativeai as genai
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+# google.generativeai is imported on first use, see services/gemini.py
+from ..services.gemini import get_genai
+from ..services.llm_scheduler import get_scheduler
+from ..services.llm_cache import get_llm_cache
+from ..services.circuit_breaker import get_breaker, is_server_failure, CircuitOpenError
+from ..services.responses import compact_citations
+from ..index.pages import verify_citation
+from ..db import local_store
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -43,10 +61,7 @@ EMBEDDING_MODEL = "models/gemini-embedding-001"
 # Logger - let the application configure logging at the top level
 logger = logging.getLogger(__name__)
 
-# Configure Gemini
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-else:
+if not GEMINI_API_KEY:
     logger.warning("GEMINI_API_KEY not set. Agent will not be able to use LLM capabilities.")
 
 
@@ -75,7 +90,7 @@ class CortexAgent:
             raise ValueError("GEMINI_API_KEY environment variable is required")
         
         self.model_name = gemini_model or GEMINI_MODEL
-        self.model = genai.GenerativeModel(self.model_name)
+        self.model = get_genai().GenerativeModel(self.model_name)
         
         # Define tools for Gemini function calling
         self.tools = self._define_tools()
@@ -137,7 +152,9 @@ class CortexAgent:
         self,
         collection_id: int,
         question: str,
-        conversation_history: Optional[List[Dict[str, str]]] = None
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        user_id: Optional[str] = None,
+        priority: str = "interactive"
     ) -> Dict[str, Any]:
         """Chat with the agent about research papers.
         
@@ -145,6 +162,8 @@ class CortexAgent:
             collection_id: The collection ID to query
             question: The user's question
             conversation_history: Optional conversation history for context
+            user_id: User the Gemini calls are scheduled for (see llm_scheduler)
+            priority: Scheduler priority ("interactive" or "batch")
             
         Returns:
             Dictionary with keys: answer, citations, reasoning
@@ -178,9 +197,11 @@ class CortexAgent:
             reasoning.append(f"Step 3: Verifying {len(chunk_ids)} citation chunks")
             
             # Verify each chunk
+            citations_by_id = {cit.get("chunk_id"): cit for cit in citations_data}
             for chunk_id in chunk_ids[:5]:  # Limit to 5
                 try:
-                    verify_result = self._call_tool("verify_chunk", {"chunk_id": chunk_id})
+                    logger.info(f"Agent verifying chunk {chunk_id}")
+                    verify_result = resolve_citation(self.mcp_client, chunk_id, citations_by_id.get(chunk_id))
                     verified_citations.append({
                         "chunk_id": chunk_id,
                         "verification_status": "verified",
@@ -189,6 +210,7 @@ class CortexAgent:
                         "snippet": verify_result.get("text", "")[:200],
                         "pdf_url": verify_result.get("pdf_url"),
                         "paper_id": verify_result.get("paper_id"),
+                        "highlights": verify_result.get("highlights"),
                     })
                 except Exception as e:
                     verified_citations.append({
@@ -224,11 +246,21 @@ Based on the initial answer and verified citations above, provide a comprehensiv
 
 Answer:"""
             
-            # Generate answer with Gemini
-            response = self.model.generate_content(prompt)
-            final_answer = response.text if response.text else initial_answer
-            
-            reasoning.append("Step 5: Answer generated successfully")
+            # Generate answer with Gemini, unless this exact prompt was answered before
+            cache = get_llm_cache()
+            cached_answer = cache.get(self.model_name, prompt)
+            if cached_answer is not None:
+                final_answer = cached_answer
+                reasoning.append("Step 5: Answer served from cache")
+            else:
+                response = get_breaker("gemini").call(
+                    get_scheduler().run, self.model.generate_content, prompt,
+                    user_id=user_id, priority=priority, is_failure=is_server_failure,
+                )
+                final_answer = response.text if response.text else initial_answer
+                if response.text:
+                    cache.put(self.model_name, prompt, response.text)
+                reasoning.append("Step 5: Answer generated successfully")
             
             elapsed_time = time.time() - start_time
             logger.info(f"Agent chat completed in {elapsed_time:.2f}s")
@@ -254,7 +286,7 @@ Answer:"""
 class MCPClient:
     """Simple MCP client wrapper that performs HTTP requests to MCP server endpoints."""
     
-    def __init__(self, base_url: str, api_key: Optional[str] = None):
+    def __init__(self, base_url: str, api_key: Optional[str] = None, pool_maxsize: int = 10):
         self.base_url = base_url.rstrip('/')
         self.api_key = api_key
         self.session = requests.Session()
@@ -270,7 +302,8 @@ class MCPClient:
             status_forcelist=[500, 502, 503, 504],
             allowed_methods=["GET", "POST"]
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # pool_maxsize: connections kept per host, i.e. how many threads can share this client
+        adapter = HTTPAdapter(max_retries=retry_strategy, pool_maxsize=pool_maxsize)
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
     
@@ -286,25 +319,117 @@ class MCPClient:
             JSON response from the tool
             
         Raises:
-            requests.RequestException: On network errors
-            ValueError: On non-200 responses
+            ValueError: On network errors, non-200 responses, or while the MCP
+                circuit breaker is open (without making a request)
         """
         url = f"{self.base_url}/{tool_name}"
         logger.info(f"Calling MCP tool '{tool_name}' at {url} with payload: {payload}")
         
-        try:
+        def post() -> requests.Response:
             response = self.session.post(url, json=payload, timeout=30)
             response.raise_for_status()  # Raises HTTPError for bad responses
-            
+            return response
+
+        try:
+            response = get_breaker("mcp").call(post, is_failure=is_server_failure)
             result = response.json()
             logger.info(f"MCP tool '{tool_name}' returned: {result}")
             return result
             
+        except CircuitOpenError as e:
+            logger.warning(f"MCP tool '{tool_name}' skipped: {e}")
+            raise ValueError(f"MCP tool '{tool_name}' failed: {str(e)}")
         except requests.exceptions.RequestException as e:
             logger.error(f"MCP tool '{tool_name}' failed: {e}")
             raise ValueError(f"MCP tool '{tool_name}' failed: {str(e)}")
 
 
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    """Cosine similarity of two embedding vectors (no numpy/scikit-learn import needed)."""
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def paper_title(paper_id: Optional[str]) -> Optional[str]:
+    """Title extracted at upload (services/metadata.py), or None if the paper is not stored locally."""
+    if not paper_id:
+        return None
+    try:
+        record = local_store.get_paper(paper_id)
+    except Exception as e:
+        logger.warning(f"Local paper lookup failed for {paper_id}: {e}")
+        return None
+    return (record or {}).get("title")
+
+
+def verify_citation_locally(citation: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Verify a citation against the local page-text index.
+
+    Returns None when the citation has no paper_id, the paper has no local index, or
+    the cited text cannot be found or checked locally; callers then fall back to MCP
+    verify_chunk.
+    """
+    paper_id = citation.get("paper_id")
+    if not paper_id:
+        return None
+    result = verify_citation(
+        paper_id,
+        snippet=citation.get("text") or citation.get("snippet"),
+        char_start=citation.get("char_start"),
+        char_end=citation.get("char_end"),
+        content_hash=citation.get("content_hash"),
+    )
+    if result is None or result["verification_status"] not in ("verified", "relocated"):
+        return None
+    return result
+
+
+def resolve_citation(
+    mcp_client: "MCPClient",
+    chunk_id: Any,
+    citation: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Verify a cited chunk, locally when possible.
+
+    Args:
+        mcp_client: Client used when the citation cannot be verified locally
+        chunk_id: The chunk ID to verify
+        citation: The citation entry from query_collection, if any
+
+    Returns:
+        The verify_chunk response shape (text, paper_id, title, page_num, char_start,
+        char_end, pdf_url) plus `highlights` rectangles when the paper is indexed locally
+
+    Raises:
+        ValueError: If MCP verification fails
+    """
+    citation = citation or {}
+    local = verify_citation_locally(citation)
+    if local is not None:
+        return {
+            "chunk_id": chunk_id,
+            "text": local["text"],
+            "paper_id": local["paper_id"],
+            "title": citation.get("title") or paper_title(local["paper_id"]),
+            "page_num": local["page_num"],
+            "char_start": local["char_start"],
+            "char_end": local["char_end"],
+            "pdf_url": citation.get("pdf_url"),
+            "highlights": local["highlights"],
+            "verified_locally": True,
+        }
+
+    verify_response = mcp_client.call_tool("verify_chunk", {"chunk_id": chunk_id})
+    local = verify_citation_locally(verify_response)
+    if local is not None:
+        verify_response = {**verify_response, "highlights": local["highlights"]}
+    if not verify_response.get("title"):
+        verify_response = {**verify_response, "title": paper_title(verify_response.get("paper_id"))}
+    return verify_response
+
+
 def extract_citation_ids(answer_text: str) -> List[int]:
     """
     Extract chunk IDs from citation tags in the answer text.
@@ -339,7 +464,10 @@ def handle_question(
     collection_id: int,
     question: str,
     max_sources: int = 5,
-    mcp_client: Optional[MCPClient] = None
+    mcp_client: Optional[MCPClient] = None,
+    user_id: Optional[str] = None,
+    priority: str = "interactive",
+    compact: bool = False
 ) -> Dict[str, Any]:
     """
     Handle a question by querying the collection and verifying all citations.
@@ -349,6 +477,10 @@ def handle_question(
         question: The question to ask
         max_sources: Maximum number of sources to verify
         mcp_client: Optional MCPClient instance (creates new one if not provided)
+        user_id: User the Gemini calls are scheduled for (see llm_scheduler)
+        priority: Scheduler priority ("interactive" or "batch")
+        compact: Return citation references only (chunk_id, paper_id, page_num,
+            char_start, char_end, score, verification_status), without snippet text
 
     Returns:
         Dictionary with keys: answer, citations
@@ -387,9 +519,16 @@ def handle_question(
     if citations_data:
         try:
             # Embed the answer
-            answer_embedding = genai.embed_content(
+            scheduler = get_scheduler()
+            gemini = get_breaker("gemini")
+            answer_embedding = gemini.call(
+                scheduler.run,
+                get_genai().embed_content,
                 model=EMBEDDING_MODEL,
-                content=answer
+                content=answer,
+                user_id=user_id,
+                priority=priority,
+                is_failure=is_server_failure
             )["embedding"]
 
             # Compute similarity for each chunk text
@@ -398,13 +537,16 @@ def handle_question(
                 if not text.strip():
                     cit["similarity"] = 0.0
                     continue
-                chunk_emb = genai.embed_content(
+                chunk_emb = gemini.call(
+                    scheduler.run,
+                    get_genai().embed_content,
                     model=EMBEDDING_MODEL,
-                    content=text
+                    content=text,
+                    user_id=user_id,
+                    priority=priority,
+                    is_failure=is_server_failure
                 )["embedding"]
-                cit["similarity"] = cosine_similarity(
-                    [answer_embedding], [chunk_emb]
-                )[0][0]
+                cit["similarity"] = cosine_similarity(answer_embedding, chunk_emb)
 
             # Sort by similarity (descending)
             citations_data.sort(key=lambda c: c["similarity"], reverse=True)
@@ -447,10 +589,11 @@ def handle_question(
     # Step 3: Verify each chunk
     verified_citations = []
     chunk_scores = {cit.get("chunk_id"): cit.get("score") for cit in citations_data}
+    citations_by_id = {cit.get("chunk_id"): cit for cit in citations_data}
     
     for chunk_id in chunk_ids:
         try:
-            verify_response = mcp_client.call_tool("verify_chunk", {"chunk_id": chunk_id})
+            verify_response = resolve_citation(mcp_client, chunk_id, citations_by_id.get(chunk_id))
             
             citation_obj = {
                 "chunk_id": chunk_id,
@@ -462,6 +605,7 @@ def handle_question(
                 "paper_id": verify_response.get("paper_id", None),
                 "char_start": verify_response.get("char_start", None),
                 "char_end": verify_response.get("char_end", None),
+                "highlights": verify_response.get("highlights", None),
             }
             
             # Add score if available
@@ -498,6 +642,8 @@ def handle_question(
     elapsed_time = time.time() - start_time
     logger.info(f"Question handling completed in {elapsed_time:.2f}s with {len(verified_citations)} citations")
     
+    if compact:
+        verified_citations = compact_citations(verified_citations)
     return {
         "answer": answer,
         "citations": verified_citations
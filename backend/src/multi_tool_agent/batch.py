@@ -0,0 +1,181 @@
+"""
+Answer many questions in one process, e.g. for evaluation runs.
+
+Reads questions from a JSONL file, one object per line:
+
+    {"id": "q1", "collection_id": 1, "question": "What optimizer is used?"}
+
+and answers them concurrently with `handle_question` (or `CortexAgent.chat` with
+--agent), sharing one MCP client / agent across worker threads. Gemini calls run
+at "batch" priority so they never starve interactive users of the API.
+
+Each result is appended to the output JSONL as soon as it is ready. The output
+file is also the checkpoint: rerunning with the same output skips every id that
+already has a result, so an interrupted run resumes where it stopped. Failed
+questions are retried on the next run; the later line for an id supersedes the
+earlier one.
+
+Usage (from backend/):
+    python -m src.multi_tool_agent.batch questions.jsonl results.jsonl --concurrency 16
+"""
+
+import sys
+import json
+import math
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Any, Set
+
+from .agent import CortexAgent, MCPClient, handle_question, CORTEX_MCP_URL, CORTEX_MCP_API_KEY
+
+logger = logging.getLogger(__name__)
+
+
+def load_questions(path: Path) -> List[Dict[str, Any]]:
+    """Questions from a JSONL file; ids default to the line number."""
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line_num, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            item.setdefault("id", str(line_num))
+            questions.append(item)
+    return questions
+
+
+def completed_ids(path: Path) -> Set[str]:
+    """Ids already answered in an earlier run (errors are retried)."""
+    done: Set[str] = set()
+    if not path.exists():
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by an interrupted run
+            if isinstance(result, dict) and "id" in result and "error" not in result:
+                done.add(str(result["id"]))
+    return done
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile: the smallest value at least a fraction `p` of the values are at or below."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values), max(1, math.ceil(p * len(sorted_values)))) - 1]
+
+
+def run_batch(
+    questions: List[Dict[str, Any]],
+    output: Path,
+    concurrency: int = 8,
+    use_agent: bool = False,
+    default_collection_id: int = 1,
+    user_id: str = "batch",
+    compact: bool = False,
+) -> Dict[str, Any]:
+    """Answer questions concurrently, appending one JSON result per line to `output`.
+
+    Returns:
+        Report with counts, wall time, throughput and latency percentiles
+    """
+    done = completed_ids(output)
+    pending = [q for q in questions if str(q["id"]) not in done]
+    logger.info(f"{len(questions)} questions, {len(done)} already answered, {len(pending)} to run")
+
+    # One client (and connection pool) shared by every worker
+    if use_agent:
+        agent = CortexAgent()
+        agent.mcp_client = MCPClient(CORTEX_MCP_URL, api_key=CORTEX_MCP_API_KEY, pool_maxsize=concurrency)
+    else:
+        mcp_client = MCPClient(CORTEX_MCP_URL, api_key=CORTEX_MCP_API_KEY, pool_maxsize=concurrency)
+
+    def answer(item: Dict[str, Any]) -> Dict[str, Any]:
+        collection_id = item.get("collection_id", default_collection_id)
+        start = time.perf_counter()
+        try:
+            if use_agent:
+                result = agent.chat(collection_id, item["question"], user_id=user_id, priority="batch")
+            else:
+                result = handle_question(
+                    collection_id, item["question"], mcp_client=mcp_client, user_id=user_id, priority="batch",
+                    compact=compact,
+                )
+            record = {"id": item["id"], "question": item["question"], **result}
+        except Exception as e:
+            record = {"id": item["id"], "question": item["question"], "error": str(e)}
+        record["latency_s"] = round(time.perf_counter() - start, 3)
+        return record
+
+    latencies: List[float] = []
+    errors = 0
+    start_time = time.perf_counter()
+    with open(output, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(answer, item) for item in pending]
+        for n, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            # Only this thread writes, so lines never interleave
+            out.write(json.dumps(record, default=str) + "\n")
+            out.flush()
+            latencies.append(record["latency_s"])
+            if "error" in record:
+                errors += 1
+            if n % 50 == 0 or n == len(futures):
+                logger.info(f"{n}/{len(futures)} answered ({errors} errors)")
+    wall = time.perf_counter() - start_time
+
+    latencies.sort()
+    return {
+        "questions": len(questions),
+        "skipped": len(done),
+        "answered": len(pending) - errors,
+        "errors": errors,
+        "wall_s": round(wall, 2),
+        "throughput_qps": round(len(pending) / wall, 3) if wall > 0 else 0.0,
+        "latency_s": {
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else 0.0,
+        },
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions concurrently.")
+    parser.add_argument("questions", type=Path, help="Input JSONL: {id, collection_id, question} per line")
+    parser.add_argument("output", type=Path, help="Output JSONL; also the resume checkpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--agent", action="store_true", help="Use CortexAgent.chat instead of handle_question")
+    parser.add_argument("--collection-id", type=int, default=1, help="For lines without a collection_id")
+    parser.add_argument("--user-id", default="batch", help="Scheduler user the Gemini calls are billed to")
+    parser.add_argument("--compact", action="store_true", help="Store citation references without snippet text (handle_question only)")
+    parser.add_argument("--report", type=Path, help="Also write the final report as JSON here")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    # Per-call MCP logs would drown the progress lines
+    logging.getLogger("src.multi_tool_agent.agent").setLevel(logging.WARNING)
+
+    report = run_batch(
+        load_questions(args.questions),
+        args.output,
+        concurrency=args.concurrency,
+        use_agent=args.agent,
+        default_collection_id=args.collection_id,
+        user_id=args.user_id,
+        compact=args.compact,
+    )
+    print(json.dumps(report, indent=2))
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2))
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
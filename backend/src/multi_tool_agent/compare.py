@@ -0,0 +1,205 @@
+"""
+Map-reduce comparison across papers.
+
+A single `query_collection` call returns the top chunks of the whole collection,
+which for "compare the methods of these papers" are usually all from one paper.
+Here every paper is handled separately instead:
+
+    map:    retrieve the paper's own top chunks from the workspace index (hybrid
+            lexical + dense, see services/retrieval.py) and
+            summarize what it says about the question (one generation per paper,
+            all papers concurrently)
+    reduce: merge the per-paper summaries into one comparative answer
+
+The map calls run in parallel through the fair scheduler, so latency stays close
+to the slowest paper plus one reduce generation. If the question cannot be
+embedded, papers are retrieved lexically and the result is marked `degraded`.
+"""
+
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any
+
+from ..db import local_store
+from ..services.embeddings import embed_query
+from ..services.retrieval import hybrid_search, get_retrieval_settings
+from ..services.gemini import get_genai
+from ..services.llm_cache import get_llm_cache
+from ..services.llm_scheduler import get_scheduler
+from ..services.circuit_breaker import get_breaker, is_server_failure
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
+COMPARE_MAX_PAPERS = int(os.getenv("COMPARE_MAX_PAPERS", "10"))
+COMPARE_CHUNKS_PER_PAPER = int(os.getenv("COMPARE_CHUNKS_PER_PAPER", "4"))
+
+
+def generate(prompt: str, user_id: Optional[str], priority: str, model_name: str = GEMINI_MODEL) -> str:
+    """One scheduled Gemini generation, served from the response cache when possible."""
+    cache = get_llm_cache()
+    cached = cache.get(model_name, prompt)
+    if cached is not None:
+        return cached
+    model = get_genai().GenerativeModel(model_name)
+    response = get_breaker("gemini").call(
+        get_scheduler().run, model.generate_content, prompt,
+        user_id=user_id, priority=priority, is_failure=is_server_failure,
+    )
+    text = response.text or ""
+    if text:
+        cache.put(model_name, prompt, text)
+    return text
+
+
+def _map_paper(
+    workspace_id: str,
+    paper_id: str,
+    question: str,
+    query_vector,
+    user_id: Optional[str],
+    priority: str,
+    model_name: str,
+) -> Dict[str, Any]:
+    """Retrieve one paper's best chunks and summarize what they say about the question.
+
+    Without a query vector the paper is retrieved with BM25 alone.
+    """
+    record = local_store.get_paper(paper_id) or {}
+    title = record.get("title") or record.get("filename") or paper_id
+    settings = None
+    if query_vector is None:
+        settings = get_retrieval_settings(workspace_id)
+        settings.update(dense_weight=0.0, lexical_weight=settings["lexical_weight"] or 1.0)
+    hits = hybrid_search(
+        workspace_id, question, k=COMPARE_CHUNKS_PER_PAPER, paper_ids=[paper_id],
+        query_vector=query_vector, user_id=user_id, settings=settings,
+    )
+    citations = [
+        {
+            "chunk_id": chunk["chunk_id"],
+            "paper_id": paper_id,
+            "paper_title": title,
+            "page_num": chunk["page_num"],
+            "char_start": chunk["char_start"],
+            "char_end": chunk["char_end"],
+            "snippet": chunk["text"],
+            "score": score,
+        }
+        for chunk, score in hits
+    ]
+
+    if citations:
+        context = "\n\n".join(f"[page {c['page_num']}] {c['snippet']}" for c in citations)
+    elif record.get("abstract"):
+        # Not indexed yet: the abstract extracted at upload is better than nothing
+        context = f"[abstract] {record['abstract']}"
+    else:
+        return {"paper_id": paper_id, "title": title, "summary": None, "citations": [], "error": "Paper is not indexed"}
+
+    prompt = f"""You are Cortex Assistant, summarizing one research paper for a comparison.
+
+Paper: {title}
+
+Excerpts:
+{context}
+
+Question: {question}
+
+In at most 150 words, state what this paper says that is relevant to the question, citing page numbers.
+If the excerpts do not address the question, say so.
+
+Summary:"""
+    summary = generate(prompt, user_id, priority, model_name)
+    return {"paper_id": paper_id, "title": title, "summary": summary, "citations": citations}
+
+
+def compare_papers(
+    workspace_id: str,
+    question: str,
+    paper_ids: List[str],
+    user_id: Optional[str] = None,
+    priority: str = "interactive",
+    model_name: str = GEMINI_MODEL,
+) -> Dict[str, Any]:
+    """Answer a comparison question across several papers with map-reduce.
+
+    Args:
+        workspace_id: Workspace whose index shard holds the papers
+        question: The comparison question
+        paper_ids: Papers to compare (at most COMPARE_MAX_PAPERS)
+        user_id: User the Gemini calls are scheduled for (see llm_scheduler)
+        priority: Scheduler priority ("interactive" or "batch")
+        model_name: Gemini model for the map and reduce generations
+
+    Returns:
+        Dictionary with keys: answer, papers (per-paper summary and citations),
+        citations, timings, and degraded (why retrieval was lexical-only) when
+        the question could not be embedded
+    """
+    if len(paper_ids) > COMPARE_MAX_PAPERS:
+        raise ValueError(f"At most {COMPARE_MAX_PAPERS} papers can be compared at once")
+    start_time = time.time()
+    degraded = None
+    try:
+        query_vector = embed_query(question, user_id=user_id)
+    except Exception as e:
+        logger.warning(f"Embedding the comparison question failed, using lexical retrieval only: {e}")
+        degraded = f"Embeddings unavailable: {e}"
+        query_vector = None
+
+    # Map: every paper concurrently; the scheduler bounds how many Gemini calls run at once
+    def map_one(paper_id: str) -> Dict[str, Any]:
+        try:
+            return _map_paper(workspace_id, paper_id, question, query_vector, user_id, priority, model_name)
+        except Exception as e:
+            logger.error(f"Comparison map step failed for paper {paper_id}: {e}")
+            return {"paper_id": paper_id, "title": paper_id, "summary": None, "citations": [], "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(len(paper_ids), 1)) as pool:
+        papers = list(pool.map(map_one, paper_ids))
+    map_seconds = time.time() - start_time
+
+    summarized = [p for p in papers if p.get("summary")]
+    if not summarized:
+        result = {
+            "answer": "None of the selected papers could be summarized for this question.",
+            "papers": papers,
+            "citations": [],
+            "timings": {"map_s": round(map_seconds, 3), "reduce_s": 0.0},
+        }
+        if degraded:
+            result["degraded"] = degraded
+        return result
+
+    # Reduce: one generation over the per-paper summaries
+    summaries = "\n\n".join(f"### {p['title']}\n{p['summary']}" for p in summarized)
+    prompt = f"""You are Cortex Assistant, helping a researcher compare research papers.
+
+Question: {question}
+
+Per-paper summaries:
+{summaries}
+
+Write a comparative answer that:
+1. Directly addresses the question for every paper listed
+2. Highlights the key similarities and differences
+3. Names the paper and page number for each claim
+4. Says so when a paper does not address the question
+
+Answer:"""
+    answer = generate(prompt, user_id, priority, model_name)
+    elapsed = time.time() - start_time
+    logger.info(f"Compared {len(paper_ids)} papers in {elapsed:.2f}s (map {map_seconds:.2f}s)")
+
+    result = {
+        "answer": answer,
+        "papers": papers,
+        "citations": [c for p in papers for c in p["citations"]],
+        "timings": {"map_s": round(map_seconds, 3), "reduce_s": round(elapsed - map_seconds, 3)},
+    }
+    if degraded:
+        result["degraded"] = degraded
+    return result
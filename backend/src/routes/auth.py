@@ -5,8 +5,8 @@ from datetime import datetime, timedelta
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
-from azure.cosmos import CosmosClient
 from pydantic import BaseModel
+from ..db.cosmos_store import container
 
 # --- Config ---
 SECRET_KEY = os.getenv("JWT_SECRET", "dev-secret")
@@ -18,11 +18,6 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-# --- Cosmos connection ---
-client = CosmosClient(os.getenv("COSMOS_URL"), credential=os.getenv("COSMOS_KEY"))
-database = client.get_database_client(os.getenv("COSMOS_DB"))
-users_container = database.get_container_client("users")
-
 # --- Models ---
 class UserIn(BaseModel):
     email: str
@@ -43,7 +38,7 @@ async def signup(user: UserIn):
 
     # Check if user already exists
     query = f"SELECT * FROM c WHERE c.email = '{email}'"
-    users = list(users_container.query_items(query, enable_cross_partition_query=True))
+    users = list(container("users").query_items(query, enable_cross_partition_query=True))
     if users:
         raise HTTPException(status_code=400, detail="Email already registered")
     if not isinstance(password, str):
@@ -63,7 +58,7 @@ async def signup(user: UserIn):
         "hashed_password": hashed_pw,
         "created_at": datetime.utcnow().isoformat(),
     }
-    users_container.create_item(user_doc)
+    container("users").create_item(user_doc)
 
     token = create_access_token({"sub": email})
     return {"access_token": token, "token_type": "bearer"}
@@ -78,7 +73,7 @@ async def login(user: UserIn):
 
 
     query = f"SELECT * FROM c WHERE c.email = '{email}'"
-    users = list(users_container.query_items(query, enable_cross_partition_query=True))
+    users = list(container("users").query_items(query, enable_cross_partition_query=True))
     if not users or not pwd_context.verify(password, users[0]["hashed_password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
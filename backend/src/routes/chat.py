@@ -2,16 +2,11 @@ import os
 import uuid
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
-from azure.cosmos import CosmosClient
+from ..db.cosmos_store import container
 from ..routes.auth import get_current_user  # import our auth dependency
 
 router = APIRouter(prefix="/chats", tags=["chats"])
 
-# Connect to Cosmos
-client = CosmosClient(os.getenv("COSMOS_URL"), credential=os.getenv("COSMOS_KEY"))
-database = client.get_database_client(os.getenv("COSMOS_DB"))
-chats_container = database.get_container_client("chats")
-
 
 # 1️⃣ Create a new chat
 @router.post("")
@@ -22,7 +17,7 @@ async def create_chat(user_email: str = Depends(get_current_user)):
         "messages": [],
         "created_at": datetime.utcnow().isoformat(),
     }
-    chats_container.create_item(chat_doc)
+    container("chats").create_item(chat_doc)
     return {"chat_id": chat_doc["id"]}
 
 
@@ -35,7 +30,7 @@ async def add_message(
     user_email: str = Depends(get_current_user),
 ):
     query = f"SELECT * FROM c WHERE c.id='{chat_id}' AND c.user_email='{user_email}'"
-    items = list(chats_container.query_items(query, enable_cross_partition_query=True))
+    items = list(container("chats").query_items(query, enable_cross_partition_query=True))
     if not items:
         raise HTTPException(status_code=404, detail="Chat not found")
 
@@ -43,7 +38,7 @@ async def add_message(
     chat["messages"].append(
         {"role": role, "text": text, "timestamp": datetime.utcnow().isoformat()}
     )
-    chats_container.upsert_item(chat)
+    container("chats").upsert_item(chat)
     return {"status": "ok"}
 
 
@@ -51,5 +46,5 @@ async def add_message(
 @router.get("")
 async def list_chats(user_email: str = Depends(get_current_user)):
     query = f"SELECT c.id, c.created_at FROM c WHERE c.user_email='{user_email}'"
-    items = list(chats_container.query_items(query, enable_cross_partition_query=True))
+    items = list(container("chats").query_items(query, enable_cross_partition_query=True))
     return items
@@ -0,0 +1,55 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from ..routes.auth import get_current_user  # import auth dependency
+
+router = APIRouter(prefix="/index", tags=["index"])
+
+
+class RetrievalSettingsIn(BaseModel):
+    lexical_weight: Optional[float] = None
+    dense_weight: Optional[float] = None
+    rrf_k: Optional[int] = None
+    candidates: Optional[int] = None
+
+
+# Re-extract and re-embed only the papers that changed since the workspace was indexed
+@router.post("/reindex", status_code=202)
+async def reindex(verify: bool = False, user_email: str = Depends(get_current_user)):
+    from ..services.reindex import start_reindex, ReindexRunning
+
+    try:
+        return await run_in_threadpool(start_reindex, user_email, verify)
+    except ReindexRunning as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+# Progress of the current (or last) reindex: counts of indexed, touched, removed and unchanged papers
+@router.get("/reindex")
+async def reindex_progress(user_email: str = Depends(get_current_user)):
+    from ..services.reindex import reindex_status
+
+    progress = await run_in_threadpool(reindex_status, user_email)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="This workspace has never been reindexed")
+    return progress
+
+
+# Hybrid retrieval fusion weights for this workspace (see services/retrieval.py)
+@router.get("/retrieval")
+async def get_retrieval(user_email: str = Depends(get_current_user)):
+    from ..services.retrieval import get_retrieval_settings
+
+    return get_retrieval_settings(user_email)
+
+
+@router.put("/retrieval")
+async def put_retrieval(settings: RetrievalSettingsIn, user_email: str = Depends(get_current_user)):
+    from ..services.retrieval import set_retrieval_settings
+
+    updates = {key: value for key, value in settings.model_dump().items() if value is not None}
+    try:
+        return set_retrieval_settings(user_email, updates)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
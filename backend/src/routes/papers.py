@@ -1,29 +1,76 @@
 import os
 from fastapi import APIRouter, Depends, HTTPException
-from azure.cosmos import CosmosClient
+from ..db.cosmos_store import container
 from ..routes.auth import get_current_user  # import auth dependency
 
 router = APIRouter(prefix="/papers", tags=["papers"])
 
-# Connect to Cosmos
-client = CosmosClient(os.getenv("COSMOS_URL"), credential=os.getenv("COSMOS_KEY"))
-database = client.get_database_client(os.getenv("COSMOS_DB"))
-papers_container = database.get_container_client("papers")
-
 
 # List only the current user's papers
 @router.get("")
 async def list_papers(user_email: str = Depends(get_current_user)):
-    query = f"SELECT c.id, c.filename, c.uploaded_at FROM c WHERE c.user_email = '{user_email}'"
-    items = list(papers_container.query_items(query, enable_cross_partition_query=True))
+    query = (
+        "SELECT c.id, c.filename, c.uploaded_at, c.title, c.authors, c.page_count "
+        "FROM c WHERE c.user_email = @user_email"
+    )
+    items = list(container("papers").query_items(
+        query=query, parameters=[{"name": "@user_email", "value": user_email}], enable_cross_partition_query=True
+    ))
     return items
 
 
 # Get one paper (ensures it belongs to the current user)
 @router.get("/{paper_id}")
 async def get_paper(paper_id: str, user_email: str = Depends(get_current_user)):
-    query = f"SELECT * FROM c WHERE c.id = '{paper_id}' AND c.user_email = '{user_email}'"
-    items = list(papers_container.query_items(query, enable_cross_partition_query=True))
+    query = "SELECT * FROM c WHERE c.id = @id AND c.user_email = @user_email"
+    items = list(container("papers").query_items(
+        query=query,
+        parameters=[{"name": "@id", "value": paper_id}, {"name": "@user_email", "value": user_email}],
+        enable_cross_partition_query=True,
+    ))
+    if not items:
+        raise HTTPException(status_code=404, detail="Paper not found")
+    return items[0]
+
+
+# Precomputed title, authors, outline, page count and abstract
+@router.get("/{paper_id}/overview")
+async def get_overview(paper_id: str, user_email: str = Depends(get_current_user)):
+    query = (
+        "SELECT c.id, c.filename, c.title, c.authors, c.outline, c.page_count, c.abstract "
+        "FROM c WHERE c.id = @id AND c.user_email = @user_email"
+    )
+    items = list(container("papers").query_items(
+        query=query,
+        parameters=[{"name": "@id", "value": paper_id}, {"name": "@user_email", "value": user_email}],
+        enable_cross_partition_query=True,
+    ))
     if not items:
         raise HTTPException(status_code=404, detail="Paper not found")
     return items[0]
+
+
+# Verify a cited span and return its highlight rectangles from the local page-text index
+@router.get("/{paper_id}/highlights")
+async def get_highlights(
+    paper_id: str,
+    char_start: int | None = None,
+    char_end: int | None = None,
+    snippet: str | None = None,
+    user_email: str = Depends(get_current_user),
+):
+    from ..index.pages import verify_citation
+
+    query = "SELECT c.id FROM c WHERE c.id = @id AND c.user_email = @user_email"
+    items = list(container("papers").query_items(
+        query=query,
+        parameters=[{"name": "@id", "value": paper_id}, {"name": "@user_email", "value": user_email}],
+        enable_cross_partition_query=True,
+    ))
+    if not items:
+        raise HTTPException(status_code=404, detail="Paper not found")
+
+    result = verify_citation(paper_id, snippet=snippet, char_start=char_start, char_end=char_end)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Paper has no page-text index yet")
+    return result
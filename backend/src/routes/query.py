@@ -1,25 +1,133 @@
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import JSONResponse
-import os, requests
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, Depends
+import os, logging, requests
+from ..routes.auth import get_current_user
+from ..db.cosmos_store import container
+from ..services.llm_scheduler import get_scheduler
+from ..services.circuit_breaker import get_breaker, is_server_failure, CircuitOpenError
+from ..services.metadata import overview_answer
+from ..services.responses import FastJSONResponse, compact_citations
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/query", tags=["Query"])
 
 MCP_URL = os.getenv("MCP_URL")
 GEMINI_KEY = os.getenv("GOOGLE_API_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
+MCP_TIMEOUT_SECONDS = float(os.getenv("MCP_TIMEOUT_SECONDS", "30"))
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "60"))
+# "mcp": retrieve from MCP; "hybrid": from the workspace index first (MCP only for unindexed workspaces)
+QUERY_RETRIEVAL = os.getenv("QUERY_RETRIEVAL", "mcp")
+
+
+def _local_chunks(question: str, user_email: str, paper_ids: Optional[List[str]] = None) -> list:
+    """Hybrid BM25 + dense hits from the user's workspace index, as citation dicts."""
+    from ..services.retrieval import hybrid_search
+
+    try:
+        hits = hybrid_search(user_email, question, paper_ids=paper_ids, user_id=user_email)
+    except Exception as e:
+        logger.warning(f"Hybrid retrieval failed: {e}")
+        return []
+    return [{**chunk, "score": score} for chunk, score in hits]
+
+
+def _compare(question: str, paper_ids: List[str], user_email: str, compact: bool = False) -> FastJSONResponse:
+    from ..multi_tool_agent.compare import compare_papers, COMPARE_MAX_PAPERS
+
+    paper_ids = list(dict.fromkeys(paper_ids))
+    if len(paper_ids) < 2:
+        raise HTTPException(status_code=400, detail="Compare mode needs at least two distinct paper_ids")
+    if len(paper_ids) > COMPARE_MAX_PAPERS:
+        raise HTTPException(status_code=400, detail=f"At most {COMPARE_MAX_PAPERS} papers can be compared")
+    owned = {
+        item["id"]
+        for item in container("papers").query_items(
+            query="SELECT c.id FROM c WHERE c.user_email = @user_email AND ARRAY_CONTAINS(@ids, c.id)",
+            parameters=[{"name": "@user_email", "value": user_email}, {"name": "@ids", "value": paper_ids}],
+            enable_cross_partition_query=True,
+        )
+    }
+    missing = [pid for pid in paper_ids if pid not in owned]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Papers not found: {', '.join(missing)}")
 
-@router.get("")
-def ask(question: str = Query(...)):
-    # 1️⃣  Retrieve context from MCP
     try:
-        mcp_resp = requests.post(f"{MCP_URL}/query_collection", json={"question": question})
-        mcp_resp.raise_for_status()
-        chunks = mcp_resp.json().get("chunks", [])
+        result = compare_papers(user_email, question, paper_ids, user_id=user_email)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"MCP error: {e}")
+        raise HTTPException(status_code=500, detail=f"Comparison failed: {e}")
+    if compact:
+        result["citations"] = compact_citations(result["citations"])
+        for paper in result["papers"]:
+            paper["citations"] = compact_citations(paper["citations"])
+    return FastJSONResponse(result)
+
+
+@router.get("")
+def ask(
+    question: str = Query(...),
+    paper_id: str | None = Query(None),
+    mode: str = Query("default", pattern="^(default|compare)$"),
+    paper_ids: List[str] | None = Query(None),
+    compact: bool = Query(False, description="Return citation references (chunk id, page, offsets) without text"),
+    user_email: str = Depends(get_current_user),
+):
+    """Answer a question from the user's papers.
+
+    With `paper_id`, the question is about that one paper: overview questions are
+    answered from its stored metadata and everything else from its own chunks in
+    the workspace index (MCP cannot be scoped to a paper, so it is not asked).
+    """
+    # Cross-paper comparison: per-paper retrieval + summaries in parallel, one merged answer
+    if mode == "compare":
+        return _compare(question, paper_ids or [], user_email, compact)
+
+    # 0️⃣  Overview questions about one paper are answered from metadata stored at upload
+    if paper_id:
+        query = (
+            "SELECT c.filename, c.title, c.authors, c.outline, c.page_count, c.abstract "
+            "FROM c WHERE c.id = @id AND c.user_email = @user_email"
+        )
+        items = list(container("papers").query_items(
+            query=query,
+            parameters=[{"name": "@id", "value": paper_id}, {"name": "@user_email", "value": user_email}],
+            enable_cross_partition_query=True,
+        ))
+        if not items:
+            raise HTTPException(status_code=404, detail="Paper not found")
+        answer = overview_answer(question, items[0])
+        if answer:
+            return FastJSONResponse({"answer": answer, "citations": [], "source": "metadata"})
+
+    # 1️⃣  Retrieve context from the workspace index or MCP; the local index stands in while MCP is failing
+    degraded = None
+    scope = [paper_id] if paper_id else None
+    chunks = _local_chunks(question, user_email, scope) if QUERY_RETRIEVAL == "hybrid" or paper_id else []
+
+    def query_mcp() -> requests.Response:
+        resp = requests.post(f"{MCP_URL}/query_collection", json={"question": question}, timeout=MCP_TIMEOUT_SECONDS)
+        resp.raise_for_status()
+        return resp
+
+    if not chunks and paper_id:
+        # Paper not indexed yet: plain keyword match over its text
+        from ..db.local_store import search_local_chunks
+        chunks = search_local_chunks(question, owner=user_email, paper_ids=scope)
+    elif not chunks:
+        try:
+            chunks = get_breaker("mcp").call(query_mcp, is_failure=is_server_failure).json().get("chunks", [])
+        except Exception as e:
+            logger.warning(f"MCP retrieval failed, using local retrieval: {e}")
+            degraded = f"MCP unavailable: {e}"
+            chunks = [] if QUERY_RETRIEVAL == "hybrid" else _local_chunks(question, user_email)
+            if not chunks:
+                # Papers not indexed yet: plain keyword match over their text
+                from ..db.local_store import search_local_chunks
+                chunks = search_local_chunks(question, owner=user_email)
 
     if not chunks:
-        return JSONResponse({"answer": "Not found in the uploaded papers.", "citations": []})
+        return FastJSONResponse({"answer": "Not found in the uploaded papers.", "citations": [], "degraded": degraded})
 
 
 # Extract 'text' from each chunk dict (or use the string directly)
@@ -39,12 +147,29 @@ def ask(question: str = Query(...)):
                 ]}
             ]
         }
-        g_resp = requests.post(gemini_url, json=payload)
-        g_resp.raise_for_status()
+
+        def generate() -> requests.Response:
+            resp = requests.post(gemini_url, json=payload, timeout=GEMINI_TIMEOUT_SECONDS)
+            resp.raise_for_status()
+            return resp
+
+        g_resp = get_breaker("gemini").call(
+            get_scheduler().run, generate, user_id=user_email, is_failure=is_server_failure
+        )
         data = g_resp.json()
         answer = data["candidates"][0]["content"]["parts"][0]["text"]
+    except CircuitOpenError as e:
+        # No generation available: hand back the retrieved passages themselves
+        return FastJSONResponse({
+            "answer": "The answer service is temporarily unavailable. The most relevant passages are listed below.",
+            "citations": compact_citations(chunks) if compact else chunks,
+            "degraded": f"{degraded + '; ' if degraded else ''}{e}",
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Gemini error: {e}")
 
     # 3️⃣  Return final result
-    return JSONResponse({"answer": answer, "citations": chunks})
+    response = {"answer": answer, "citations": compact_citations(chunks) if compact else chunks}
+    if degraded:
+        response["degraded"] = degraded
+    return FastJSONResponse(response)
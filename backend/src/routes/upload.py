@@ -1,30 +1,34 @@
 import uuid
+import shutil
+import asyncio
 import logging
+import zipfile
 from datetime import datetime
 from pathlib import Path
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from azure.cosmos import CosmosClient
+from typing import List, Dict, Any, IO, Iterator, Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from ..db.cosmos_store import container
 from ..routes.auth import get_current_user  # import auth dependency
+from ..services.storage import get_storage, LocalStorage, ObjectNotFound, PRESIGNED_URL_SECONDS
 import os
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, RedirectResponse
 
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/upload", tags=["upload"])
 
-# ensure uploads directory exists
-UPLOADS_DIR = Path(__file__).resolve().parents[2] / "uploads"
-UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
-
-# connect to Cosmos
-client = CosmosClient(os.getenv("COSMOS_URL"), credential=os.getenv("COSMOS_KEY"))
-database = client.get_database_client(os.getenv("COSMOS_DB"))
-papers_container = database.get_container_client("papers")
+# bulk upload limits
+BULK_CONCURRENCY = int(os.getenv("BULK_UPLOAD_CONCURRENCY", "8"))
+BULK_RECORD_BATCH = 25
+BULK_MAX_FILE_BYTES = int(os.getenv("BULK_UPLOAD_MAX_FILE_MB", "100")) * 1024 * 1024
+COPY_CHUNK_BYTES = 1024 * 1024
 
 
 @router.post("")
 async def upload_paper(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     user_email: str = Depends(get_current_user)  # ← logged-in user
 ):
@@ -32,50 +36,309 @@ async def upload_paper(
     if file.content_type not in ("application/pdf", "application/x-pdf"):
         raise HTTPException(status_code=415, detail="Only PDF files are supported.")
 
-    # 2. save file locally (temporary)
+    # 2. stream the file to object storage
     paper_id = str(uuid.uuid4())
-    stored_filename = f"{paper_id}.pdf"
-    stored_path = UPLOADS_DIR / stored_filename
+    storage_key = f"{paper_id}.pdf"
     try:
-        content = await file.read()
-        stored_path.write_bytes(content)
+        await run_in_threadpool(get_storage().put_stream, storage_key, _read_chunks(file.file))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"File save failed: {e}")
 
-    # (Optional) upload to MCP service if you still need it
-    try:
-        from ..services.mcp_client import upload_to_mcp
-        mcp_id = upload_to_mcp(str(stored_path), paper_id)
-    except Exception as e:
-        logger.error(f"MCP upload failed: {e}")
-        mcp_id = None
+    # metadata (title, authors, outline, page count, abstract) and (optional) MCP upload
+    metadata, mcp_id = await run_in_threadpool(_process_stored, paper_id, storage_key)
 
     # 3. record in Cosmos
     paper_doc = {
         "id": paper_id,
         "filename": file.filename,
-        "stored_path": str(stored_path),
+        "storage_key": storage_key,
+        "stored_path": get_storage().uri(storage_key),
         "uploaded_at": datetime.utcnow().isoformat(),
         "user_email": user_email,  # ← links to the logged-in user
+        **metadata,
     }
     if mcp_id:
         paper_doc["mcp_document_id"] = mcp_id
 
-    papers_container.create_item(paper_doc)
+    container("papers").create_item(paper_doc)
+    _mirror_locally([paper_doc])
+
+    # 4. chunk + embed into the user's workspace index after responding
+    background_tasks.add_task(_ingest_stored, user_email, paper_id, storage_key)
+
+    return {
+        "paper_id": paper_id,
+        "filename": file.filename,
+        "title": metadata.get("title"),
+        "page_count": metadata.get("page_count"),
+        "status": "uploaded",
+    }
+
+@router.get("/files/{storage_key:path}")
+async def get_signed_file(storage_key: str, expires: int, signature: str, filename: Optional[str] = None):
+    """Serve a presigned local-storage URL (the S3 backend's URLs point at the bucket instead).
+
+    Supports Range requests, so the PDF viewer can fetch pages incrementally.
+    """
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage) or not storage.verify(storage_key, expires, signature):
+        raise HTTPException(status_code=403, detail="Invalid or expired link")
+    try:
+        path = storage.path(storage_key)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="File not found")
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="File not found")
+    return FileResponse(path, media_type="application/pdf", filename=filename, content_disposition_type="inline")
+
+
+def _owned_paper(paper_id: str, user_email: str) -> Dict[str, Any]:
+    query = "SELECT * FROM c WHERE c.id = @id AND c.user_email = @user_email"
+    items = list(container("papers").query_items(
+        query=query,
+        parameters=[{"name": "@id", "value": paper_id}, {"name": "@user_email", "value": user_email}],
+        enable_cross_partition_query=True,
+    ))
+    if not items:
+        raise HTTPException(status_code=403, detail="Not authorized for this file")
+    return items[0]
+
+
+@router.get("/{paper_id}/url")
+async def get_paper_url(paper_id: str, user_email: str = Depends(get_current_user)):
+    """Presigned URL for downloading the PDF directly from storage, bypassing the API workers."""
+    paper = _owned_paper(paper_id, user_email)
+    key = paper.get("storage_key") or f"{paper_id}.pdf"
+    storage = get_storage()
+    url = await run_in_threadpool(storage.presigned_url, key, filename=paper.get("filename"))
+    return {"url": url, "expires_in": PRESIGNED_URL_SECONDS}
 
-    return {"paper_id": paper_id, "filename": file.filename, "status": "uploaded"}
 
 @router.get("/{paper_id}")
 async def get_paper_file(paper_id: str, user_email: str = Depends(get_current_user)):
     """Return the actual uploaded PDF file if it belongs to the user."""
-    file_path = UPLOADS_DIR / f"{paper_id}.pdf"
-    if not file_path.exists():
+    paper = _owned_paper(paper_id, user_email)
+    key = paper.get("storage_key") or f"{paper_id}.pdf"
+    storage = get_storage()
+    if isinstance(storage, LocalStorage):
+        try:
+            path = storage.path(key)
+        except ValueError:
+            raise HTTPException(status_code=404, detail="File not found")
+        if not path.exists():
+            raise HTTPException(status_code=404, detail="File not found")
+        return FileResponse(path, media_type="application/pdf")
+    if not await run_in_threadpool(storage.exists, key):
         raise HTTPException(status_code=404, detail="File not found")
+    # Let the client fetch the bytes from the bucket
+    url = await run_in_threadpool(storage.presigned_url, key, filename=paper.get("filename"))
+    return RedirectResponse(url, status_code=307)
 
-    # check ownership
-    query = f"SELECT * FROM c WHERE c.id = '{paper_id}' AND c.user_email = '{user_email}'"
-    items = list(papers_container.query_items(query, enable_cross_partition_query=True))
-    if not items:
-        raise HTTPException(status_code=403, detail="Not authorized for this file")
 
-    return FileResponse(file_path, media_type="application/pdf")
\ No newline at end of file
+def _read_chunks(source: IO[bytes], max_bytes: Optional[int] = None) -> Iterator[bytes]:
+    """Read an upload in COPY_CHUNK_BYTES pieces, failing once it exceeds max_bytes."""
+    written = 0
+    while chunk := source.read(COPY_CHUNK_BYTES):
+        written += len(chunk)
+        if max_bytes is not None and written > max_bytes:
+            raise ValueError(f"File exceeds {max_bytes // (1024 * 1024)} MB")
+        yield chunk
+
+
+def _process_stored(paper_id: str, storage_key: str) -> tuple[Dict[str, Any], Optional[str]]:
+    """Extract metadata and send the PDF to MCP; MCP failures only lose the MCP id."""
+    from ..services.metadata import safe_extract_metadata
+    from ..services.mcp_client import upload_to_mcp
+
+    with get_storage().local_path(storage_key) as path:
+        metadata = safe_extract_metadata(str(path))
+        try:
+            mcp_id = upload_to_mcp(str(path), paper_id)
+        except Exception as e:
+            logger.error(f"MCP upload failed for {paper_id}: {e}")
+            mcp_id = None
+    return metadata, mcp_id
+
+
+def _ingest_stored(workspace_id: str, paper_id: str, storage_key: str) -> None:
+    """Background ingest of a stored PDF (see services/ingest.py)."""
+    _ingest_stored_batch(workspace_id, [(paper_id, storage_key)])
+
+
+def _ingest_stored_batch(workspace_id: str, papers: List[tuple[str, str]]) -> None:
+    """Background ingest of stored PDFs, (paper_id, storage_key) each, with one shard write."""
+    from ..services.ingest import ingest_papers
+
+    storage = get_storage()
+    stored = []
+    for paper_id, storage_key in papers:
+        try:
+            stored.append((paper_id, storage_key, storage.version(storage_key)))
+        except ObjectNotFound:
+            logger.error(f"Stored PDF {storage_key} for paper {paper_id} disappeared before ingest")
+
+    # Each PDF stays on local disk only while its worker processes it
+    ingest_papers(workspace_id, stored, local_path=storage.local_path, max_workers=BULK_CONCURRENCY)
+
+
+def _discard_stored(storage_key: str) -> None:
+    """Delete a stored PDF whose upload failed; cleanup failures are only logged."""
+    try:
+        get_storage().delete(storage_key)
+    except Exception as e:
+        logger.error(f"Deleting stored PDF {storage_key} failed: {e}")
+
+
+def _mirror_locally(paper_docs: List[Dict[str, Any]]) -> None:
+    """Copy paper records to the local store so metadata lookups skip Cosmos."""
+    try:
+        from ..db.local_store import add_papers
+        add_papers(paper_docs)
+    except Exception as e:
+        logger.error(f"Local paper record write failed: {e}")
+
+
+def _store_stream(source: IO[bytes]) -> tuple[str, str]:
+    """Stream a PDF to object storage without holding it in memory.
+
+    Returns:
+        (paper_id, storage_key)
+    """
+    header = source.read(5)
+    if header != b"%PDF-":
+        raise ValueError("Not a PDF file")
+
+    def chunks() -> Iterator[bytes]:
+        yield header
+        yield from _read_chunks(source, BULK_MAX_FILE_BYTES - len(header))
+
+    paper_id = str(uuid.uuid4())
+    storage_key = f"{paper_id}.pdf"
+    get_storage().put_stream(storage_key, chunks())
+    return paper_id, storage_key
+
+
+def _store_upload(file: UploadFile) -> List[Dict[str, Any]]:
+    """Save one uploaded PDF, or every PDF inside an uploaded ZIP archive.
+
+    Returns one result per entry: {filename, paper_id, storage_key} or {filename, error}.
+    """
+    results = []
+    is_zip = file.content_type in ("application/zip", "application/x-zip-compressed") or (
+        (file.filename or "").lower().endswith(".zip")
+    )
+    if not is_zip:
+        try:
+            paper_id, storage_key = _store_stream(file.file)
+            results.append({"filename": file.filename, "paper_id": paper_id, "storage_key": storage_key})
+        except Exception as e:
+            results.append({"filename": file.filename, "error": str(e)})
+        return results
+
+    try:
+        archive = zipfile.ZipFile(file.file)
+    except zipfile.BadZipFile as e:
+        return [{"filename": file.filename, "error": f"Invalid ZIP archive: {e}"}]
+
+    with archive:
+        for info in archive.infolist():
+            name = Path(info.filename).name
+            if info.is_dir() or name.startswith(".") or "__MACOSX" in info.filename:
+                continue
+            if not name.lower().endswith(".pdf"):
+                results.append({"filename": info.filename, "error": "Only PDF files are supported."})
+                continue
+            if info.file_size > BULK_MAX_FILE_BYTES:
+                results.append({"filename": info.filename, "error": "File too large"})
+                continue
+            try:
+                with archive.open(info) as entry:
+                    paper_id, storage_key = _store_stream(entry)
+                results.append({"filename": name, "paper_id": paper_id, "storage_key": storage_key})
+            except Exception as e:
+                results.append({"filename": info.filename, "error": str(e)})
+    return results
+
+
+@router.post("/bulk")
+async def upload_papers_bulk(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    user_email: str = Depends(get_current_user),
+):
+    """Upload many PDFs (or ZIP archives of PDFs) at once.
+
+    Files are streamed to storage, sent to MCP with bounded concurrency and
+    recorded in batches. Returns a result per PDF; one bad file never fails the batch.
+    """
+    # 1. stream every entry to storage
+    stored: List[Dict[str, Any]] = []
+    for file in files:
+        stored.extend(await run_in_threadpool(_store_upload, file))
+    saved = [r for r in stored if "paper_id" in r]
+
+    # 2. metadata extraction and MCP ingest in parallel, at most BULK_CONCURRENCY in flight
+    semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+
+    async def ingest(result: Dict[str, Any]) -> None:
+        async with semaphore:
+            try:
+                result["metadata"], result["mcp_document_id"] = await run_in_threadpool(
+                    _process_stored, result["paper_id"], result["storage_key"]
+                )
+            except Exception as e:
+                logger.error(f"Processing {result['filename']} failed: {e}")
+                await run_in_threadpool(_discard_stored, result["storage_key"])
+                result["error"] = f"Processing failed: {e}"
+
+    await asyncio.gather(*(ingest(r) for r in saved))
+    saved = [r for r in saved if "error" not in r]
+
+    # 3. record in Cosmos, one batch of concurrent writes at a time
+    uploaded_at = datetime.utcnow().isoformat()
+    for start in range(0, len(saved), BULK_RECORD_BATCH):
+        batch = saved[start:start + BULK_RECORD_BATCH]
+
+        async def record(result: Dict[str, Any]) -> None:
+            paper_doc = {
+                "id": result["paper_id"],
+                "filename": result["filename"],
+                "storage_key": result["storage_key"],
+                "stored_path": get_storage().uri(result["storage_key"]),
+                "uploaded_at": uploaded_at,
+                "user_email": user_email,
+                **result["metadata"],
+            }
+            if result.get("mcp_document_id"):
+                paper_doc["mcp_document_id"] = result["mcp_document_id"]
+            try:
+                await run_in_threadpool(container("papers").create_item, paper_doc)
+                result["status"] = "uploaded"
+                result["record"] = paper_doc
+            except Exception as e:
+                logger.error(f"Recording {result['filename']} failed: {e}")
+                await run_in_threadpool(_discard_stored, result["storage_key"])
+                result["error"] = f"Record failed: {e}"
+
+        await asyncio.gather(*(record(r) for r in batch))
+        await run_in_threadpool(_mirror_locally, [r["record"] for r in batch if r.get("status") == "uploaded"])
+
+    # 4. chunk + embed into the user's workspace index after responding, one shard write for the batch
+    uploaded_papers = [(r["paper_id"], r["storage_key"]) for r in saved if r.get("status") == "uploaded"]
+    if uploaded_papers:
+        background_tasks.add_task(_ingest_stored_batch, user_email, uploaded_papers)
+
+    results = []
+    for r in stored:
+        if r.get("status") == "uploaded":
+            results.append({
+                "filename": r["filename"],
+                "paper_id": r["paper_id"],
+                "title": r["record"].get("title"),
+                "page_count": r["record"].get("page_count"),
+                "status": "uploaded",
+            })
+        else:
+            results.append({"filename": r["filename"], "status": "failed", "error": r.get("error")})
+    uploaded = sum(1 for r in results if r["status"] == "uploaded")
+    return {"uploaded": uploaded, "failed": len(results) - uploaded, "results": results}
@@ -0,0 +1,190 @@
+"""
+Circuit breakers for outbound dependencies (MCP, Gemini).
+
+Each dependency has one process-wide breaker, `get_breaker("mcp")`. While it is
+closed, calls pass through and their outcomes are recorded over a sliding window.
+Once at least CIRCUIT_MIN_CALLS calls were made in the last CIRCUIT_WINDOW_SECONDS
+and at least CIRCUIT_FAILURE_RATE of them failed, the breaker opens. While it is
+open, calls raise CircuitOpenError immediately instead of waiting out timeouts and
+retries, so callers can fall back to local data. After CIRCUIT_RESET_SECONDS a
+single trial call is let through (half-open). It closes the breaker on success and
+re-opens it on failure.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+CIRCUIT_WINDOW_SECONDS = float(os.getenv("CIRCUIT_WINDOW_SECONDS", "30"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "15"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} is unavailable (circuit open, retry in {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Error-rate circuit breaker for one dependency."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = CIRCUIT_FAILURE_RATE,
+        min_calls: int = CIRCUIT_MIN_CALLS,
+        window_seconds: float = CIRCUIT_WINDOW_SECONDS,
+        reset_seconds: float = CIRCUIT_RESET_SECONDS,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._outcomes: deque = deque()  # (monotonic time, succeeded)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now."""
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            waited = time.monotonic() - self._opened_at
+            if self._state == OPEN and waited >= self.reset_seconds:
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+            self._rejected += 1
+            raise CircuitOpenError(self.name, max(self.reset_seconds - waited, 0.0))
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state == OPEN:
+                # A call admitted before the breaker opened; only the trial call may close it
+                return
+            if self._state == HALF_OPEN:
+                logger.info(f"Circuit {self.name} closed")
+                self._state = CLOSED
+                self._outcomes.clear()
+            self._trial_running = False
+            self._record(True)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self._state == OPEN:
+                return
+            if self._state == HALF_OPEN:
+                self._trial_running = False
+                self._trip()
+                return
+            self._record(False)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            if (
+                len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.failure_rate
+            ):
+                self._trip()
+
+    def _record(self, succeeded: bool) -> None:
+        now = time.monotonic()
+        self._outcomes.append((now, succeeded))
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            self._outcomes.popleft()
+
+    def _trip(self) -> None:
+        logger.warning(f"Circuit {self.name} opened; failing fast for {self.reset_seconds:.0f}s")
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def call(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        is_failure: Optional[Callable[[Exception], bool]] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """Call fn(*args, **kwargs) through the breaker.
+
+        Args:
+            fn: The dependency call
+            is_failure: Decides whether an exception counts against the dependency
+                (e.g. a 4xx is the caller's fault); every exception counts by default
+
+        Raises:
+            CircuitOpenError: If the breaker is open; fn is not called
+        """
+        self.allow()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if is_failure is None or is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            return {
+                "state": self._state,
+                "window_calls": len(self._outcomes),
+                "window_failures": failures,
+                "rejected": self._rejected,
+            }
+
+
+def is_server_failure(e: Exception) -> bool:
+    """For HTTP dependencies: network errors and 5xx count, 4xx responses do not.
+
+    Understands requests errors (`e.response.status_code`) and Google API errors
+    raised by the Gemini SDK (`e.code`, e.g. 400 for an invalid prompt).
+    """
+    response = getattr(e, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is None and isinstance(getattr(e, "code", None), int):
+        status = e.code
+    return status is None or status >= 500
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Process-wide breaker for a dependency ("mcp", "gemini")."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.stats() for b in breakers}
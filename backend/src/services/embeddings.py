@@ -0,0 +1,49 @@
+import os
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+from .gemini import get_genai
+from .llm_scheduler import get_scheduler
+from .circuit_breaker import get_breaker, is_server_failure
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "models/gemini-embedding-001")
+EMBED_BATCH_SIZE = 100
+
+
+def embed_texts(
+    texts: List[str],
+    task_type: str = "retrieval_document",
+    user_id: Optional[str] = None,
+    priority: str = "batch",
+) -> np.ndarray:
+    """Embed a list of texts with the Gemini embedding model.
+
+    Args:
+        texts: Texts to embed
+        task_type: Gemini task type ("retrieval_document" for chunks, "retrieval_query" for questions)
+        user_id: User the calls are scheduled for (see llm_scheduler)
+        priority: Scheduler priority, "batch" for ingest
+
+    Returns:
+        float32 array of shape (len(texts), dim)
+    """
+    vectors = []
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        batch = texts[start:start + EMBED_BATCH_SIZE]
+        result = get_breaker("gemini").call(
+            get_scheduler().run,
+            get_genai().embed_content,
+            model=EMBEDDING_MODEL, content=batch, task_type=task_type,
+            user_id=user_id, priority=priority, cost=len(batch), is_failure=is_server_failure,
+        )
+        vectors.extend(result["embedding"])
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def embed_query(text: str, user_id: Optional[str] = None) -> np.ndarray:
+    """Embed a single question for retrieval."""
+    return embed_texts([text], task_type="retrieval_query", user_id=user_id, priority="interactive")[0]
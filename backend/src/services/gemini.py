@@ -0,0 +1,24 @@
+import os
+import threading
+
+_genai = None
+_lock = threading.Lock()
+
+
+def get_genai():
+    """Import and configure `google.generativeai` on first use.
+
+    The SDK (grpc, protobuf, google-api-core) takes about a second to import, so
+    modules that only sometimes call Gemini should not import it at module level.
+    """
+    global _genai
+    if _genai is None:
+        with _lock:
+            if _genai is None:
+                import google.generativeai as genai
+
+                api_key = os.getenv("GEMINI_API_KEY")
+                if api_key:
+                    genai.configure(api_key=api_key)
+                _genai = genai
+    return _genai
@@ -0,0 +1,214 @@
+"""
+Ingest pipeline for uploaded papers:
+
+    1. page-text index (index/pages.py) for local citation verification
+    2. split the PDF into chunks, embed them and add them to the owner's
+       workspace index shard
+
+Chunk offsets (char_start/char_end) refer to the document text, i.e. the
+concatenation of every page's `page.get_text("text")`.
+
+Every shard write publishes a new generation of the workspace's index, so
+batches (bulk uploads, re-indexing) prepare their papers in a bounded pool of
+worker threads and write them all at once.
+"""
+
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Any, Tuple, Iterable, NamedTuple, Callable, ContextManager
+
+import fitz  # PyMuPDF
+import numpy as np
+
+from ..index.shards import get_shard_manager
+from ..index.pages import build_page_index, file_hash
+from .embeddings import embed_texts
+
+logger = logging.getLogger(__name__)
+
+CHUNK_CHARS = 1200
+# Papers of a batch extracted and embedded at once
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "8"))
+
+
+def chunk_spans(text: str) -> List[Tuple[int, int]]:
+    """Paragraph-aligned [start, end) spans of roughly CHUNK_CHARS characters.
+
+    Spans exclude leading and trailing whitespace, so text[start:end] is exactly
+    the chunk text; whitespace-only pieces are dropped.
+    """
+    spans = []
+    start = 0
+    while start < len(text):
+        end = min(start + CHUNK_CHARS, len(text))
+        if end < len(text):
+            # Prefer to cut at a paragraph, then a line break
+            cut = text.rfind("\n\n", start, end)
+            if cut <= start:
+                cut = text.rfind("\n", start, end)
+            if cut > start:
+                end = cut + 1
+        body = text[start:end]
+        stripped = body.strip()
+        if stripped:
+            lead = len(body) - len(body.lstrip())
+            spans.append((start + lead, start + lead + len(stripped)))
+        start = end
+    return spans
+
+
+def extract_chunks(pdf_path: str, paper_id: str) -> List[Dict[str, Any]]:
+    """Split a PDF into paragraph-aligned chunks of roughly CHUNK_CHARS characters.
+
+    Chunks never span pages, so every chunk has a single page_num (1-based), and
+    char_start/char_end delimit exactly the chunk's text in the document text.
+    """
+    chunks = []
+    offset = 0
+    with fitz.open(pdf_path) as doc:
+        for page_index, page in enumerate(doc):
+            text = page.get_text("text")
+            for start, end in chunk_spans(text):
+                chunks.append({
+                    "chunk_id": f"{paper_id}:{len(chunks)}",
+                    "paper_id": paper_id,
+                    "page_num": page_index + 1,
+                    "char_start": offset + start,
+                    "char_end": offset + end,
+                    "text": text[start:end],
+                })
+            offset += len(text)
+    return chunks
+
+
+class PreparedPaper(NamedTuple):
+    """A paper chunked and embedded, ready to be written to its workspace shard."""
+    paper_id: str
+    chunks: List[Dict[str, Any]]
+    vectors: Optional[np.ndarray]
+    info: Dict[str, Any]
+
+
+def prepare_paper(
+    workspace_id: str,
+    paper_id: str,
+    pdf_path: str,
+    version: Optional[str] = None,
+    content_hash: Optional[str] = None,
+) -> PreparedPaper:
+    """Chunk and embed one paper without touching the shard.
+
+    `info` holds the PDF's content hash (and storage `version`), recorded in the
+    shard manifest for the re-indexer.
+    """
+    chunks = extract_chunks(pdf_path, paper_id)
+    if not chunks:
+        logger.warning(f"No text extracted from paper {paper_id}; nothing to index")
+    vectors = embed_texts([c["text"] for c in chunks], user_id=workspace_id) if chunks else None
+    info = {"content_hash": content_hash or file_hash(pdf_path), "version": version}
+    return PreparedPaper(paper_id, chunks, vectors, info)
+
+
+def write_prepared(
+    workspace_id: str,
+    prepared: List[PreparedPaper],
+    remove_paper_ids: Iterable[str] = (),
+    papers: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> int:
+    """Replace the prepared papers' chunks in the workspace shard as one new generation.
+
+    Args:
+        workspace_id: Workspace whose shard is updated
+        prepared: Papers from prepare_paper; their old chunks are replaced
+        remove_paper_ids: Further papers to drop from the shard
+        papers: Further paper_id -> {content_hash, version} entries to record
+
+    Returns:
+        Number of chunks indexed
+    """
+    chunks = [c for p in prepared for c in p.chunks]
+    vectors = [p.vectors for p in prepared if p.vectors is not None]
+    get_shard_manager().replace_papers(
+        workspace_id,
+        list(remove_paper_ids) + [p.paper_id for p in prepared],
+        chunks,
+        np.concatenate(vectors) if vectors else None,
+        {**(papers or {}), **{p.paper_id: p.info for p in prepared}},
+    )
+    return len(chunks)
+
+
+def index_paper(workspace_id: str, paper_id: str, pdf_path: str, version: Optional[str] = None) -> int:
+    """Chunk, embed and index one paper into its workspace shard.
+
+    Chunks the paper already has in the shard are replaced.
+
+    Returns:
+        Number of chunks indexed
+    """
+    count = write_prepared(workspace_id, [prepare_paper(workspace_id, paper_id, pdf_path, version)])
+    logger.info(f"Indexed paper {paper_id} into workspace {workspace_id} ({count} chunks)")
+    return count
+
+
+def ingest_paper(workspace_id: str, paper_id: str, pdf_path: str, version: Optional[str] = None) -> None:
+    """Background ingest entry point; failures are logged, never raised."""
+    try:
+        build_page_index(paper_id, pdf_path)
+    except Exception as e:
+        logger.error(f"Page-text index failed for paper {paper_id}: {e}")
+    try:
+        index_paper(workspace_id, paper_id, pdf_path, version)
+    except Exception as e:
+        logger.error(f"Indexing failed for paper {paper_id}: {e}")
+
+
+def ingest_papers(
+    workspace_id: str,
+    papers: Iterable[Tuple[str, str, Optional[str]]],
+    local_path: Callable[[str], ContextManager[Any]] = nullcontext,
+    max_workers: int = INGEST_CONCURRENCY,
+) -> int:
+    """Background ingest of many papers with a single shard write.
+
+    Papers are page-indexed, chunked and embedded in a pool of at most
+    `max_workers` threads; failures are logged and skip only that paper. The
+    shard is written once for the whole batch instead of once per paper.
+
+    Args:
+        workspace_id: Workspace whose shard receives the papers
+        papers: (paper_id, pdf, storage version) per paper
+        local_path: Maps an entry's `pdf` to a context manager yielding a local
+            file path, held only while that paper is processed (e.g.
+            Storage.local_path); by default `pdf` is already a path
+        max_workers: Papers processed at once
+
+    Returns:
+        Number of chunks indexed
+    """
+    def prepare(paper: Tuple[str, str, Optional[str]]) -> Optional[PreparedPaper]:
+        paper_id, pdf, version = paper
+        try:
+            with local_path(pdf) as path:
+                try:
+                    build_page_index(paper_id, str(path))
+                except Exception as e:
+                    logger.error(f"Page-text index failed for paper {paper_id}: {e}")
+                return prepare_paper(workspace_id, paper_id, str(path), version)
+        except Exception as e:
+            logger.error(f"Indexing failed for paper {paper_id}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1), thread_name_prefix="ingest") as pool:
+        prepared = [p for p in pool.map(prepare, papers) if p is not None]
+    if not prepared:
+        return 0
+    try:
+        count = write_prepared(workspace_id, prepared)
+    except Exception as e:
+        logger.error(f"Indexing {len(prepared)} papers into workspace {workspace_id} failed: {e}")
+        return 0
+    logger.info(f"Indexed {len(prepared)} papers into workspace {workspace_id} ({count} chunks)")
+    return count
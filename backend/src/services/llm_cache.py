@@ -0,0 +1,159 @@
+"""
+Persistent cache of LLM responses keyed by (model, prompt).
+
+Generation prompts are deterministic for a given question, initial answer and
+citations, so an identical prompt can reuse yesterday's response instead of
+calling Gemini again. Entries live in SQLite (WAL) so they survive restarts and
+are shared by every worker process; they expire after LLM_CACHE_TTL_SECONDS and
+the least recently used ones are evicted once the cache exceeds LLM_CACHE_MAX_MB.
+
+The cache is an optimization only: a SQLite error (locked, full or corrupt
+database) is logged and the call is treated as a miss or a no-op.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_DB = Path(os.getenv("LLM_CACHE_DB", Path(__file__).resolve().parents[2] / "cache" / "llm_cache.sqlite3"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "256"))
+# Writes between full size checks; other worker processes' writes are only seen then
+LLM_CACHE_EVICT_EVERY = int(os.getenv("LLM_CACHE_EVICT_EVERY", "64"))
+# Bump to invalidate every entry when prompt construction changes meaning
+CACHE_VERSION = "1"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key         TEXT PRIMARY KEY,
+    model       TEXT NOT NULL,
+    response    TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    created_at  REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at);
+"""
+
+
+class LLMCache:
+    """TTL- and size-bounded response cache backed by SQLite."""
+
+    def __init__(
+        self,
+        path: Path = LLM_CACHE_DB,
+        ttl_seconds: int = LLM_CACHE_TTL_SECONDS,
+        max_bytes: int = LLM_CACHE_MAX_MB * 1024 * 1024,
+        evict_every: int = LLM_CACHE_EVICT_EVERY,
+    ):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.evict_every = max(evict_every, 1)
+        self._local = threading.local()
+        # Running estimate of the cache size: the last measured total plus this process's writes since
+        self._size_lock = threading.Lock()
+        self._approx_bytes: Optional[int] = None
+        self._writes = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self._connect().executescript(_SCHEMA)
+        except sqlite3.Error as e:
+            logger.error(f"LLM cache at {self.path} is unavailable: {e}")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def key(model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{CACHE_VERSION}\0{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, model: str, prompt: str) -> Optional[str]:
+        """Cached response for this exact prompt and model, or None."""
+        key = self.key(model, prompt)
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache read failed, treating it as a miss: {e}")
+            return None
+
+    def put(self, model: str, prompt: str, response: str) -> None:
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.key(model, prompt), model, response, size, now, now),
+            )
+            with self._size_lock:
+                self._writes += 1
+                if self._approx_bytes is not None:
+                    self._approx_bytes += size
+                if (
+                    self._approx_bytes is None
+                    or self._approx_bytes > self.max_bytes
+                    or self._writes % self.evict_every == 0
+                ):
+                    self._approx_bytes = self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache write failed, response not cached: {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> int:
+        """Drop expired entries, then the least recently used ones down to max_bytes.
+
+        Returns:
+            The cache size in bytes afterwards
+        """
+        conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        while total > self.max_bytes:
+            rows = conn.execute("SELECT key, size FROM responses ORDER BY accessed_at LIMIT 100").fetchall()
+            if not rows:
+                break
+            # Drop the least recently used entries until back under the limit
+            victims = []
+            for key, size in rows:
+                victims.append((key,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+            conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+            logger.info(f"Evicted {len(victims)} LLM cache entries")
+        return total
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """Process-wide response cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
@@ -0,0 +1,152 @@
+"""
+Fair-share scheduler for Gemini calls.
+
+Every generate_content / embed_content call goes through `get_scheduler().run(...)`,
+which admits at most LLM_MAX_CONCURRENCY calls at a time. Waiting calls are
+ordered by weighted fair queuing: each user gets a virtual finish tag that
+advances by cost / weight per request, so a user with hundreds of queued batch
+calls cannot starve another user's interactive question. Interactive work
+weighs more than batch work (LLM_PRIORITY_WEIGHTS, e.g. "interactive=4,batch=1").
+"""
+
+import os
+import time
+import heapq
+import logging
+import itertools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+PRIORITY_WEIGHTS = {
+    name.strip(): float(weight)
+    for name, weight in (
+        item.split("=") for item in os.getenv("LLM_PRIORITY_WEIGHTS", "interactive=4,batch=1").split(",")
+    )
+}
+WAIT_SAMPLES = 1000  # recent waits kept per priority for percentiles
+_MAX_TRACKED_USERS = 10000
+
+
+class _WaitStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=WAIT_SAMPLES)
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        recent = sorted(self.recent)
+
+        def pct(p: float) -> float:
+            return round(recent[min(len(recent) - 1, int(p * len(recent)))] * 1000, 2) if recent else 0.0
+
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "max_ms": round(self.max * 1000, 2),
+        }
+
+
+class FairScheduler:
+    """Weighted fair queuing of blocking LLM calls across users."""
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, weights: Optional[Dict[str, float]] = None):
+        self.max_concurrency = max_concurrency
+        self.weights = dict(weights or PRIORITY_WEIGHTS)
+        self._cond = threading.Condition()
+        self._queue: list = []  # heap of (finish_tag, seq)
+        self._finish: Dict[str, float] = {}  # last finish tag per user
+        self._virtual_time = 0.0
+        self._running = 0
+        self._seq = itertools.count()
+        self._queued = {p: 0 for p in self.weights}
+        self._waits = {p: _WaitStats() for p in self.weights}
+
+    @contextmanager
+    def slot(self, user_id: Optional[str], priority: str = "interactive", cost: float = 1.0):
+        """Block until this user's call may run, then hold one of the concurrency slots.
+
+        Args:
+            user_id: Who the call is for (None counts as one shared "anonymous" user)
+            priority: Key of the priority weights ("interactive" or "batch")
+            cost: Relative size of the call, e.g. number of texts in an embedding batch
+        """
+        if priority not in self.weights:
+            raise ValueError(f"Unknown LLM priority: {priority}")
+        user = user_id or "anonymous"
+        enqueued = time.monotonic()
+
+        with self._cond:
+            tag = max(self._virtual_time, self._finish.get(user, 0.0)) + cost / self.weights[priority]
+            self._finish[user] = tag
+            entry = (tag, next(self._seq))
+            heapq.heappush(self._queue, entry)
+            self._queued[priority] += 1
+            while self._running >= self.max_concurrency or self._queue[0] != entry:
+                self._cond.wait()
+            heapq.heappop(self._queue)
+            self._queued[priority] -= 1
+            self._running += 1
+            self._virtual_time = tag
+            self._waits[priority].record(time.monotonic() - enqueued)
+            # The next call in line may fit in a remaining slot
+            self._cond.notify_all()
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running -= 1
+                if len(self._finish) > _MAX_TRACKED_USERS:
+                    # Users whose tags are behind virtual time are indistinguishable from new users
+                    self._finish = {u: t for u, t in self._finish.items() if t > self._virtual_time}
+                self._cond.notify_all()
+
+    def run(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        user_id: Optional[str] = None,
+        priority: str = "interactive",
+        cost: float = 1.0,
+        **kwargs: Any,
+    ) -> Any:
+        """Call fn(*args, **kwargs) once the scheduler admits it."""
+        with self.slot(user_id, priority, cost):
+            return fn(*args, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, running calls and queue wait times per priority."""
+        with self._cond:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "running": self._running,
+                "queued": dict(self._queued),
+                "wait": {p: s.summary() for p, s in self._waits.items()},
+            }
+
+
+_scheduler: Optional[FairScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> FairScheduler:
+    """Process-wide scheduler shared by every Gemini call site."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = FairScheduler()
+        return _scheduler
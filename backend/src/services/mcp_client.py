@@ -1,6 +1,8 @@
 import os
 import requests
 
+from .circuit_breaker import get_breaker, is_server_failure
+
 MCP_URL = os.getenv("MCP_URL")
 MCP_API_KEY = os.getenv("MCP_API_KEY")
 
@@ -17,6 +19,7 @@ def upload_to_mcp(file_path: str, paper_id: str):
     Raises:
         ValueError: If MCP_URL is not set
         requests.RequestException: If the upload fails
+        CircuitOpenError: If MCP is failing and the upload was not attempted
     """
     if not MCP_URL:
         raise ValueError("MCP_URL environment variable is not set")
@@ -25,11 +28,15 @@ def upload_to_mcp(file_path: str, paper_id: str):
     if MCP_API_KEY:
         headers["Authorization"] = f"Bearer {MCP_API_KEY}"
     
-    # Use context manager to ensure file is closed
-    with open(file_path, "rb") as f:
-        files = {"file": f}
-        response = requests.post(f"{MCP_URL}/ingest", headers=headers, files=files)
-        response.raise_for_status()
-        data = response.json()
-        # expected to return something like {"mcp_document_id": "..."}
-        return data.get("mcp_document_id")
+    def post() -> requests.Response:
+        # Use context manager to ensure file is closed
+        with open(file_path, "rb") as f:
+            files = {"file": f}
+            # paper_id lets MCP report our ids back from verify_chunk (used for local verification)
+            response = requests.post(f"{MCP_URL}/ingest", headers=headers, files=files, data={"paper_id": paper_id})
+            response.raise_for_status()
+            return response
+
+    data = get_breaker("mcp").call(post, is_failure=is_server_failure).json()
+    # expected to return something like {"mcp_document_id": "..."}
+    return data.get("mcp_document_id")
@@ -0,0 +1,204 @@
+"""
+Paper metadata extracted once at upload with PyMuPDF: title, authors, section
+outline, page count and abstract.
+
+The results are stored on the paper record so listings, citation rendering and
+overview questions never need to reopen the PDF or ask MCP.
+"""
+
+import re
+import logging
+from statistics import median
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_ABSTRACT_CHARS = 2000
+MAX_OUTLINE_ENTRIES = 60
+MAX_AUTHORS = 12
+MAX_TITLE_LINES = 3
+
+_AFFILIATION = re.compile(
+    r"university|institute|research|laborator|department|school|college|google|microsoft|brain|deepmind"
+    r"|\binc\b|corp|@|\{|http|\d{3,}",
+    re.IGNORECASE,
+)
+_NAME = re.compile(r"^[A-Z][\w'.-]*(\s+[A-Z][\w'.-]*){1,3}$")
+_NUMBERED_HEADING = re.compile(r"^(\d+(\.\d+)*\.?|[IVX]+\.)\s+[A-Z][^.!?]{1,80}$")
+_NAMED_HEADINGS = {"abstract", "references", "acknowledgements", "acknowledgments", "appendix", "conclusion", "conclusions"}
+_OVERVIEW_QUESTIONS = {
+    "authors": re.compile(r"\bwho (wrote|authored|are the authors)\b|\b(list the )?authors of (this|the) paper\b", re.IGNORECASE),
+    "page_count": re.compile(r"\bhow many pages\b|\bpage count\b|\bhow long is (this|the) paper\b", re.IGNORECASE),
+    "outline": re.compile(r"\b(outline|table of contents)\b|\b(what|which) sections\b|\bstructure of (this|the) paper\b", re.IGNORECASE),
+    "title": re.compile(r"\btitle of (this|the) paper\b|\bwhat is (this|the) paper (called|titled)\b", re.IGNORECASE),
+    "abstract": re.compile(
+        r"\b(abstract|tl;?dr)\b|\bwhat is (this|the) paper about\b|\b(summar\w*|overview) (of )?(this|the) paper\b",
+        re.IGNORECASE,
+    ),
+}
+_ABSTRACT_END = re.compile(r"^\s*(1\.?\s+)?(introduction|keywords|index terms|1\s+[A-Z])", re.IGNORECASE)
+
+
+def _lines(page) -> List[Dict[str, Any]]:
+    """Text lines of a page with their largest font size and boldness."""
+    lines = []
+    for block in page.get_text("dict")["blocks"]:
+        for line in block.get("lines", []):
+            spans = [s for s in line["spans"] if s["text"].strip()]
+            if not spans:
+                continue
+            lines.append({
+                "text": " ".join(s["text"].strip() for s in spans),
+                "size": max(s["size"] for s in spans),
+                "bold": all(s["flags"] & 16 for s in spans),
+            })
+    return lines
+
+
+def _title(doc, first_lines: List[Dict[str, Any]]) -> Optional[str]:
+    meta_title = (doc.metadata or {}).get("title", "").strip()
+    first_text = " ".join(" ".join(l["text"] for l in first_lines).split()).lower()
+    # PDF metadata is often junk ("Microsoft Word - x.doc"); trust it only if it is on the first page
+    if meta_title and " ".join(meta_title.split()).lower() in first_text:
+        return meta_title
+
+    if not first_lines:
+        return meta_title or None
+    top = max(l["size"] for l in first_lines[:30])
+    title_lines, started = [], False
+    for line in first_lines[:30]:
+        if abs(line["size"] - top) < 0.5 and len(title_lines) < MAX_TITLE_LINES:
+            title_lines.append(line["text"])
+            started = True
+        elif started:
+            break
+    return " ".join(title_lines).strip() or None
+
+
+def _authors(doc, first_lines: List[Dict[str, Any]], title: Optional[str]) -> List[str]:
+    meta_author = (doc.metadata or {}).get("author", "").strip()
+    if meta_author and title == (doc.metadata or {}).get("title", "").strip():
+        return [a.strip() for a in re.split(r",|;|\band\b", meta_author) if a.strip()][:MAX_AUTHORS]
+
+    # Otherwise: name-like lines between the title and the abstract (papers only)
+    authors, after_title = [], False
+    title_text = (title or "").lower()
+    for line in first_lines[:40]:
+        text = line["text"].strip()
+        if not after_title:
+            after_title = bool(title_text) and text.lower() in title_text
+            continue
+        if text.lower() in title_text:
+            continue
+        if text.lower().startswith("abstract"):
+            return authors[:MAX_AUTHORS]
+        if _AFFILIATION.search(text):
+            continue
+        for name in re.split(r",|;|\band\b", text):
+            name = re.sub(r"[\d*∗†‡§]+$", "", name.strip()).strip()
+            if _NAME.match(name) and not name.isupper():
+                authors.append(name)
+    return []
+
+
+def _outline(doc) -> List[Dict[str, Any]]:
+    toc = doc.get_toc()
+    if toc:
+        return [{"level": level, "title": title, "page_num": page} for level, title, page in toc[:MAX_OUTLINE_ENTRIES]]
+
+    # No embedded outline: section headings set bold or larger than the body text
+    pages = [_lines(page) for page in doc]
+    sizes = [l["size"] for lines in pages for l in lines]
+    if not sizes:
+        return []
+    body = median(sizes)
+    outline = []
+    for page_index, lines in enumerate(pages):
+        for line in lines:
+            text = line["text"].strip()
+            if not (line["bold"] or line["size"] > body + 0.5):
+                continue
+            if _NUMBERED_HEADING.match(text):
+                level = text.split()[0].rstrip(".").count(".") + 1
+            elif text.lower().rstrip(".:") in _NAMED_HEADINGS:
+                level = 1
+            else:
+                continue
+            outline.append({"level": level, "title": text, "page_num": page_index + 1})
+            if len(outline) >= MAX_OUTLINE_ENTRIES:
+                return outline
+    return outline
+
+
+def _abstract(doc) -> Optional[str]:
+    for page in list(doc)[:2]:
+        text = page.get_text("text")
+        match = re.search(r"\babstract\b[\s.:—-]*", text, re.IGNORECASE)
+        if not match:
+            continue
+        collected = []
+        for line in text[match.end():].splitlines():
+            if _ABSTRACT_END.match(line):
+                break
+            collected.append(line.strip())
+        abstract = " ".join(" ".join(collected).split())
+        # Re-join words hyphenated across lines
+        abstract = re.sub(r"(\w)- (\w)", r"\1\2", abstract)
+        return abstract[:MAX_ABSTRACT_CHARS] or None
+    return None
+
+
+def extract_metadata(pdf_path: str) -> Dict[str, Any]:
+    """Extract title, authors, outline, page count and abstract from a PDF.
+
+    Returns:
+        { title, authors, outline: [ { level, title, page_num } ], page_count, abstract }
+    """
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as doc:
+        first_lines = _lines(doc[0]) if len(doc) else []
+        title = _title(doc, first_lines)
+        return {
+            "title": title,
+            "authors": _authors(doc, first_lines, title),
+            "outline": _outline(doc),
+            "page_count": len(doc),
+            "abstract": _abstract(doc),
+        }
+
+
+def overview_answer(question: str, metadata: Dict[str, Any]) -> Optional[str]:
+    """Answer a question about a paper's title, authors, length, outline or abstract
+    from its stored metadata.
+
+    Returns:
+        The answer, or None if the question is not an overview question or the
+        metadata it needs was not extracted
+    """
+    for field, pattern in _OVERVIEW_QUESTIONS.items():
+        if not pattern.search(question) or not metadata.get(field):
+            continue
+        title = metadata.get("title") or metadata.get("filename") or "This paper"
+        if field == "authors":
+            return f"{title} was written by {', '.join(metadata['authors'])}."
+        if field == "page_count":
+            return f"{title} has {metadata['page_count']} pages."
+        if field == "outline":
+            sections = "\n".join(
+                f"{'  ' * (s['level'] - 1)}- {s['title']} (page {s['page_num']})" for s in metadata["outline"]
+            )
+            return f"Outline of {title}:\n{sections}"
+        if field == "title":
+            return f"The paper is titled \"{metadata['title']}\"."
+        return f"Abstract of {title}:\n{metadata['abstract']}"
+    return None
+
+
+def safe_extract_metadata(pdf_path: str) -> Dict[str, Any]:
+    """extract_metadata that logs and returns {} instead of failing an upload."""
+    try:
+        return extract_metadata(pdf_path)
+    except Exception as e:
+        logger.error(f"Metadata extraction failed for {pdf_path}: {e}")
+        return {}
@@ -0,0 +1,330 @@
+"""
+Incremental re-indexing of a workspace from its stored papers.
+
+Every shard generation records, per paper, the content hash (sha256 of the PDF)
+and the storage version it was indexed from (see index/shards.py). A reindex
+compares that with the workspace's paper records in Cosmos:
+
+    new        not in the shard yet                     -> extracted and embedded
+    changed    storage version differs, bytes differ    -> re-extracted and re-embedded
+    touched    storage version differs, same bytes      -> only the version is recorded
+    deleted    in the shard, but the record or the
+               stored PDF is gone                       -> chunks and page index dropped
+    unchanged  same storage version                     -> skipped without reading the PDF
+
+so its cost scales with what changed, not with the size of the library.
+`verify=True` hashes every PDF instead of trusting storage versions.
+
+Only the Cosmos `papers` container decides which papers are gone. The local_store
+copy is a best-effort mirror (an upload can fail to reach it), so it is backfilled
+from Cosmos here rather than trusted; if Cosmos cannot be read, no plan is made.
+
+Changes are published REINDEX_BATCH_PAPERS papers per shard generation. Progress
+is saved to the shard's `reindex.json` after every paper, so any worker process
+(and the CLI) can report it, and `.reindex.lock` keeps two processes from
+reindexing the same workspace at once.
+
+Usage (from backend/):
+    python -m src.services.reindex [--owner EMAIL] [--verify]
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import hashlib
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Any, IO, Iterator
+
+from ..db import local_store
+from ..index.shards import get_shard_manager
+from ..index.pages import build_page_index, delete_page_index, load_page_index
+from .storage import get_storage, Storage, ObjectNotFound
+
+logger = logging.getLogger(__name__)
+
+REINDEX_BATCH_PAPERS = int(os.getenv("REINDEX_BATCH_PAPERS", "16"))
+
+
+class ReindexRunning(RuntimeError):
+    """Another process or thread is already reindexing the workspace."""
+
+
+def _storage_key(record: Dict[str, Any]) -> str:
+    return record.get("storage_key") or f"{record['id']}.pdf"
+
+
+def _stored_hash(storage: Storage, key: str) -> str:
+    digest = hashlib.sha256()
+    for chunk in storage.iter_range(key):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _paper_records(workspace_id: str) -> Dict[str, Dict[str, Any]]:
+    """The workspace's paper records from Cosmos, also backfilled into the local mirror."""
+    from ..db.cosmos_store import container
+
+    items = container("papers").query_items(
+        query="SELECT * FROM c WHERE c.user_email = @user_email",
+        parameters=[{"name": "@user_email", "value": workspace_id}],
+        enable_cross_partition_query=True,
+    )
+    # Drop Cosmos system properties (_rid, _etag, ...); uploads mirror the bare document
+    records = {item["id"]: {k: v for k, v in item.items() if not k.startswith("_")} for item in items}
+    try:
+        local_store.add_papers(records.values())
+    except Exception as e:
+        logger.warning(f"Could not backfill the local paper mirror for workspace {workspace_id}: {e}")
+    return records
+
+
+def _workspaces() -> List[str]:
+    """Every workspace (owner email) with papers in Cosmos."""
+    from ..db.cosmos_store import container
+
+    items = container("papers").query_items(
+        query="SELECT DISTINCT VALUE c.user_email FROM c", enable_cross_partition_query=True
+    )
+    return sorted(owner for owner in items if owner)
+
+
+def plan_reindex(workspace_id: str, verify: bool = False) -> Dict[str, Any]:
+    """Compare the workspace's stored papers with what its shard was built from.
+
+    Raises:
+        CosmosHttpError: if the paper records cannot be read; planning without
+            them would drop papers from the index
+
+    Returns:
+        Dictionary with keys: index (list of {record, version, content_hash} to
+        extract and embed; content_hash is None for new papers), touched
+        (paper_id -> {content_hash, version}), deleted (paper ids), unchanged (count)
+    """
+    storage = get_storage()
+    indexed = get_shard_manager().indexed_papers(workspace_id)
+    records = _paper_records(workspace_id)
+
+    plan = {"index": [], "touched": {}, "deleted": [], "unchanged": 0}
+    for paper_id in indexed:
+        if paper_id not in records:
+            plan["deleted"].append(paper_id)
+
+    for paper_id, record in records.items():
+        key = _storage_key(record)
+        try:
+            version = storage.version(key)
+        except ObjectNotFound:
+            if paper_id in indexed:
+                logger.warning(f"Stored PDF {key} of paper {paper_id} is gone; dropping it from the index")
+                plan["deleted"].append(paper_id)
+            continue
+
+        if paper_id not in indexed:
+            plan["index"].append({"record": record, "version": version, "content_hash": None})
+            continue
+        info = indexed[paper_id]
+        if info.get("version") == version and not verify:
+            plan["unchanged"] += 1
+            continue
+        # Shards indexed before hashes were recorded: the page index was built from the same bytes
+        known_hash = info.get("content_hash") or (load_page_index(paper_id) or {}).get("content_hash")
+        content_hash = _stored_hash(storage, key)
+        if content_hash == known_hash:
+            if info.get("version") == version and info.get("content_hash") == content_hash:
+                plan["unchanged"] += 1
+            else:
+                plan["touched"][paper_id] = {"content_hash": content_hash, "version": version}
+        else:
+            plan["index"].append({"record": record, "version": version, "content_hash": content_hash})
+    return plan
+
+
+def _shard_dir(workspace_id: str) -> Path:
+    return get_shard_manager().shard_path(workspace_id)
+
+
+def _save_progress(workspace_id: str, progress: Dict[str, Any]) -> None:
+    path = _shard_dir(workspace_id)
+    path.mkdir(parents=True, exist_ok=True)
+    progress["updated_at"] = datetime.utcnow().isoformat()
+    tmp = path / "reindex.json.tmp"
+    tmp.write_text(json.dumps(progress))
+    os.replace(tmp, path / "reindex.json")
+
+
+def _acquire_lock(workspace_id: str) -> IO:
+    """Open and exclusively lock the workspace's .reindex.lock; closing the file releases it."""
+    path = _shard_dir(workspace_id)
+    path.mkdir(parents=True, exist_ok=True)
+    lock_file = open(path / ".reindex.lock", "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        raise ReindexRunning(f"Workspace {workspace_id} is already being reindexed")
+    return lock_file
+
+
+@contextmanager
+def _reindex_lock(workspace_id: str) -> Iterator[None]:
+    lock_file = _acquire_lock(workspace_id)
+    try:
+        yield
+    finally:
+        lock_file.close()
+
+
+def reindex_status(workspace_id: str) -> Optional[Dict[str, Any]]:
+    """Progress of the workspace's current or last reindex, or None if it never ran."""
+    try:
+        progress = json.loads((_shard_dir(workspace_id) / "reindex.json").read_text())
+    except FileNotFoundError:
+        return None
+    if progress.get("state") in ("queued", "running"):
+        # The lock dies with its holder: if it is free, the run was interrupted
+        try:
+            with _reindex_lock(workspace_id):
+                progress["state"] = "interrupted"
+        except ReindexRunning:
+            pass
+    return progress
+
+
+def _new_progress(workspace_id: str, verify: bool) -> Dict[str, Any]:
+    return {
+        "workspace_id": workspace_id,
+        "state": "queued",
+        "verify": verify,
+        "started_at": datetime.utcnow().isoformat(),
+        "finished_at": None,
+        "total": 0,
+        "processed": 0,
+        "indexed": 0,
+        "touched": 0,
+        "removed": 0,
+        "unchanged": 0,
+        "chunks": 0,
+        "current": None,
+        "errors": [],
+    }
+
+
+def _run(workspace_id: str, verify: bool, progress: Dict[str, Any]) -> Dict[str, Any]:
+    """Plan and apply a reindex, updating `progress` as it goes. Callers hold the reindex lock."""
+    from .ingest import prepare_paper, write_prepared
+
+    start_time = time.time()
+    storage = get_storage()
+    try:
+        progress["state"] = "running"
+        _save_progress(workspace_id, progress)
+        plan = plan_reindex(workspace_id, verify)
+        progress.update(
+            total=len(plan["index"]), touched=len(plan["touched"]),
+            removed=len(plan["deleted"]), unchanged=plan["unchanged"],
+        )
+        _save_progress(workspace_id, progress)
+
+        # Deletions and version-only updates go out with the first batch
+        remove_ids, papers = list(plan["deleted"]), dict(plan["touched"])
+        for paper_id in plan["deleted"]:
+            delete_page_index(paper_id)
+        items = plan["index"]
+        for batch_start in range(0, max(len(items), 1), REINDEX_BATCH_PAPERS):
+            prepared = []
+            for item in items[batch_start:batch_start + REINDEX_BATCH_PAPERS]:
+                paper_id = item["record"]["id"]
+                progress["current"] = paper_id
+                try:
+                    with storage.local_path(_storage_key(item["record"])) as path:
+                        try:
+                            build_page_index(paper_id, str(path))
+                        except Exception as e:
+                            logger.error(f"Page-text index failed for paper {paper_id}: {e}")
+                        paper = prepare_paper(workspace_id, paper_id, str(path), item["version"], item["content_hash"])
+                    prepared.append(paper)
+                    progress["indexed"] += 1
+                    progress["chunks"] += len(paper.chunks)
+                except Exception as e:
+                    logger.error(f"Reindexing paper {paper_id} failed: {e}")
+                    progress["errors"].append({"paper_id": paper_id, "error": str(e)})
+                progress["processed"] += 1
+                _save_progress(workspace_id, progress)
+
+            write_prepared(workspace_id, prepared, remove_paper_ids=remove_ids, papers=papers)
+            remove_ids, papers = [], {}
+
+        progress["state"] = "done"
+    except Exception as e:
+        logger.error(f"Reindex of workspace {workspace_id} failed: {e}")
+        progress["state"] = "failed"
+        progress["errors"].append({"paper_id": progress["current"], "error": str(e)})
+    progress["current"] = None
+    progress["finished_at"] = datetime.utcnow().isoformat()
+    _save_progress(workspace_id, progress)
+    logger.info(
+        f"Reindexed workspace {workspace_id} in {time.time() - start_time:.1f}s: "
+        f"{progress['indexed']} indexed, {progress['touched']} touched, {progress['removed']} removed, "
+        f"{progress['unchanged']} unchanged, {len(progress['errors'])} errors"
+    )
+    return progress
+
+
+def reindex_workspace(workspace_id: str, verify: bool = False) -> Dict[str, Any]:
+    """Bring the workspace's index up to date with its stored papers, blocking until done.
+
+    Raises:
+        ReindexRunning: if the workspace is already being reindexed
+
+    Returns:
+        Final progress: counts of indexed, touched, removed and unchanged papers, and errors
+    """
+    with _reindex_lock(workspace_id):
+        return _run(workspace_id, verify, _new_progress(workspace_id, verify))
+
+
+def start_reindex(workspace_id: str, verify: bool = False) -> Dict[str, Any]:
+    """Start reindexing the workspace in a background thread and return its initial progress.
+
+    Raises:
+        ReindexRunning: if the workspace is already being reindexed
+    """
+    lock_file = _acquire_lock(workspace_id)
+    progress = _new_progress(workspace_id, verify)
+    _save_progress(workspace_id, progress)
+
+    def run() -> None:
+        try:
+            _run(workspace_id, verify, progress)
+        finally:
+            lock_file.close()
+
+    threading.Thread(target=run, name=f"reindex-{workspace_id}", daemon=True).start()
+    return dict(progress)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Incrementally reindex workspaces from their stored papers.")
+    parser.add_argument("--owner", action="append", help="Workspace (owner email) to reindex; repeatable. Default: all")
+    parser.add_argument("--verify", action="store_true", help="Hash every PDF instead of trusting storage versions")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    owners = args.owner or _workspaces()
+    failed = False
+    for owner in owners:
+        progress = reindex_workspace(owner, verify=args.verify)
+        print(json.dumps(progress))
+        failed = failed or progress["state"] != "done" or bool(progress["errors"])
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
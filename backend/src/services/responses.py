@@ -0,0 +1,43 @@
+"""
+Response serialization for citation-heavy payloads.
+
+`FastJSONResponse` is the app's default response class: orjson serializes
+payloads several times faster than the stdlib encoder. Routes with large
+payloads (/query) return it directly, which also skips FastAPI's
+`jsonable_encoder` pass over the result and lets numpy scores through as-is.
+`compact_citations` strips citations down to references (chunk id, paper,
+page, character offsets) for clients that already hold the text, e.g. from the
+page-text index or a cached PDF.
+"""
+
+from typing import Any, Dict, List, Union
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+# Fields a compact citation keeps; text, snippets and highlight boxes are dropped
+CITATION_REF_FIELDS = ("chunk_id", "paper_id", "page_num", "char_start", "char_end", "score", "verification_status")
+
+
+class FastJSONResponse(ORJSONResponse):
+    """orjson-encoded JSON response that also accepts numpy values and non-string keys."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+def compact_citation(citation: Union[Dict[str, Any], str]) -> Dict[str, Any]:
+    """A citation reduced to CITATION_REF_FIELDS.
+
+    Passages without a chunk reference (plain strings from the keyword fallback)
+    have nothing to point at and keep their text.
+    """
+    if not isinstance(citation, dict):
+        return {"text": str(citation)}
+    if citation.get("chunk_id") is None:
+        return citation
+    return {key: citation[key] for key in CITATION_REF_FIELDS if citation.get(key) is not None}
+
+
+def compact_citations(citations: List[Union[Dict[str, Any], str]]) -> List[Dict[str, Any]]:
+    return [compact_citation(c) for c in citations]
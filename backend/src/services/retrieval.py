@@ -0,0 +1,162 @@
+"""
+Hybrid lexical + dense retrieval over a workspace's index shard.
+
+BM25 (index/lexical.py) catches exact terms such as equation names and acronyms
+that embeddings blur; embedding similarity catches paraphrases that share no
+words with the question. Each retriever ranks `candidates` chunks and the two
+rankings are merged with weighted reciprocal rank fusion:
+
+    score(chunk) = sum over retrievers r of  weight_r / (rrf_k + rank_r(chunk))
+
+Chunks both retrievers agree on rise to the top, so fewer chunks need to go into
+the prompt. Embedding the question is a network call, so it runs concurrently
+with the lexical search; if it fails (e.g. the Gemini circuit is open) the
+lexical ranking is used alone.
+
+Weights are tunable per workspace and saved as `retrieval.json` in its shard
+directory (see GET/PUT /index/retrieval); a weight of 0 turns a retriever off.
+"""
+
+import os
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Tuple
+
+import numpy as np
+
+from ..index.shards import get_shard_manager
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_DEFAULTS = {
+    "lexical_weight": float(os.getenv("HYBRID_LEXICAL_WEIGHT", "1.0")),
+    "dense_weight": float(os.getenv("HYBRID_DENSE_WEIGHT", "1.0")),
+    "rrf_k": int(os.getenv("HYBRID_RRF_K", "60")),
+    "candidates": int(os.getenv("HYBRID_CANDIDATES", "50")),
+}
+HYBRID_TOP_K = int(os.getenv("HYBRID_TOP_K", "5"))
+HYBRID_THREADS = int(os.getenv("HYBRID_THREADS", "8"))
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=HYBRID_THREADS, thread_name_prefix="hybrid")
+        return _pool
+
+
+def _settings_path(workspace_id: str) -> Path:
+    return get_shard_manager().shard_path(workspace_id) / "retrieval.json"
+
+
+def get_retrieval_settings(workspace_id: str) -> Dict[str, Any]:
+    """The workspace's fusion weights, falling back to RETRIEVAL_DEFAULTS."""
+    settings = dict(RETRIEVAL_DEFAULTS)
+    try:
+        settings.update(json.loads(_settings_path(workspace_id).read_text()))
+    except FileNotFoundError:
+        pass
+    return settings
+
+
+def set_retrieval_settings(workspace_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate and save new fusion settings for a workspace; unknown keys are rejected.
+
+    Returns:
+        The workspace's full settings after the update
+    """
+    unknown = set(updates) - set(RETRIEVAL_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown retrieval settings: {', '.join(sorted(unknown))}")
+    settings = {**get_retrieval_settings(workspace_id), **updates}
+    if settings["lexical_weight"] < 0 or settings["dense_weight"] < 0:
+        raise ValueError("Weights must be non-negative")
+    if settings["lexical_weight"] == 0 and settings["dense_weight"] == 0:
+        raise ValueError("At least one retriever needs a positive weight")
+    if settings["rrf_k"] < 1 or settings["candidates"] < 1:
+        raise ValueError("rrf_k and candidates must be at least 1")
+
+    path = _settings_path(workspace_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    saved = {key: settings[key] for key in RETRIEVAL_DEFAULTS}
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(saved))
+    os.replace(tmp, path)
+    return saved
+
+
+def reciprocal_rank_fusion(
+    rankings: List[Tuple[List[Tuple[Dict[str, Any], float]], float]],
+    rrf_k: int = 60,
+) -> List[Tuple[Dict[str, Any], float]]:
+    """Merge ranked (chunk, score) lists into one, best first.
+
+    Args:
+        rankings: (ranked hits, weight) per retriever
+        rrf_k: Rank offset; larger values flatten the difference between top ranks
+    """
+    fused: Dict[str, float] = {}
+    chunks: Dict[str, Dict[str, Any]] = {}
+    for hits, weight in rankings:
+        for rank, (chunk, _) in enumerate(hits, 1):
+            chunk_id = chunk["chunk_id"]
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + weight / (rrf_k + rank)
+            chunks.setdefault(chunk_id, chunk)
+    return sorted(((chunks[cid], score) for cid, score in fused.items()), key=lambda hit: -hit[1])
+
+
+def hybrid_search(
+    workspace_id: str,
+    question: str,
+    k: int = HYBRID_TOP_K,
+    paper_ids: Optional[List[str]] = None,
+    query_vector: Optional[np.ndarray] = None,
+    user_id: Optional[str] = None,
+    settings: Optional[Dict[str, Any]] = None,
+) -> List[Tuple[Dict[str, Any], float]]:
+    """Top-k (chunk, fused score) pairs from lexical and dense retrieval.
+
+    Args:
+        workspace_id: Workspace whose shard is searched
+        question: Query text
+        k: Number of chunks to return
+        paper_ids: Optional list of paper ids to restrict the search to
+        query_vector: Precomputed question embedding (skips the embedding call)
+        user_id: User the embedding call is scheduled for (see llm_scheduler)
+        settings: Fusion settings; defaults to the workspace's saved settings
+    """
+    from .embeddings import embed_query
+
+    manager = get_shard_manager()
+    if manager.get(workspace_id) is None:
+        return []
+    settings = settings or get_retrieval_settings(workspace_id)
+    candidates = max(settings["candidates"], k)
+
+    def dense() -> List[Tuple[Dict[str, Any], float]]:
+        vector = query_vector if query_vector is not None else embed_query(question, user_id=user_id)
+        return manager.search(workspace_id, vector, k=candidates, paper_ids=paper_ids)
+
+    dense_future = _get_pool().submit(dense) if settings["dense_weight"] > 0 else None
+    lexical_hits = []
+    if settings["lexical_weight"] > 0:
+        lexical_hits = manager.lexical_search(workspace_id, question, k=candidates, paper_ids=paper_ids)
+    dense_hits = []
+    if dense_future is not None:
+        try:
+            dense_hits = dense_future.result()
+        except Exception as e:
+            logger.warning(f"Dense retrieval failed, using lexical ranking only: {e}")
+
+    fused = reciprocal_rank_fusion(
+        [(lexical_hits, settings["lexical_weight"]), (dense_hits, settings["dense_weight"])],
+        rrf_k=settings["rrf_k"],
+    )
+    return fused[:k]
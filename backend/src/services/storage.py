@@ -0,0 +1,321 @@
+"""
+Object storage for uploaded PDFs.
+
+`get_storage()` returns the backend selected by STORAGE_BACKEND:
+
+    local   files under STORAGE_LOCAL_DIR (default backend/uploads); single node,
+            and the stand-in for tests and development
+    s3      an S3-compatible bucket (AWS S3, MinIO, R2, ...) via boto3, shared by
+            every worker and node
+
+Both backends stream writes (S3 as a multipart upload), serve byte ranges and
+hand out presigned download URLs, so PDF bytes can go straight from storage to
+the browser without passing through an API worker. The local backend signs its
+URLs with HMAC under STORAGE_SIGNING_KEY and serves them from
+`GET /upload/files/{key}`; it refuses to start without that key.
+"""
+
+import os
+import hmac
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+from urllib.parse import quote, urlencode
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+STORAGE_LOCAL_DIR = Path(os.getenv("STORAGE_LOCAL_DIR", Path(__file__).resolve().parents[2] / "uploads"))
+STORAGE_SIGNING_KEY = os.getenv("STORAGE_SIGNING_KEY")
+S3_BUCKET = os.getenv("S3_BUCKET")
+S3_PREFIX = os.getenv("S3_PREFIX", "uploads/")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # for S3-compatible services
+S3_REGION = os.getenv("S3_REGION")
+# S3 multipart parts must be at least 5 MB (except the last)
+S3_PART_BYTES = int(os.getenv("S3_PART_MB", "8")) * 1024 * 1024
+PRESIGNED_URL_SECONDS = int(os.getenv("PRESIGNED_URL_SECONDS", "900"))
+READ_CHUNK_BYTES = 1024 * 1024
+
+
+class ObjectNotFound(KeyError):
+    pass
+
+
+class Storage(ABC):
+    """Interface shared by the storage backends. Keys are relative paths like "<paper_id>.pdf"."""
+
+    @abstractmethod
+    def put_stream(self, key: str, chunks: Iterable[bytes]) -> int:
+        """Write an object from an iterable of byte chunks without buffering it whole.
+
+        The object only becomes visible once every chunk was written; if the
+        iterable raises, nothing is stored.
+
+        Returns:
+            Bytes written
+        """
+
+    @abstractmethod
+    def iter_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Stream bytes [start, end) of an object (end=None reads to the end)."""
+
+    def read_range(self, key: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        return b"".join(self.iter_range(key, start, end))
+
+    @abstractmethod
+    def size(self, key: str) -> int:
+        """Object size in bytes; raises ObjectNotFound if it does not exist."""
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.size(key)
+            return True
+        except ObjectNotFound:
+            return False
+
+    @abstractmethod
+    def version(self, key: str) -> str:
+        """Opaque token that changes whenever the object is rewritten (cheaper than hashing it)."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove the object; deleting a missing object is not an error."""
+
+    @abstractmethod
+    def uri(self, key: str) -> str:
+        """Where the object lives, for logs and paper records."""
+
+    @abstractmethod
+    def presigned_url(self, key: str, expires_in: int = PRESIGNED_URL_SECONDS, filename: Optional[str] = None) -> str:
+        """Time-limited URL the client can download the object from directly."""
+
+    @contextmanager
+    def local_path(self, key: str) -> Iterator[Path]:
+        """A filesystem path with the object's bytes, for tools that need a file (PyMuPDF, MCP upload)."""
+        with tempfile.NamedTemporaryFile(suffix=Path(key).suffix) as tmp:
+            for chunk in self.iter_range(key):
+                tmp.write(chunk)
+            tmp.flush()
+            yield Path(tmp.name)
+
+
+class LocalStorage(Storage):
+    """Objects as files in one directory."""
+
+    def __init__(self, root: Path = STORAGE_LOCAL_DIR, signing_key: Optional[str] = STORAGE_SIGNING_KEY):
+        if not signing_key:
+            raise ValueError("STORAGE_SIGNING_KEY environment variable is required for STORAGE_BACKEND=local")
+        self.root = Path(root)
+        self.signing_key = signing_key.encode("utf-8")
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root.resolve() not in path.parents:
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def put_stream(self, key: str, chunks: Iterable[bytes]) -> int:
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".part")
+        written = 0
+        try:
+            with open(tmp, "wb") as out:
+                for chunk in chunks:
+                    out.write(chunk)
+                    written += len(chunk)
+            os.replace(tmp, path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        return written
+
+    def iter_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        path = self.path(key)
+        if not path.exists():
+            raise ObjectNotFound(key)
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else max(end - start, 0)
+            while remaining is None or remaining > 0:
+                chunk = f.read(READ_CHUNK_BYTES if remaining is None else min(READ_CHUNK_BYTES, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def size(self, key: str) -> int:
+        try:
+            return self.path(key).stat().st_size
+        except FileNotFoundError:
+            raise ObjectNotFound(key)
+
+    def version(self, key: str) -> str:
+        try:
+            stat = self.path(key).stat()
+        except FileNotFoundError:
+            raise ObjectNotFound(key)
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+    def delete(self, key: str) -> None:
+        self.path(key).unlink(missing_ok=True)
+
+    def uri(self, key: str) -> str:
+        return str(self.path(key))
+
+    @contextmanager
+    def local_path(self, key: str) -> Iterator[Path]:
+        path = self.path(key)
+        if not path.exists():
+            raise ObjectNotFound(key)
+        yield path
+
+    def sign(self, key: str, expires: int) -> str:
+        return hmac.new(self.signing_key, f"{key}\0{expires}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def verify(self, key: str, expires: int, signature: str) -> bool:
+        return expires >= time.time() and hmac.compare_digest(self.sign(key, expires), signature)
+
+    def presigned_url(self, key: str, expires_in: int = PRESIGNED_URL_SECONDS, filename: Optional[str] = None) -> str:
+        expires = int(time.time()) + expires_in
+        query = {"expires": expires, "signature": self.sign(key, expires)}
+        if filename:
+            query["filename"] = filename
+        return f"/upload/files/{quote(key)}?{urlencode(query)}"
+
+
+class S3Storage(Storage):
+    """Objects in an S3-compatible bucket."""
+
+    def __init__(
+        self,
+        bucket: Optional[str] = S3_BUCKET,
+        prefix: str = S3_PREFIX,
+        endpoint_url: Optional[str] = S3_ENDPOINT_URL,
+        region: Optional[str] = S3_REGION,
+    ):
+        if not bucket:
+            raise ValueError("S3_BUCKET environment variable is required for STORAGE_BACKEND=s3")
+        import boto3  # only needed for this backend; ~0.3 s to import
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def put_stream(self, key: str, chunks: Iterable[bytes]) -> int:
+        s3_key = self._key(key)
+        upload_id = self.client.create_multipart_upload(
+            Bucket=self.bucket, Key=s3_key, ContentType="application/pdf"
+        )["UploadId"]
+        parts, buffer, written = [], bytearray(), 0
+        try:
+            for chunk in chunks:
+                buffer.extend(chunk)
+                written += len(chunk)
+                if len(buffer) >= S3_PART_BYTES:
+                    parts.append(self._upload_part(s3_key, upload_id, len(parts) + 1, bytes(buffer)))
+                    buffer.clear()
+            if buffer or not parts:
+                parts.append(self._upload_part(s3_key, upload_id, len(parts) + 1, bytes(buffer)))
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=s3_key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+            )
+        except BaseException:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=s3_key, UploadId=upload_id)
+            raise
+        return written
+
+    def _upload_part(self, s3_key: str, upload_id: str, number: int, body: bytes) -> dict:
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=s3_key, UploadId=upload_id, PartNumber=number, Body=body
+        )
+        return {"PartNumber": number, "ETag": response["ETag"]}
+
+    def iter_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        kwargs = {"Bucket": self.bucket, "Key": self._key(key)}
+        if start or end is not None:
+            if end is not None and end <= start:
+                return
+            kwargs["Range"] = f"bytes={start}-{'' if end is None else end - 1}"
+        try:
+            body = self.client.get_object(**kwargs)["Body"]
+        except self.client.exceptions.NoSuchKey:
+            raise ObjectNotFound(key)
+        try:
+            yield from body.iter_chunks(READ_CHUNK_BYTES)
+        finally:
+            body.close()
+
+    def _head(self, key: str) -> dict:
+        from botocore.exceptions import ClientError
+
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                raise ObjectNotFound(key)
+            raise
+
+    def size(self, key: str) -> int:
+        return self._head(key)["ContentLength"]
+
+    def version(self, key: str) -> str:
+        return self._head(key)["ETag"].strip('"')
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def uri(self, key: str) -> str:
+        return f"s3://{self.bucket}/{self._key(key)}"
+
+    def presigned_url(self, key: str, expires_in: int = PRESIGNED_URL_SECONDS, filename: Optional[str] = None) -> str:
+        params = {"Bucket": self.bucket, "Key": self._key(key), "ResponseContentType": "application/pdf"}
+        if filename:
+            params["ResponseContentDisposition"] = f'inline; filename="{filename}"'
+        return self.client.generate_presigned_url("get_object", Params=params, ExpiresIn=expires_in)
+
+
+_storage: Optional[Storage] = None
+_storage_lock = threading.Lock()
+
+
+def check_storage_config() -> None:
+    """Fail fast on a storage configuration that would only break at the first request.
+
+    Raises:
+        ValueError: if STORAGE_BACKEND is unknown or its required settings are missing
+    """
+    if STORAGE_BACKEND == "local":
+        if not STORAGE_SIGNING_KEY:
+            raise ValueError("STORAGE_SIGNING_KEY environment variable is required for STORAGE_BACKEND=local")
+    elif STORAGE_BACKEND == "s3":
+        if not S3_BUCKET:
+            raise ValueError("S3_BUCKET environment variable is required for STORAGE_BACKEND=s3")
+    else:
+        raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+
+
+def get_storage() -> Storage:
+    """Process-wide storage backend chosen by STORAGE_BACKEND ("local" or "s3")."""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            if STORAGE_BACKEND == "s3":
+                _storage = S3Storage()
+            elif STORAGE_BACKEND == "local":
+                _storage = LocalStorage()
+            else:
+                raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+            logger.info(f"Using {type(_storage).__name__} for uploads")
+        return _storage
@@ -0,0 +1,44 @@
+"""
+Shared test setup. Run from backend/:
+
+    python -m pytest tests
+
+Settings are read from the environment at import time, so every on-disk
+location is pointed at a scratch directory before any `src` module is imported.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+_scratch = Path(tempfile.mkdtemp(prefix="cortex-tests-"))
+for name, sub in (
+    ("CORTEX_INDEX_DIR", "indexes"),
+    ("CORTEX_PAGES_DIR", "pages"),
+    ("STORAGE_LOCAL_DIR", "uploads"),
+    ("CORTEX_LOCAL_DB", "cortex.sqlite3"),
+    ("LLM_CACHE_DB", "llm_cache.sqlite3"),
+):
+    os.environ.setdefault(name, str(_scratch / sub))
+os.environ.setdefault("STORAGE_SIGNING_KEY", "test-signing-key")
+
+import pytest
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    """A ShardManager over a scratch directory, installed as the process-wide one.
+
+    Segments are only merged when a test calls merge_segments().
+    """
+    from src.index import shards
+
+    monkeypatch.setattr(shards, "ANN_MIN_VECTORS", 2000)
+    monkeypatch.setattr(shards, "QUANTIZATION", "none")
+    manager = shards.ShardManager(tmp_path / "indexes", auto_merge=False)
+    monkeypatch.setattr(shards, "_manager", manager)
+    return manager
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from src.multi_tool_agent import batch
+
+
+@pytest.fixture
+def answers(monkeypatch):
+    """handle_question stand-in; questions listed in `failing` raise."""
+    calls, failing = [], set()
+
+    def handle_question(collection_id, question, **kwargs):
+        calls.append(question)
+        if question in failing:
+            raise RuntimeError("gemini unavailable")
+        return {"answer": f"answer to {question}", "citations": []}
+
+    monkeypatch.setattr(batch, "MCPClient", lambda *args, **kwargs: None)
+    monkeypatch.setattr(batch, "handle_question", handle_question)
+    return calls, failing
+
+
+def _questions(*ids):
+    return [{"id": i, "question": f"question {i}"} for i in ids]
+
+
+def _lines(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_failed_questions_are_recorded_and_retried_on_the_next_run(tmp_path, answers):
+    calls, failing = answers
+    output = tmp_path / "results.jsonl"
+    failing.add("question b")
+
+    report = batch.run_batch(_questions("a", "b", "c"), output, concurrency=2)
+    assert (report["answered"], report["errors"], report["skipped"]) == (2, 1, 0)
+    assert {r["id"]: "error" in r for r in _lines(output)} == {"a": False, "b": True, "c": False}
+    assert batch.completed_ids(output) == {"a", "c"}
+
+    failing.clear()
+    calls.clear()
+    report = batch.run_batch(_questions("a", "b", "c"), output)
+    assert calls == ["question b"]
+    assert (report["answered"], report["errors"], report["skipped"]) == (1, 0, 2)
+    assert batch.completed_ids(output) == {"a", "b", "c"}
+
+
+def test_resume_skips_answered_ids_and_tolerates_bad_lines(tmp_path, answers):
+    calls, _ = answers
+    output = tmp_path / "results.jsonl"
+    output.write_text("\n".join([
+        json.dumps({"id": "a", "answer": "x"}),
+        json.dumps({"id": 2, "answer": "y"}),
+        json.dumps({"answer": "no id"}),
+        json.dumps(["not", "an", "object"]),
+        '{"id": "c", "answ',  # cut short by an interrupted run
+    ]) + "\n")
+    assert batch.completed_ids(output) == {"a", "2"}
+
+    report = batch.run_batch(_questions("a", 2, "c"), output)
+    assert calls == ["question c"]
+    assert report["questions"] == 3 and report["skipped"] == 2
+
+
+def test_report_latency_and_throughput(tmp_path, monkeypatch):
+    # Question n takes n seconds on a fake clock: latencies 1..4 s, 10 s in all
+    clock = [0.0]
+
+    def handle_question(collection_id, question, **kwargs):
+        clock[0] += int(question.split()[-1])
+        return {"answer": "x"}
+
+    monkeypatch.setattr(batch.time, "perf_counter", lambda: clock[0])
+    monkeypatch.setattr(batch, "MCPClient", lambda *args, **kwargs: None)
+    monkeypatch.setattr(batch, "handle_question", handle_question)
+
+    report = batch.run_batch(_questions(1, 2, 3, 4), tmp_path / "results.jsonl", concurrency=1)
+    assert report["wall_s"] == 10
+    assert report["throughput_qps"] == 0.4
+    assert report["latency_s"] == {"p50": 2, "p95": 4, "p99": 4, "max": 4}
+
+
+@pytest.mark.parametrize("p, expected", [(0.0, 1), (0.5, 50), (0.95, 95), (0.99, 99), (1.0, 100)])
+def test_percentile_is_nearest_rank(p, expected):
+    assert batch.percentile([float(v) for v in range(1, 101)], p) == expected
+
+
+def test_percentile_of_few_values():
+    assert batch.percentile([], 0.5) == 0.0
+    assert batch.percentile([3.0], 0.99) == 3.0
+    assert batch.percentile([1.0, 2.0], 0.5) == 1.0
@@ -0,0 +1,74 @@
+import pytest
+import requests
+from google.api_core import exceptions as google_exceptions
+
+from src.services.circuit_breaker import CircuitBreaker, CircuitOpenError, is_server_failure, OPEN, CLOSED, HALF_OPEN
+
+
+def _fail():
+    raise ConnectionError("down")
+
+
+def _http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(response=response)
+
+
+def test_opens_after_failure_rate_and_fails_fast():
+    breaker = CircuitBreaker("test", failure_rate=0.5, min_calls=4, reset_seconds=60)
+    breaker.call(lambda: None)
+    breaker.call(lambda: None)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(_fail)
+    assert breaker.state == OPEN
+
+    called = []
+    with pytest.raises(CircuitOpenError):
+        breaker.call(called.append, 1)
+    assert called == []
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_half_open_trial_closes_or_reopens():
+    breaker = CircuitBreaker("test", min_calls=1, reset_seconds=0)
+    with pytest.raises(ConnectionError):
+        breaker.call(_fail)
+    assert breaker.state == OPEN
+    with pytest.raises(ConnectionError):
+        breaker.call(_fail)  # the trial call
+    assert breaker.state == OPEN
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_only_one_trial_call_while_half_open():
+    breaker = CircuitBreaker("test", min_calls=1, reset_seconds=0)
+    with pytest.raises(ConnectionError):
+        breaker.call(_fail)
+    breaker.allow()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+
+def test_client_errors_do_not_count():
+    breaker = CircuitBreaker("test", min_calls=1)
+    for error in (_http_error(404), google_exceptions.InvalidArgument("bad prompt")):
+        def fail(error=error):
+            raise error
+        with pytest.raises(type(error)):
+            breaker.call(fail, is_failure=is_server_failure)
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.parametrize("error, counts", [
+    (ConnectionError("reset"), True),
+    (_http_error(503), True),
+    (_http_error(400), False),
+    (google_exceptions.ServiceUnavailable("overloaded"), True),
+    (google_exceptions.InvalidArgument("bad prompt"), False),
+])
+def test_is_server_failure(error, counts):
+    assert is_server_failure(error) is counts
@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+
+from src.benchmarks.cold_start import BACKEND_DIR, COLD_START_BUDGET_MS, LAZY_MODULES, profile_import
+
+
+def test_api_import_stays_within_budget_and_lazy():
+    total_us, _, imported = profile_import("src.main")
+    assert sorted(set(LAZY_MODULES) & set(imported)) == []
+    assert total_us / 1000 <= COLD_START_BUDGET_MS
+
+
+def test_agent_runs_as_a_module():
+    env = {**os.environ, "GEMINI_API_KEY": ""}  # set, so a local .env cannot supply one
+    result = subprocess.run(
+        [sys.executable, "-m", "src.multi_tool_agent.agent"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, stdin=subprocess.DEVNULL,
+    )
+    assert "ImportError" not in result.stderr
+    assert result.returncode == 1
+    assert "GEMINI_API_KEY environment variable is required" in result.stdout
@@ -0,0 +1,28 @@
+from src.multi_tool_agent import compare
+
+
+def _chunk(paper_id):
+    return {"chunk_id": f"{paper_id}-0", "page_num": 1, "char_start": 0, "char_end": 5, "text": "BM25 wins"}
+
+
+def test_failed_question_embedding_falls_back_to_lexical_retrieval(monkeypatch):
+    searches = []
+
+    def embed_query(question, user_id=None):
+        raise RuntimeError("gemini circuit open")
+
+    def hybrid_search(workspace_id, question, paper_ids=None, query_vector=None, settings=None, **kwargs):
+        searches.append((query_vector, settings))
+        return [(_chunk(paper_ids[0]), 0.5)]
+
+    monkeypatch.setattr(compare, "embed_query", embed_query)
+    monkeypatch.setattr(compare, "hybrid_search", hybrid_search)
+    monkeypatch.setattr(compare, "generate", lambda prompt, *args: "summary")
+
+    result = compare.compare_papers("ws@example.com", "Which ranker wins?", ["a", "b"])
+
+    assert "gemini circuit open" in result["degraded"]
+    assert result["answer"] == "summary"
+    assert len(result["citations"]) == 2
+    assert all(vector is None and settings["dense_weight"] == 0 for vector, settings in searches)
+    assert all(settings["lexical_weight"] > 0 for _, settings in searches)
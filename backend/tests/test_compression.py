@@ -0,0 +1,78 @@
+import gzip
+import zlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from src.services import compression
+from src.services.compression import CompressionMiddleware, negotiate
+
+BODY = b'{"text": "' + b"attention is all you need " * 200 + b'"}'
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/json")
+    def json_body():
+        return Response(BODY, media_type="application/json")
+
+    @app.get("/small")
+    def small():
+        return Response(b'{"ok": true}', media_type="application/json")
+
+    @app.get("/pdf")
+    def pdf():
+        return Response(b"%PDF" + bytes(4096), media_type="application/pdf")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((BODY for _ in range(3)), media_type="application/x-ndjson")
+
+    return TestClient(app)
+
+
+def test_negotiate(monkeypatch):
+    monkeypatch.setattr(compression, "_brotli", lambda: None)
+    assert negotiate("gzip, deflate, br") == "gzip"
+    assert negotiate("gzip;q=0, identity") is None
+    assert negotiate("") is None
+    monkeypatch.setattr(compression, "_brotli", lambda: object())
+    assert negotiate("gzip, br") == "br"
+    assert negotiate("br;q=0, gzip") == "gzip"
+
+
+def test_large_json_is_gzipped(client, monkeypatch):
+    monkeypatch.setattr(compression, "_brotli", lambda: None)
+    response = client.get("/json", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert int(response.headers["content-length"]) < len(BODY)
+    assert response.content == BODY  # the test client decodes gzip
+
+
+def test_small_and_binary_responses_pass_through(client):
+    for path in ("/small", "/pdf"):
+        response = client.get(path, headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+
+
+def test_streamed_bodies_are_compressed_incrementally(client, monkeypatch):
+    monkeypatch.setattr(compression, "_brotli", lambda: None)
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.content == BODY * 3
+
+
+def test_encoder_flushes_each_chunk():
+    encoder = compression._Encoder("gzip")
+    first = encoder.chunk(BODY)
+    # A sync flush makes everything written so far decodable before the stream ends
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    assert decoder.decompress(first) == BODY
+    assert gzip.decompress(first + encoder.finish()) == BODY
@@ -0,0 +1,22 @@
+from src.services.ingest import chunk_spans, CHUNK_CHARS
+
+
+def test_spans_point_at_stripped_text():
+    text = "  \n  First paragraph.\n\n   Second one.  \n"
+    spans = chunk_spans(text)
+    assert [text[s:e] for s, e in spans] == ["First paragraph.\n\n   Second one."]
+
+
+def test_long_text_is_cut_at_paragraphs_without_whitespace_at_the_edges():
+    paragraph = "word " * 100
+    text = "\n\n".join(f"   {paragraph.strip()}   " for _ in range(10))
+    spans = chunk_spans(text)
+    assert len(spans) > 1
+    for start, end in spans:
+        chunk = text[start:end]
+        assert chunk == chunk.strip()
+        assert len(chunk) <= CHUNK_CHARS
+
+
+def test_whitespace_only_text_has_no_chunks():
+    assert chunk_spans(" \n\n \t ") == []
@@ -0,0 +1,126 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import fitz
+import numpy as np
+import pytest
+
+from src.services import ingest
+
+
+def _pdf(path, text):
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), text)
+    doc.save(path)
+    doc.close()
+    return str(path)
+
+
+@pytest.fixture
+def manager(manager, monkeypatch):
+    monkeypatch.setattr(ingest, "build_page_index", lambda paper_id, path: None)
+    monkeypatch.setattr(
+        ingest, "embed_texts",
+        lambda texts, user_id=None: np.random.default_rng(len(texts)).standard_normal((len(texts), 8)).astype(np.float32),
+    )
+    return manager
+
+
+def test_batch_ingest_writes_one_generation(tmp_path, manager, monkeypatch):
+    writes = []
+    replace = manager.replace_papers
+    monkeypatch.setattr(manager, "replace_papers", lambda *a, **kw: writes.append(a) or replace(*a, **kw))
+
+    papers = [(f"p{i}", _pdf(tmp_path / f"p{i}.pdf", f"paper {i} body"), None) for i in range(5)]
+    assert ingest.ingest_papers("w", papers) == 5
+
+    assert len(writes) == 1
+    assert sorted(manager.indexed_papers("w")) == [f"p{i}" for i in range(5)]
+    assert len(list((manager.shard_path("w")).glob("gen-*"))) == 1
+
+
+def test_batch_ingest_skips_unreadable_papers(tmp_path, manager):
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf")
+    papers = [("good", _pdf(tmp_path / "good.pdf", "readable"), None), ("bad", str(broken), None)]
+    assert ingest.ingest_papers("w", papers) == 1
+    assert list(manager.indexed_papers("w")) == ["good"]
+
+
+def test_reingesting_a_paper_replaces_its_chunks(tmp_path, manager):
+    path = _pdf(tmp_path / "p.pdf", "some text")
+    ingest.index_paper("w", "p", path)
+    ingest.index_paper("w", "p", path)
+    assert len(manager.get("w")) == 1
+
+
+def test_batch_ingest_prepares_papers_in_a_bounded_pool(tmp_path, manager, monkeypatch):
+    lock, running, peak, opened = threading.Lock(), [0], [0], []
+
+    def prepare_paper(workspace_id, paper_id, pdf_path, version=None):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        chunk = {"chunk_id": f"{paper_id}:0", "paper_id": paper_id, "page_num": 1, "char_start": 0, "char_end": 4, "text": "text"}
+        return ingest.PreparedPaper(paper_id, [chunk], np.ones((1, 8), dtype=np.float32), {"content_hash": paper_id, "version": version})
+
+    @contextmanager
+    def local_path(key):
+        opened.append(key)
+        yield tmp_path / key
+
+    monkeypatch.setattr(ingest, "prepare_paper", prepare_paper)
+    papers = [(f"p{i}", f"p{i}.pdf", "v1") for i in range(6)]
+    ingest.ingest_papers("w", papers, local_path=local_path, max_workers=2)
+
+    assert peak[0] == 2
+    assert sorted(opened) == sorted(key for _, key, _ in papers)
+    assert sorted(manager.indexed_papers("w")) == [f"p{i}" for i in range(6)]
+
+
+def test_bulk_upload_reports_failed_items_and_ingests_the_rest(tmp_path, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from src.routes import upload
+    from src.routes.auth import get_current_user
+    from src.services.storage import LocalStorage
+
+    storage = LocalStorage(tmp_path, signing_key="secret")
+    created, queued = [], []
+
+    class Papers:
+        def create_item(self, doc):
+            created.append(doc["filename"])
+
+    def process_stored(paper_id, storage_key):
+        if storage.read_range(storage_key).endswith(b"broken"):
+            raise RuntimeError("cannot parse")
+        return {"title": "T"}, None
+
+    monkeypatch.setattr(upload, "get_storage", lambda: storage)
+    monkeypatch.setattr(upload, "container", lambda name: Papers())
+    monkeypatch.setattr(upload, "_process_stored", process_stored)
+    monkeypatch.setattr(upload, "_mirror_locally", lambda docs: None)
+    monkeypatch.setattr(upload, "_ingest_stored_batch", lambda workspace_id, papers: queued.extend(papers))
+    app = FastAPI()
+    app.include_router(upload.router)
+    app.dependency_overrides[get_current_user] = lambda: "owner@example.com"
+
+    files = [("files", (name, body, "application/pdf")) for name, body in (
+        ("good.pdf", b"%PDF-1.4 good"), ("bad.pdf", b"%PDF-1.4 broken"), ("also.pdf", b"%PDF-1.4 fine"),
+    )]
+    response = TestClient(app).post("/upload/bulk", files=files)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["uploaded"], body["failed"]) == (2, 1)
+    failed = [r for r in body["results"] if r["status"] == "failed"]
+    assert failed[0]["filename"] == "bad.pdf" and "cannot parse" in failed[0]["error"]
+    assert sorted(created) == ["also.pdf", "good.pdf"]
+    assert len(queued) == 2 and all(storage.exists(key) for _, key in queued)
+    assert len(list(tmp_path.iterdir())) == 2  # the failed PDF was deleted
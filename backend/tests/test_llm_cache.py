@@ -0,0 +1,48 @@
+from src.services.llm_cache import LLMCache
+
+
+def test_hit_and_miss(tmp_path):
+    cache = LLMCache(tmp_path / "cache.sqlite3")
+    assert cache.get("model", "prompt") is None
+    cache.put("model", "prompt", "answer")
+    assert cache.get("model", "prompt") == "answer"
+    assert cache.get("other-model", "prompt") is None
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = LLMCache(tmp_path / "cache.sqlite3", ttl_seconds=-1)
+    cache.put("model", "prompt", "answer")
+    assert cache.get("model", "prompt") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = LLMCache(tmp_path / "cache.sqlite3", max_bytes=250)
+    for i in range(5):
+        cache.put("model", f"prompt-{i}", "x" * 100)
+        cache.get("model", "prompt-0")
+    assert cache.get("model", "prompt-0") == "x" * 100
+    assert cache.get("model", "prompt-4") == "x" * 100
+    assert cache.get("model", "prompt-1") is None
+
+
+def test_size_is_not_rescanned_on_every_write(tmp_path, monkeypatch):
+    cache = LLMCache(tmp_path / "cache.sqlite3", evict_every=10)
+    calls = []
+    evict = cache._evict
+    monkeypatch.setattr(cache, "_evict", lambda conn, now: calls.append(now) or evict(conn, now))
+    for i in range(25):
+        cache.put("model", f"prompt-{i}", "answer")
+    # The first write measures the cache, then every tenth
+    assert len(calls) == 3
+
+
+def test_database_errors_are_misses(tmp_path, caplog):
+    path = tmp_path / "cache.sqlite3"
+    path.write_bytes(b"not a sqlite database" * 100)
+    with caplog.at_level("WARNING", logger="src.services.llm_cache"):
+        cache = LLMCache(path)
+        cache.put("model", "prompt", "answer")
+        assert cache.get("model", "prompt") is None
+    assert "LLM cache write failed" in caplog.text
+    assert "LLM cache read failed" in caplog.text
+
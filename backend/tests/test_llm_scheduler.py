@@ -0,0 +1,65 @@
+import threading
+import time
+
+import pytest
+
+from src.services.llm_scheduler import FairScheduler
+
+
+def _wait_queued(scheduler, count, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while sum(scheduler.stats()["queued"].values()) < count:
+        assert time.monotonic() < deadline, "calls never queued"
+        time.sleep(0.001)
+
+
+def test_concurrency_is_capped():
+    scheduler = FairScheduler(max_concurrency=2)
+    lock, running, peak = threading.Lock(), [0], [0]
+
+    def call():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+
+    threads = [threading.Thread(target=scheduler.run, args=(call,), kwargs={"user_id": f"u{i}"}) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] == 2
+    assert scheduler.stats()["wait"]["interactive"]["count"] == 8
+
+
+def test_interactive_call_overtakes_a_batch_backlog():
+    scheduler = FairScheduler(max_concurrency=1, weights={"interactive": 4, "batch": 1})
+    release, order = threading.Event(), []
+    blocker = threading.Thread(target=scheduler.run, args=(release.wait,), kwargs={"user_id": "holder"})
+    blocker.start()
+    while scheduler.stats()["running"] == 0:
+        time.sleep(0.001)
+
+    threads = []
+    for i in range(6):
+        threads.append(threading.Thread(
+            target=scheduler.run, args=(order.append, f"batch-{i}"), kwargs={"user_id": "bulk", "priority": "batch"},
+        ))
+        threads[-1].start()
+        _wait_queued(scheduler, i + 1)
+    threads.append(threading.Thread(target=scheduler.run, args=(order.append, "question"), kwargs={"user_id": "reader"}))
+    threads[-1].start()
+    _wait_queued(scheduler, 7)
+
+    release.set()
+    for t in [blocker, *threads]:
+        t.join()
+    assert order[0] == "question"
+    assert [o for o in order if o != "question"] == [f"batch-{i}" for i in range(6)]
+
+
+def test_unknown_priority_is_rejected():
+    with pytest.raises(ValueError):
+        FairScheduler().run(lambda: None, priority="urgent")
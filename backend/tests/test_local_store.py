@@ -0,0 +1,58 @@
+import json
+import threading
+import uuid
+
+from src.db import local_store
+
+
+def _record(owner, uploaded_at, **extra):
+    return {"id": str(uuid.uuid4()), "user_email": owner, "uploaded_at": uploaded_at, **extra}
+
+
+def test_add_get_and_list_by_owner_in_upload_order():
+    owner = f"{uuid.uuid4()}@example.com"
+    later, earlier = _record(owner, "2024-02-01"), _record(owner, "2024-01-01")
+    local_store.add_papers([later, earlier, _record("someone-else", "2024-01-15")])
+
+    assert local_store.get_paper(earlier["id"]) == earlier
+    assert [r["id"] for r in local_store.list_papers(owner)] == [earlier["id"], later["id"]]
+    assert local_store.get_paper("missing") is None
+
+
+def test_add_replaces_an_existing_record():
+    record = _record("replace@example.com", "2024-01-01", title="Old")
+    local_store.add_paper(record)
+    local_store.add_paper({**record, "title": "New"})
+    assert local_store.get_paper(record["id"])["title"] == "New"
+
+
+def test_migrate_from_tinydb(tmp_path):
+    owner = f"{uuid.uuid4()}@example.com"
+    records = [_record(owner, f"2024-01-0{i}") for i in range(1, 4)]
+    legacy = tmp_path / "db.json"
+    legacy.write_text(json.dumps({"papers": {str(i): r for i, r in enumerate(records, 1)}}))
+
+    assert local_store.migrate_from_tinydb(legacy) == 3
+    assert [r["id"] for r in local_store.list_papers(owner)] == [r["id"] for r in records]
+
+
+def test_connections_are_per_thread():
+    owner = f"{uuid.uuid4()}@example.com"
+
+    def write(i):
+        local_store.add_paper(_record(owner, f"2024-01-{i:02d}"))
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(1, 9)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(local_store.list_papers(owner)) == 8
+
+
+def test_keyword_fallback_logs_unreadable_papers(caplog):
+    owner = f"{uuid.uuid4()}@example.com"
+    local_store.add_paper(_record(owner, "2024-01-01", stored_path="/nonexistent.pdf"))
+    with caplog.at_level("ERROR", logger="src.db.local_store"):
+        assert local_store.search_local_chunks("anything", owner=owner) == []
+    assert "Error reading paper" in caplog.text
@@ -0,0 +1,104 @@
+import fitz
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.services.metadata import extract_metadata, overview_answer
+
+
+@pytest.fixture
+def paper(tmp_path):
+    doc = fitz.open()
+    page = doc.new_page()
+    lines = [
+        ("Sparse Retrieval for Scientific Papers", 18, "hebo"),
+        ("Ada Lovelace, Alan Turing", 11, "helv"),
+        ("University of Somewhere", 10, "helv"),
+        ("Abstract", 11, "hebo"),
+        ("We study lexical retrieval over papers and", 10, "helv"),
+        ("show that BM25 helps.", 10, "helv"),
+        ("1 Introduction", 12, "hebo"),
+        ("Body text here.", 10, "helv"),
+    ]
+    for i, (text, size, font) in enumerate(lines):
+        page.insert_text((72, 72 + 20 * i), text, fontsize=size, fontname=font)
+    page = doc.new_page()
+    page.insert_text((72, 72), "2 Method", fontsize=12, fontname="hebo")
+    page.insert_text((72, 92), "More body text.", fontsize=10)
+    path = tmp_path / "paper.pdf"
+    doc.save(path)
+    doc.close()
+    return str(path)
+
+
+def test_extracts_title_authors_abstract_and_outline(paper):
+    metadata = extract_metadata(paper)
+    assert metadata["title"] == "Sparse Retrieval for Scientific Papers"
+    assert metadata["authors"] == ["Ada Lovelace", "Alan Turing"]
+    assert metadata["page_count"] == 2
+    assert metadata["abstract"] == "We study lexical retrieval over papers and show that BM25 helps."
+    assert [(s["title"], s["page_num"]) for s in metadata["outline"]] == [
+        ("Abstract", 1), ("1 Introduction", 1), ("2 Method", 2),
+    ]
+
+
+def test_overview_answers_come_from_metadata(paper):
+    metadata = extract_metadata(paper)
+    assert overview_answer("Who wrote this paper?", metadata) == (
+        "Sparse Retrieval for Scientific Papers was written by Ada Lovelace, Alan Turing."
+    )
+    assert overview_answer("How many pages is it?", metadata).endswith("has 2 pages.")
+    assert "- 2 Method (page 2)" in overview_answer("Show the outline", metadata)
+    assert "BM25 helps" in overview_answer("What is this paper about?", metadata)
+
+
+def test_other_questions_and_missing_fields_are_not_overview_answers():
+    assert overview_answer("How does BM25 compare to dense retrieval?", {"title": "T", "authors": ["A"]}) is None
+    assert overview_answer("Who wrote this paper?", {"title": "T", "authors": []}) is None
+
+
+@pytest.fixture
+def client(monkeypatch):
+    from src.routes import query
+    from src.routes.auth import get_current_user
+    from src.services import retrieval
+
+    class Papers:
+        def query_items(self, query, parameters=(), enable_cross_partition_query=False):
+            return [{"filename": "p.pdf", "title": "T", "authors": ["Ada Lovelace"], "page_count": 3}]
+
+    class Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"candidates": [{"content": {"parts": [{"text": "generated"}]}}]}
+
+    calls = {"search": [], "posts": []}
+
+    def hybrid_search(workspace_id, question, paper_ids=None, **kwargs):
+        calls["search"].append(paper_ids)
+        return [({"chunk_id": "c", "paper_id": "p1", "text": "BM25 body"}, 1.0)]
+
+    monkeypatch.setattr(query, "container", lambda name: Papers())
+    monkeypatch.setattr(retrieval, "hybrid_search", hybrid_search)
+    monkeypatch.setattr(query.requests, "post", lambda url, **kwargs: calls["posts"].append(url) or Response())
+    app = FastAPI()
+    app.include_router(query.router)
+    app.dependency_overrides[get_current_user] = lambda: "owner@example.com"
+    return TestClient(app), calls
+
+
+def test_overview_question_about_a_paper_skips_retrieval(client):
+    client, calls = client
+    body = client.get("/query", params={"question": "Who wrote this paper?", "paper_id": "p1"}).json()
+    assert body == {"answer": "T was written by Ada Lovelace.", "citations": [], "source": "metadata"}
+    assert calls == {"search": [], "posts": []}
+
+
+def test_other_questions_about_a_paper_retrieve_only_its_chunks(client):
+    client, calls = client
+    body = client.get("/query", params={"question": "Why does BM25 help?", "paper_id": "p1"}).json()
+    assert body["answer"] == "generated"
+    assert calls["search"] == [["p1"]]
+    assert len(calls["posts"]) == 1 and "generativelanguage" in calls["posts"][0]  # MCP was not asked
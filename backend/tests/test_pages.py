@@ -0,0 +1,101 @@
+import json
+import os
+import uuid
+
+import pytest
+
+from src.index import pages
+
+TEXT = "Attention is all you need.\nWe propose the Transformer architecture."
+
+
+def _write_index(text=TEXT):
+    paper_id = str(uuid.uuid4())
+    words, offset = [], 0
+    for word in text.split():
+        start = text.index(word, offset)
+        offset = start + len(word)
+        words.append([1, start, offset, float(start), 10.0, float(offset), 20.0])
+    index = {
+        "paper_id": paper_id,
+        "content_hash": "0" * 64,
+        "text": text,
+        "pages": [{"page_num": 1, "char_start": 0, "char_end": len(text), "width": 612, "height": 792}],
+        "words": words,
+    }
+    pages.PAGES_DIR.mkdir(parents=True, exist_ok=True)
+    (pages.PAGES_DIR / f"{paper_id}.json").write_text(json.dumps(index))
+    return paper_id
+
+
+def test_snippet_at_offsets_is_verified():
+    paper_id = _write_index()
+    start = TEXT.index("We propose")
+    result = pages.verify_citation(paper_id, "We  propose the\nTransformer", start, len(TEXT))
+    assert result["verification_status"] == "verified"
+    assert (result["char_start"], result["char_end"]) == (start, len(TEXT))
+    assert result["highlights"]
+
+
+def test_content_hash_at_offsets_is_verified():
+    paper_id = _write_index()
+    span = TEXT[:26]
+    result = pages.verify_citation(paper_id, char_start=0, char_end=26, content_hash=pages.text_hash(span))
+    assert result["verification_status"] == "verified"
+
+
+def test_offsets_alone_are_unverified():
+    paper_id = _write_index()
+    result = pages.verify_citation(paper_id, char_start=0, char_end=9)
+    assert result["verification_status"] == "unverified"
+    assert result["text"] == "Attention"
+
+
+def test_stale_offsets_are_relocated():
+    paper_id = _write_index()
+    result = pages.verify_citation(paper_id, "Transformer architecture", 0, 9)
+    assert result["verification_status"] == "relocated"
+    assert result["text"] == "Transformer architecture"
+
+
+def test_missing_snippet_fails():
+    paper_id = _write_index()
+    result = pages.verify_citation(paper_id, "recurrent networks", 0, 9)
+    assert result["verification_status"] == "failed"
+
+
+def test_paper_without_index():
+    assert pages.verify_citation("no-such-paper", "anything") is None
+
+
+def test_cache_picks_up_a_rebuilt_index():
+    paper_id = _write_index()
+    assert pages.load_page_index(paper_id)["text"] == TEXT
+
+    path = pages.PAGES_DIR / f"{paper_id}.json"
+    index = json.loads(path.read_text())
+    index["text"] = "Rebuilt by another worker."
+    path.write_text(json.dumps(index))
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert pages.load_page_index(paper_id)["text"] == "Rebuilt by another worker."
+
+    pages.delete_page_index(paper_id)
+    assert pages.load_page_index(paper_id) is None
+
+
+def test_cache_is_bounded_by_size(monkeypatch):
+    monkeypatch.setattr(pages, "PAGES_CACHE_MB", 0)
+    first, second = _write_index(), _write_index()
+    pages.load_page_index(first)
+    pages.load_page_index(second)
+    assert list(pages._cache) == [second]
+    assert pages._cache_bytes == (pages.PAGES_DIR / f"{second}.json").stat().st_size
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    yield
+    with pages._cache_lock:
+        pages._cache.clear()
+        pages._cache_bytes = 0
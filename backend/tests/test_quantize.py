@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from src.index import shards
+from src.index.quantize import Quantizer, ScalarQuantizer, ProductQuantizer, train_quantizer, QUANTIZATION
+from src.index.shards import ShardManager
+
+
+def _corpus(count=3000, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((30, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, 30, count)] + 0.2 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_default_is_exact_search():
+    assert QUANTIZATION == "none"
+    assert train_quantizer("none", _corpus(10)) is None
+
+
+def test_base_quantizer_is_abstract():
+    with pytest.raises(TypeError):
+        Quantizer(np.ones(4, dtype=np.float32))
+
+
+@pytest.mark.parametrize("mode", ["int8", "pq"])
+def test_quantizer_scores_rank_like_exact_inner_products(mode):
+    vectors = _corpus()
+    quantizer = train_quantizer(mode, vectors)
+    assert isinstance(quantizer, ScalarQuantizer if mode == "int8" else ProductQuantizer)
+    codes = quantizer.encode(vectors)
+    assert len(codes) == len(vectors)
+    query = vectors[0]
+    approx = quantizer.scores(codes, query)
+    # The true nearest neighbour (the query itself) lands in the re-scoring shortlist
+    assert 0 in np.argsort(-approx)[:40]
+
+
+def test_int8_shard_recall_with_rescoring_matches_exact(tmp_path, monkeypatch):
+    monkeypatch.setattr(shards, "QUANTIZATION", "int8")
+    vectors = _corpus()
+    chunks = [{"chunk_id": str(i), "paper_id": "p", "page_num": 1, "char_start": 0, "char_end": 1, "text": "x"}
+              for i in range(len(vectors))]
+    manager = ShardManager(tmp_path)
+    manager.add_chunks("w", chunks, vectors)
+    shard = manager.get("w")
+    quantizer = shard.segments[0].quantizer
+    assert quantizer is not None and quantizer.mode == "int8"
+
+    rng = np.random.default_rng(1)
+    recalls = []
+    for row in rng.integers(0, len(vectors), 30):
+        query = vectors[row]
+        exact = set(np.argsort(-(vectors @ query))[:10].astype(str))
+        found = {c["chunk_id"] for c, _ in shard.search(query, k=10)}
+        recalls.append(len(exact & found) / 10)
+    assert np.mean(recalls) >= 0.95
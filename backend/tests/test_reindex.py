@@ -0,0 +1,137 @@
+import uuid
+
+import numpy as np
+import pytest
+
+from src.db import cosmos_store, local_store
+from src.index import shards
+from src.services import reindex
+from src.services.storage import LocalStorage
+
+
+class _Papers:
+    """Stand-in for the Cosmos papers container."""
+
+    def __init__(self, records, fail=False):
+        self.records = records
+        self.fail = fail
+
+    def query_items(self, query, parameters=(), enable_cross_partition_query=False):
+        if self.fail:
+            raise ConnectionError("cosmos unreachable")
+        if "DISTINCT VALUE" in query:
+            return list({r["user_email"] for r in self.records})
+        owner = {p["name"]: p["value"] for p in parameters}["@user_email"]
+        return [{**r, "_etag": "x"} for r in self.records if r["user_email"] == owner]
+
+
+@pytest.fixture
+def workspace(tmp_path, manager, monkeypatch):
+    owner = f"{uuid.uuid4()}@example.com"
+    storage = LocalStorage(tmp_path / "uploads", signing_key="secret")
+    monkeypatch.setattr(reindex, "get_storage", lambda: storage)
+
+    records = []
+    for i in range(3):
+        record = {"id": f"{owner}-p{i}", "user_email": owner, "storage_key": f"p{i}.pdf", "uploaded_at": f"2024-01-0{i + 1}"}
+        storage.put_stream(record["storage_key"], [f"pdf {i}".encode()])
+        records.append(record)
+    chunks = [
+        {"chunk_id": f"{r['id']}:0", "paper_id": r["id"], "page_num": 1, "char_start": 0, "char_end": 4, "text": "text"}
+        for r in records
+    ]
+    manager.add_chunks(
+        owner, chunks, np.eye(3, 8, dtype=np.float32),
+        papers={r["id"]: {"version": storage.version(r["storage_key"])} for r in records},
+    )
+
+    papers = _Papers(records)
+    monkeypatch.setattr(cosmos_store, "container", lambda name: papers)
+    return owner, records, storage, papers
+
+
+def test_unchanged_workspace_plans_nothing(workspace):
+    owner, records, _, _ = workspace
+    plan = reindex.plan_reindex(owner)
+    assert plan == {"index": [], "touched": {}, "deleted": [], "unchanged": 3}
+
+
+def test_papers_missing_from_the_local_mirror_are_kept(workspace):
+    owner, records, _, _ = workspace
+    assert local_store.list_papers(owner) == []  # uploads never reached the mirror
+
+    plan = reindex.plan_reindex(owner)
+    assert plan["deleted"] == []
+    assert sorted(r["id"] for r in local_store.list_papers(owner)) == sorted(r["id"] for r in records)
+    assert "_etag" not in local_store.get_paper(records[0]["id"])
+
+
+def test_papers_deleted_in_cosmos_or_storage_are_dropped(workspace):
+    owner, records, storage, papers = workspace
+    papers.records = records[1:]
+    storage.delete(records[2]["storage_key"])
+
+    plan = reindex.plan_reindex(owner)
+    assert sorted(plan["deleted"]) == sorted([records[0]["id"], records[2]["id"]])
+    assert plan["unchanged"] == 1
+
+
+def test_unreadable_records_plan_no_deletions(workspace):
+    owner, _, _, papers = workspace
+    papers.fail = True
+    with pytest.raises(ConnectionError):
+        reindex.plan_reindex(owner)
+
+    progress = reindex.reindex_workspace(owner)
+    assert progress["state"] == "failed"
+    assert progress["removed"] == 0
+    assert len(shards.get_shard_manager().indexed_papers(owner)) == 3
+
+
+def test_changed_and_touched_papers(workspace):
+    owner, records, storage, _ = workspace
+    storage.put_stream(records[0]["storage_key"], [b"new bytes"])
+    plan = reindex.plan_reindex(owner)
+    assert [item["record"]["id"] for item in plan["index"]] == [records[0]["id"]]
+
+    # Same bytes under a new storage version: only the version is recorded
+    manager = shards.get_shard_manager()
+    known = {"content_hash": reindex._stored_hash(storage, records[1]["storage_key"]), "version": "old"}
+    manager.replace_papers(owner, [], papers={records[1]["id"]: known})
+    plan = reindex.plan_reindex(owner)
+    assert list(plan["touched"]) == [records[1]["id"]]
+
+
+def test_workspaces_come_from_cosmos(workspace):
+    owner, _, _, _ = workspace
+    assert reindex._workspaces() == [owner]
+
+
+def test_reindex_writes_through_the_shared_ingest_path(workspace, monkeypatch):
+    from src.services import ingest
+
+    owner, records, storage, papers = workspace
+    papers.records = records[1:]
+    storage.put_stream(records[1]["storage_key"], [b"new bytes"])
+    monkeypatch.setattr(reindex, "build_page_index", lambda paper_id, path: None)
+
+    prepared, writes = [], []
+
+    def prepare_paper(workspace_id, paper_id, pdf_path, version=None, content_hash=None):
+        prepared.append(paper_id)
+        chunk = {"chunk_id": f"{paper_id}:0", "paper_id": paper_id, "page_num": 1, "char_start": 0, "char_end": 3, "text": "new"}
+        info = {"content_hash": content_hash, "version": version}
+        return ingest.PreparedPaper(paper_id, [chunk], np.ones((1, 8), dtype=np.float32), info)
+
+    def write_prepared(workspace_id, batch, remove_paper_ids=(), papers=None):
+        writes.append(([p.paper_id for p in batch], list(remove_paper_ids)))
+        return sum(len(p.chunks) for p in batch)
+
+    monkeypatch.setattr(ingest, "prepare_paper", prepare_paper)
+    monkeypatch.setattr(ingest, "write_prepared", write_prepared)
+
+    progress = reindex.reindex_workspace(owner)
+    assert progress["state"] == "done"
+    assert progress["indexed"] == 1 and progress["chunks"] == 1
+    assert prepared == [records[1]["id"]]
+    assert writes == [([records[1]["id"]], [records[0]["id"]])]
@@ -0,0 +1,36 @@
+import numpy as np
+import orjson
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.services.responses import FastJSONResponse, compact_citation, compact_citations
+
+
+def test_numpy_values_and_int_keys_serialize():
+    body = FastJSONResponse({"score": np.float32(0.5), "rows": np.arange(3), 7: "seven"}).body
+    assert orjson.loads(body) == {"score": 0.5, "rows": [0, 1, 2], "7": "seven"}
+
+
+def test_returned_response_skips_jsonable_encoder():
+    app = FastAPI(default_response_class=FastJSONResponse)
+
+    @app.get("/scores")
+    def scores():
+        return FastJSONResponse({"scores": np.linspace(0, 1, 3, dtype=np.float32)})
+
+    assert TestClient(app).get("/scores").json() == {"scores": [0.0, 0.5, 1.0]}
+
+
+def test_compact_citations_keep_only_references():
+    citation = {
+        "chunk_id": "p:1", "paper_id": "p", "page_num": 2, "char_start": 10, "char_end": 20,
+        "score": 0.9, "text": "long passage", "highlights": [{"x0": 1}], "verification_status": None,
+    }
+    assert compact_citation(citation) == {
+        "chunk_id": "p:1", "paper_id": "p", "page_num": 2, "char_start": 10, "char_end": 20, "score": 0.9,
+    }
+
+
+def test_passages_without_a_chunk_keep_their_text():
+    keyword_hit = {"paper_id": "p", "text": "matched"}
+    assert compact_citations(["plain passage", keyword_hit]) == [{"text": "plain passage"}, keyword_hit]
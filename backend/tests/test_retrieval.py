@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from src.index.lexical import BM25Index, tokenize
+from src.services import retrieval
+from src.services.retrieval import reciprocal_rank_fusion
+
+TEXTS = [
+    "We minimize the L2 loss with stochastic gradient descent.",
+    "The F1 score of the classifier improves on every benchmark.",
+    "Gradient descent converges for convex objectives.",
+    "Attention layers replace recurrence entirely.",
+]
+
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("The F1-score of an L2 model!") == ["f1", "score", "l2", "model"]
+
+
+def test_bm25_ranks_exact_terms():
+    index = BM25Index.build(TEXTS)
+    rows, scores = index.search("F1 score", k=3)
+    assert rows.tolist() == [1]
+    rows, scores = index.search("gradient descent", k=3)
+    assert sorted(rows.tolist()) == [0, 2]
+    assert scores[0] >= scores[1] > 0
+    assert index.search("transformer", k=3)[0].size == 0
+
+
+def test_bm25_mask_and_round_trip(tmp_path):
+    BM25Index.build(TEXTS).save(tmp_path)
+    index = BM25Index.load(tmp_path)
+    mask = np.array([False, True, True, True])
+    rows, _ = index.search("gradient descent", k=3, mask=mask)
+    assert rows.tolist() == [2]
+    assert BM25Index.load(tmp_path / "missing") is None
+
+
+def _hits(*ids):
+    return [({"chunk_id": cid}, 1.0) for cid in ids]
+
+
+def test_rrf_rewards_agreement():
+    fused = reciprocal_rank_fusion([(_hits("a", "b", "c"), 1.0), (_hits("c", "b", "d"), 1.0)], rrf_k=60)
+    scores = {chunk["chunk_id"]: score for chunk, score in fused}
+    assert {chunk["chunk_id"] for chunk, _ in fused[:2]} == {"b", "c"}
+    assert scores["b"] == pytest.approx(2 / 62)
+    assert scores["a"] == pytest.approx(1 / 61)
+
+
+def test_rrf_zero_weight_ignores_a_retriever():
+    fused = reciprocal_rank_fusion([(_hits("a", "b"), 1.0), (_hits("b", "a"), 0.0)])
+    assert [chunk["chunk_id"] for chunk, _ in fused] == ["a", "b"]
+
+
+@pytest.fixture
+def manager(manager):
+    chunks = [
+        {"chunk_id": str(i), "paper_id": f"p{i % 2}", "page_num": 1, "char_start": 0, "char_end": len(t), "text": t}
+        for i, t in enumerate(TEXTS)
+    ]
+    manager.add_chunks("w", chunks, np.eye(len(TEXTS), 8, dtype=np.float32))
+    return manager
+
+
+def test_hybrid_search_falls_back_to_lexical_when_embedding_fails(manager, monkeypatch):
+    from src.services import embeddings
+
+    def embed_query(question, user_id=None):
+        raise RuntimeError("gemini circuit open")
+
+    monkeypatch.setattr(embeddings, "embed_query", embed_query)
+    hits = retrieval.hybrid_search("w", "F1 score", k=2)
+    assert [chunk["chunk_id"] for chunk, _ in hits] == ["1"]
+
+
+def test_hybrid_search_fuses_both_rankings(manager):
+    query_vector = np.eye(len(TEXTS), 8, dtype=np.float32)[2]
+    hits = retrieval.hybrid_search("w", "gradient descent", k=3, query_vector=query_vector)
+    assert hits[0][0]["chunk_id"] == "2"
+    only_p1 = retrieval.hybrid_search("w", "gradient descent", k=3, query_vector=query_vector, paper_ids=["p1"])
+    assert {chunk["paper_id"] for chunk, _ in only_p1} == {"p1"}
+
+
+def test_retrieval_settings_are_validated_and_saved(manager):
+    saved = retrieval.set_retrieval_settings("w", {"lexical_weight": 2.0})
+    assert retrieval.get_retrieval_settings("w")["lexical_weight"] == 2.0
+    assert set(saved) == set(retrieval.RETRIEVAL_DEFAULTS)
+    for bad in ({"unknown": 1}, {"dense_weight": -1}, {"lexical_weight": 0, "dense_weight": 0}, {"rrf_k": 0}):
+        with pytest.raises(ValueError):
+            retrieval.set_retrieval_settings("w", bad)
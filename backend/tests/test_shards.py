@@ -0,0 +1,230 @@
+import time
+
+import numpy as np
+import pytest
+
+from src.index import shards
+from src.index.shards import ShardManager
+
+
+def _clustered(count, dim, clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, count)
+    vectors = centers[labels] + 0.1 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _chunks(count, papers):
+    return [
+        {"chunk_id": f"p{i % papers}:{i}", "paper_id": f"p{i % papers}", "page_num": 1,
+         "char_start": 0, "char_end": 10, "text": f"chunk {i} of paper {i % papers}"}
+        for i in range(count)
+    ]
+
+
+def test_paper_filtered_ann_search_matches_exact_search(manager):
+    vectors = _clustered(8000, 32, clusters=40)
+    chunks = _chunks(8000, papers=20)
+    manager.add_chunks("w", chunks, vectors)
+    shard = manager.get("w")
+    assert shard.segments[0].ivf is not None
+
+    rng = np.random.default_rng(1)
+    paper_of = np.array([c["paper_id"] for c in chunks])
+    for _ in range(40):
+        query = vectors[rng.integers(len(vectors))]
+        paper = f"p{rng.integers(20)}"
+        hits = shard.search(query, k=10, paper_ids=[paper], nprobe=2)
+
+        rows = np.flatnonzero(paper_of == paper)
+        exact = rows[np.argsort(-(vectors[rows] @ query))[:10]]
+        assert [c["chunk_id"] for c, _ in hits] == [chunks[i]["chunk_id"] for i in exact]
+
+
+def test_unfiltered_search_still_probes_ivf_lists(manager):
+    vectors = _clustered(4000, 16, clusters=20)
+    manager.add_chunks("w", _chunks(4000, papers=4), vectors)
+    hits = manager.search("w", vectors[0], k=5)
+    assert len(hits) == 5
+    assert hits[0][0]["chunk_id"] == "p0:0"
+
+
+def test_writes_publish_new_generations_and_prune_old_ones(manager):
+    vectors = _clustered(30, 8, clusters=3)
+    chunks = _chunks(30, papers=3)
+    for i in range(4):
+        manager.add_chunks("w", chunks[i * 5:(i + 1) * 5], vectors[i * 5:(i + 1) * 5])
+    shard_dir = manager.shard_path("w")
+    assert (shard_dir / "CURRENT").read_text() == "gen-000004"
+    assert sorted(p.name for p in shard_dir.glob("gen-*")) == ["gen-000003", "gen-000004"]
+
+    # Each write added a segment; the generations only reference them
+    assert sorted(p.name for p in shard_dir.glob("seg-*")) == [f"seg-00000{i}" for i in range(1, 5)]
+
+    shard = manager.get("w")
+    assert len(shard) == 20
+    assert [len(segment) for segment in shard.segments] == [5, 5, 5, 5]
+    vectors = shard.segments[0].vectors
+    assert isinstance(vectors, np.memmap) and not vectors.flags.writeable
+
+
+def test_other_processes_see_the_new_generation(manager, tmp_path):
+    vectors = _clustered(20, 8, clusters=2)
+    chunks = _chunks(20, papers=2)
+    reader = ShardManager(manager.root)
+    manager.add_chunks("w", chunks[:10], vectors[:10])
+    assert len(reader.get("w")) == 10
+    manager.add_chunks("w", chunks[10:], vectors[10:])
+    assert len(reader.get("w")) == 20
+
+
+def test_replace_papers_records_what_each_paper_was_indexed_from(manager):
+    vectors = _clustered(20, 8, clusters=2)
+    chunks = _chunks(20, papers=2)
+    manager.add_chunks("w", chunks, vectors, papers={"p0": {"content_hash": "a", "version": "1"}})
+    assert manager.indexed_papers("w") == {"p0": {"content_hash": "a", "version": "1"}, "p1": {}}
+
+    p0 = [i for i, c in enumerate(chunks) if c["paper_id"] == "p0"]
+    removed = manager.replace_papers(
+        "w", ["p0"], [chunks[i] for i in p0], vectors[p0], papers={"p0": {"content_hash": "b", "version": "2"}},
+    )
+    assert removed == 10
+    assert manager.indexed_papers("w")["p0"] == {"content_hash": "b", "version": "2"}
+    assert len(manager.get("w")) == 20
+
+    assert manager.remove_paper("w", "p1") == 10
+    assert set(manager.indexed_papers("w")) == {"p0"}
+    assert {c["paper_id"] for c, _ in manager.search("w", vectors[0], k=20)} == {"p0"}
+
+
+def test_dimension_mismatch_is_rejected(manager):
+    manager.add_chunks("w", _chunks(2, papers=1), _clustered(2, 8, clusters=1))
+    with pytest.raises(ValueError):
+        manager.add_chunks("w", _chunks(2, papers=1), _clustered(2, 16, clusters=1))
+
+
+def test_least_recently_used_shards_are_evicted_over_the_ram_budget(manager):
+    # Three shards of ~0.75 MB under a 2 MB budget: only two fit
+    for name in ("a", "b", "c"):
+        manager.add_chunks(name, _chunks(1500, papers=1), _clustered(1500, 128, clusters=4))
+    lru = ShardManager(manager.root, ram_budget_mb=2)
+
+    lru.get("a")
+    lru.get("b")
+    lru.search("a", _clustered(1, 128, clusters=1)[0])  # a is now the most recently used
+    lru.get("c")
+
+    assert list(lru._open) == ["a", "c"]
+    assert lru.resident_bytes <= lru.ram_budget
+    # An evicted shard is reopened on demand
+    assert len(lru.get("b")) == 1500
+    assert list(lru._open) == ["c", "b"]
+
+
+def test_a_shard_larger_than_the_budget_stays_open(manager):
+    manager.add_chunks("big", _chunks(1500, papers=1), _clustered(1500, 256, clusters=4))
+    lru = ShardManager(manager.root, ram_budget_mb=1)
+    assert lru.get("big") is not None
+    assert list(lru._open) == ["big"]
+
+
+def test_appends_cost_the_new_chunks_not_the_shard(manager, monkeypatch):
+    vectors = _clustered(20001, 32, clusters=40)
+    chunks = _chunks(20001, papers=50)
+    started = time.perf_counter()
+    manager.add_chunks("w", chunks[:20000], vectors[:20000])
+    first_write = time.perf_counter() - started
+    shard_dir = manager.shard_path("w")
+    first = shard_dir / "seg-000001" / "vectors.npy"
+    written = first.stat().st_mtime_ns
+
+    built = []
+    build = shards.BM25Index.build.__func__
+    monkeypatch.setattr(shards.BM25Index, "build", classmethod(lambda cls, texts: built.append(list(texts)) or build(cls, built[-1])))
+    started = time.perf_counter()
+    manager.add_chunks("w", chunks[20000:], vectors[20000:])
+    append = time.perf_counter() - started
+    # Re-indexing one paper deletes its rows and writes only its chunks
+    p7 = [i for i, c in enumerate(chunks[:20000]) if c["paper_id"] == "p7"]
+    assert manager.replace_papers("w", ["p7"], [chunks[i] for i in p7], vectors[p7]) == len(p7)
+
+    assert [len(texts) for texts in built] == [1, len(p7)]
+    assert first.stat().st_mtime_ns == written
+    assert [len(segment) for segment in manager.get("w").segments] == [20000 - len(p7), 1, len(p7)]
+    assert append < first_write / 5
+
+
+def test_segments_rank_like_one_index(manager):
+    vectors = _clustered(300, 16, clusters=6)
+    chunks = _chunks(300, papers=6)
+    for start, end in ((0, 200), (200, 280), (280, 300)):
+        manager.add_chunks("split", chunks[start:end], vectors[start:end])
+    manager.add_chunks("whole", chunks, vectors)
+    assert len(manager.get("split").segments) == 3
+
+    for query in (vectors[5], vectors[250]):
+        split = manager.search("split", query, k=10)
+        assert [c["chunk_id"] for c, _ in split] == [c["chunk_id"] for c, _ in manager.search("whole", query, k=10)]
+    for text in ("chunk 17", "chunk 290 of paper 2"):
+        split = manager.lexical_search("split", text, k=10)
+        whole = manager.lexical_search("whole", text, k=10)
+        assert split[0][0]["chunk_id"] == whole[0][0]["chunk_id"]
+        assert [score for _, score in split] == pytest.approx([score for _, score in whole])
+
+
+def test_merging_segments_keeps_results_and_deletions(manager, monkeypatch):
+    vectors = _clustered(300, 16, clusters=6)
+    chunks = _chunks(300, papers=6)
+    for start, end in ((0, 100), (100, 200), (200, 300)):
+        manager.add_chunks("w", chunks[start:end], vectors[start:end])
+    manager.remove_paper("w", "p0")
+    before = [manager.search("w", vectors[i], k=10) for i in (1, 150, 299)]
+
+    # A paper removed while the merge is being built stays removed
+    merge_into = ShardManager._merge_into
+
+    def removing_p1(build, parts):
+        merge_into(build, parts)
+        manager.remove_paper("w", "p1")
+
+    monkeypatch.setattr(ShardManager, "_merge_into", staticmethod(removing_p1))
+    assert manager.merge_segments("w") == 1
+    shard = manager.get("w")
+    assert [len(segment) for segment in shard.segments] == [200]
+    for i, hits in zip((1, 150, 299), before):
+        expected = [c["chunk_id"] for c, _ in hits if c["paper_id"] != "p1"]
+        found = [c["chunk_id"] for c, _ in manager.search("w", vectors[i], k=10)]
+        assert found[:len(expected)] == expected
+        assert {chunk_id.split(":")[0] for chunk_id in found}.isdisjoint({"p0", "p1"})
+    assert {c["paper_id"] for c, _ in manager.lexical_search("w", "paper 1", k=300)} == {"p2", "p3", "p4", "p5"}
+
+
+@pytest.mark.parametrize("sizes, plan", [
+    ([10], None),
+    ([10, 10], slice(0, 2)),
+    ([40, 20, 10], None),
+    ([40, 20, 10, 10], slice(0, 4)),
+    ([40, 5, 1], None),
+])
+def test_merge_plan_merges_segments_of_similar_size(sizes, plan):
+    assert shards._merge_plan([{"count": size, "deleted": 0} for size in sizes]) == plan
+
+
+def test_mostly_deleted_segments_are_rewritten():
+    entries = [{"count": 100, "deleted": 60}, {"count": 10, "deleted": 0}]
+    assert shards._merge_plan(entries) == slice(0, 1)
+
+
+def test_writes_merge_segments_in_the_background(tmp_path):
+    manager = ShardManager(tmp_path)
+    vectors = _clustered(40, 8, clusters=2)
+    chunks = _chunks(40, papers=2)
+    manager.add_chunks("w", chunks[:20], vectors[:20])
+    manager.add_chunks("w", chunks[20:], vectors[20:])
+    deadline = time.monotonic() + 10
+    while len(manager.get("w").segments) > 1 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    shard = manager.get("w")
+    assert len(shard.segments) == 1 and len(shard) == 40
+    assert shard.segments[0].name == "seg-000003"
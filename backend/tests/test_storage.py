@@ -0,0 +1,96 @@
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.services import storage as storage_module
+from src.services.storage import LocalStorage, ObjectNotFound, check_storage_config
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalStorage(tmp_path, signing_key="secret")
+
+
+def test_streamed_put_and_ranges(storage):
+    assert storage.put_stream("a.pdf", [b"hello ", b"world"]) == 11
+    assert storage.read_range("a.pdf") == b"hello world"
+    assert storage.read_range("a.pdf", 6, 9) == b"wor"
+    assert storage.size("a.pdf") == 11
+
+
+def test_failed_put_leaves_nothing(storage):
+    def chunks():
+        yield b"partial"
+        raise IOError("client went away")
+
+    with pytest.raises(IOError):
+        storage.put_stream("a.pdf", chunks())
+    assert not storage.exists("a.pdf")
+    assert list(storage.root.iterdir()) == []
+
+
+def test_version_changes_on_rewrite(storage):
+    storage.put_stream("a.pdf", [b"one"])
+    before = storage.version("a.pdf")
+    time.sleep(0.01)
+    storage.put_stream("a.pdf", [b"three"])
+    assert storage.version("a.pdf") != before
+    with pytest.raises(ObjectNotFound):
+        storage.version("missing.pdf")
+
+
+def test_keys_cannot_escape_the_root(storage):
+    with pytest.raises(ValueError):
+        storage.path("../outside.pdf")
+
+
+def test_signed_urls(storage):
+    expires = int(time.time()) + 60
+    signature = storage.sign("a.pdf", expires)
+    assert storage.verify("a.pdf", expires, signature)
+    assert not storage.verify("b.pdf", expires, signature)
+    assert not storage.verify("a.pdf", int(time.time()) - 1, storage.sign("a.pdf", int(time.time()) - 1))
+    assert not LocalStorage(storage.root, signing_key="other").verify("a.pdf", expires, signature)
+
+
+def test_local_backend_requires_a_signing_key(tmp_path, monkeypatch):
+    with pytest.raises(ValueError):
+        LocalStorage(tmp_path, signing_key=None)
+    monkeypatch.setattr(storage_module, "STORAGE_BACKEND", "local")
+    monkeypatch.setattr(storage_module, "STORAGE_SIGNING_KEY", None)
+    with pytest.raises(ValueError):
+        check_storage_config()
+    monkeypatch.setattr(storage_module, "STORAGE_SIGNING_KEY", "secret")
+    check_storage_config()
+
+
+def test_missing_local_file_is_404(storage, monkeypatch):
+    from src.routes import upload
+    from src.routes.auth import get_current_user
+
+    monkeypatch.setattr(upload, "get_storage", lambda: storage)
+    monkeypatch.setattr(upload, "_owned_paper", lambda paper_id, user_email: {"id": paper_id})
+    app = FastAPI()
+    app.include_router(upload.router)
+    app.dependency_overrides[get_current_user] = lambda: "owner@example.com"
+    client = TestClient(app)
+
+    assert client.get("/upload/gone").status_code == 404
+    storage.put_stream("here.pdf", [b"%PDF-1.4"])
+    response = client.get("/upload/here")
+    assert response.status_code == 200
+    assert response.content == b"%PDF-1.4"
+
+
+def test_storage_backends_must_implement_the_interface():
+    with pytest.raises(TypeError):
+        storage_module.Storage()
+
+    class Partial(storage_module.Storage):
+        def size(self, key):
+            return 0
+
+    with pytest.raises(TypeError):
+        Partial()